@@ -5,19 +5,19 @@ Based on the reference implementation from AI-Agent-for-Healthcare
 """
 
 import asyncio
-import json
 import logging
 import os
 import sys
 import time
+import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -29,11 +29,25 @@ try:
     from src.agents.react_agent import LangGraphReActDatabaseAgent
     from src.agents.db_agent import AzureReActDatabaseAgent
     from src.storage.api_storage import APIStorageManager
+    from src.agents.lifecycle import AgentResourceLifecycle, resolve_core_agent
 except ImportError as e:
     print(f"Warning: Could not import modules: {e}")
     LangGraphReActDatabaseAgent = None
     AzureReActDatabaseAgent = None
     APIStorageManager = None
+    AgentResourceLifecycle = None
+    resolve_core_agent = None
+
+from src.utils.metrics import LatencyTracker
+from src.utils.admission import AdmissionController, AdmissionRejected
+from src.utils.table_codec import (
+    TABLE_FORMAT_HEADER, COLUMNAR_FORMAT, encode_table, negotiate_table_format
+)
+from src.utils.fast_json import FastJSONResponse, dumps_bytes, serialization_latency, serialize_ms_from_headers
+from src.utils.compression import CompressionMiddleware, CompressionStats
+from src.memory.session_store import create_session_store
+from src.state.request_context import request_scope
+from src.cache.llm_cache import llm_cache_stats
 
 logging.basicConfig(
     level=logging.INFO,
@@ -42,14 +56,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 agent = None
-agent_sessions = {}
+agent_sessions = create_session_store()
 api_storage = None
+resource_lifecycle = None
+chat_latency = LatencyTracker()
+chat_admission = AdmissionController()
+compression_stats = CompressionStats()
 
 class ChatRequest(BaseModel):
     """Request model for chat interactions"""
     message: str = Field(..., description="User message/query")
     session_id: Optional[str] = Field(None, description="Optional session identifier")
     context: Optional[Dict[str, Any]] = Field(None, description="Optional conversation context")
+    bypass_cache: bool = Field(False, description="Skip the answer cache and run the agent for a fresh answer")
 
 class ChatResponse(BaseModel):
     """Response model for chat interactions"""
@@ -61,7 +80,10 @@ class ChatResponse(BaseModel):
     session_id: Optional[str] = Field(None, description="Session identifier")
     query_understanding: Optional[str] = Field(None, description="AI's understanding of the query")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
-    table_data: Optional[Dict[str, Any]] = Field(None, description="Structured table data for display")
+    table_data: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Structured table data for display; legacy row dicts, or columnar when requested via X-Table-Format"
+    )
 
 class HealthResponse(BaseModel):
     """Response model for health checks"""
@@ -69,6 +91,37 @@ class HealthResponse(BaseModel):
     timestamp: str = Field(..., description="Current timestamp")
     agent_ready: bool = Field(..., description="Whether the agent is ready")
     database_connected: bool = Field(False, description="Database connection status")
+    readiness_state: Optional[str] = Field(None, description="Cached database readiness state")
+
+class BatchQuestion(BaseModel):
+    """A single question in a batch"""
+    message: str = Field(..., description="User message/query")
+    session_id: Optional[str] = Field(None, description="Optional session group; questions sharing it run in order")
+    bypass_cache: bool = Field(False, description="Skip the answer cache and run the agent for a fresh answer")
+
+class BatchChatRequest(BaseModel):
+    """Request model for batch chat"""
+    questions: List[BatchQuestion] = Field(..., description="Questions to answer")
+    max_parallel: Optional[int] = Field(None, description="Maximum session groups processed concurrently")
+
+class BatchItemResult(BaseModel):
+    """Outcome of one batch question"""
+    index: int = Field(..., description="Position of the question in the request")
+    status: str = Field(..., description="ok, error, invalid or rejected")
+    session_id: Optional[str] = Field(None, description="Session the question ran in")
+    duration_seconds: float = Field(0.0, description="Time spent on this question")
+    response: Optional[ChatResponse] = Field(None, description="Chat response when the agent answered")
+    error: Optional[str] = Field(None, description="Error description for failed items")
+
+class BatchChatResponse(BaseModel):
+    """Response model for batch chat"""
+    results: List[BatchItemResult] = Field(default_factory=list, description="Results in input order")
+    total: int = Field(0, description="Number of questions")
+    succeeded: int = Field(0, description="Questions answered successfully")
+    failed: int = Field(0, description="Questions that failed, were invalid or were rejected")
+    max_parallel: int = Field(1, description="Concurrency used for session groups")
+    duration_seconds: float = Field(0.0, description="Wall-clock time for the whole batch")
+    throughput_per_second: float = Field(0.0, description="Questions completed per second")
 
 class SessionResponse(BaseModel):
     """Response model for session operations"""
@@ -120,9 +173,23 @@ async def initialize_storage():
         logger.error(f"Failed to initialize API storage: {e}")
         raise
 
+async def start_agent_resources():
+    """Create, warm and start health-checking the shared agent resources"""
+    global resource_lifecycle
+    if not agent or not AgentResourceLifecycle:
+        return
+    try:
+        resource_lifecycle = AgentResourceLifecycle(agent)
+        await resource_lifecycle.start()
+    except Exception as e:
+        logger.warning(f"Agent resource warm-up failed: {e}")
+
 async def cleanup_agent():
     """Cleanup agent resources"""
     global agent
+    if resource_lifecycle:
+        await resource_lifecycle.shutdown()
+        return
     if agent and hasattr(agent, '_cleanup'):
         try:
             await agent._cleanup()
@@ -130,15 +197,26 @@ async def cleanup_agent():
         except Exception as e:
             logger.warning(f"Error during agent cleanup: {e}")
 
+async def flush_storage():
+    """Flush queued storage writes before the process exits"""
+    if api_storage and hasattr(api_storage, 'close'):
+        try:
+            await asyncio.to_thread(api_storage.close)
+            logger.info("✅ API storage flushed")
+        except Exception as e:
+            logger.warning(f"Error flushing API storage: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan"""
     logger.info("🚀 Starting Healthcare Database Assistant API Server...")
     await initialize_agent()
     await initialize_storage()
+    await start_agent_resources()
     yield
     logger.info("🔄 Shutting down Healthcare Database Assistant API Server...")
     await cleanup_agent()
+    await flush_storage()
 
 app = FastAPI(
     title="Healthcare Database Assistant API",
@@ -155,6 +233,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware, stats=compression_stats)
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = datetime.now()
@@ -162,12 +242,14 @@ async def log_requests(request: Request, call_next):
     try:
         response = await call_next(request)
         process_time = (datetime.now() - start_time).total_seconds()
+        serialize_ms = serialize_ms_from_headers(response.headers)
         
         logger.info(
             f"{request.method} {request.url.path} - "
             f"Status: {response.status_code} - "
             f"Time: {process_time:.4f}s - "
-            f"Client: {request.client.host if request.client else 'unknown'}"
+            + (f"Serialize: {serialize_ms:.3f}ms - " if serialize_ms is not None else "")
+            + f"Client: {request.client.host if request.client else 'unknown'}"
         )
         return response
     except Exception as e:
@@ -191,26 +273,21 @@ async def root():
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Comprehensive health check endpoint"""
-    database_connected = False
-    
-    if agent and hasattr(agent, 'db_connection'):
-        try:
-            connected, error = await agent.db_connection.test_connection()
-            database_connected = connected
-        except Exception as e:
-            logger.warning(f"Database health check failed: {e}")
+    """Comprehensive health check endpoint; reads the cached readiness state instead of querying the database"""
+    core_agent = resolve_core_agent(agent) if resolve_core_agent else None
+    readiness = getattr(getattr(core_agent, 'db_connection', None), 'readiness', None)
+    database_connected = bool(readiness and readiness.is_ready)
     
     return HealthResponse(
-        status="healthy" if agent else "degraded",
+        status="healthy" if agent and database_connected else "degraded",
         timestamp=datetime.now().isoformat(),
         agent_ready=agent is not None,
-        database_connected=database_connected
+        database_connected=database_connected,
+        readiness_state=readiness.state if readiness else None
     )
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, req: Request):
-    """Process chat messages and return structured responses"""
+def _validate_chat_request(request: ChatRequest):
+    """Reject chat requests the agent cannot serve"""
     if not agent:
         raise HTTPException(
             status_code=503,
@@ -228,181 +305,455 @@ async def chat(request: ChatRequest, req: Request):
             status_code=400,
             detail="Message too long. Maximum length is 5000 characters."
         )
+
+async def _log_chat_request(request: ChatRequest, req: Request, session_id: str, endpoint: str) -> Optional[str]:
+    """Log the incoming chat request to API storage"""
+    if not api_storage:
+        return None
+    
+    request_data = {
+        "session_id": session_id,
+        "endpoint": endpoint,
+        "method": "POST",
+        "user_query": request.message,
+        "ip_address": req.client.host if req.client else "",
+        "user_agent": req.headers.get("user-agent", ""),
+        "headers": dict(req.headers)
+    }
+    request_id = await api_storage.log_api_request(request_data)
+    await api_storage.create_or_update_session(session_id, request_data)
+    return request_id
+
+def _record_user_message(session_id: str, message: str) -> Optional[str]:
+    """Append the user message to the session and return recent conversation context"""
+    session = agent_sessions.append_message(session_id, {
+        "role": "user",
+        "content": message,
+        "timestamp": datetime.now().isoformat()
+    })
+    
+    conversation_context = None
+    if len(session["messages"]) > 1:
+        recent_messages = session["messages"][-5:]
+        conversation_context = "\n".join([
+            f"{msg['role']}: {msg['content']}" 
+            for msg in recent_messages[:-1]
+        ])
+    return conversation_context
+
+def _build_chat_response(response_obj: Any, session_id: str, start_time: float,
+                         table_format: str = "legacy") -> ChatResponse:
+    """Convert an agent response into a ChatResponse and record it in the session"""
+    if hasattr(response_obj, 'dict'):
+        response_data = response_obj.dict(exclude={"table_data"})
+        response_data["table_data"] = getattr(response_obj, 'table_data', None)
+    else:
+        response_data = response_obj
+    
+    if "answer" in response_data:
+        response_text = response_data.get("answer", "Query processed successfully")
+    else:
+        response_text = response_data.get("message", "Query processed successfully")
+    
+    sql_query = response_data.get("sql_query") or response_data.get("sql_generated")
+    data = response_data.get("data", [])
+    result_count = response_data.get("result_count", len(data) if data else 0)
+    success = response_data.get("success", True)
+    query_understanding = response_data.get("query_understanding", "")
+    metadata = response_data.get("metadata", {})
+    
+    table_data, table_stats = encode_table(
+        response_data.get("table_data"), table_format,
+        measure_bytes=os.getenv("TABLE_PAYLOAD_METRICS", "false").lower() == "true"
+    )
+    
+    logger.info(f"Response has table_data: {table_data is not None}")
+    
+    processing_time = time.time() - start_time
+    
+    if data and hasattr(data[0], 'data'):
+        data = [item.data for item in data]
+    
+    # Columnar clients get the rows exactly once, inside table_data
+    if table_format == COLUMNAR_FORMAT and table_data is not None:
+        data = []
+    
+    agent_sessions.append_message(session_id, {
+        "role": "assistant",
+        "content": response_text,
+        "timestamp": datetime.now().isoformat(),
+        "sql_query": sql_query,
+        "result_count": result_count
+    })
+    
+    metadata.update({
+        "session_id": session_id,
+        "api_version": "1.0.0",
+        "processing_time": processing_time,
+        "agent_type": metadata.get("agent_type", "unknown")
+    })
+    if table_stats:
+        metadata["table_encoding"] = table_stats
+    
+    return ChatResponse(
+        response=response_text,
+        sql_generated=sql_query,
+        data=data,
+        result_count=result_count,
+        success=success,
+        session_id=session_id,
+        query_understanding=query_understanding,
+        metadata=metadata,
+        table_data=table_data
+    )
+
+def _build_chat_error_response(request: ChatRequest, session_id: str, error: Exception) -> ChatResponse:
+    """Build the error ChatResponse and record the failure in the session"""
+    if session_id in agent_sessions:
+        agent_sessions.append_message(session_id, {
+            "role": "assistant",
+            "content": f"Error: {str(error)}",
+            "timestamp": datetime.now().isoformat(),
+            "error": True
+        })
+    
+    return ChatResponse(
+        response=f"I apologize, but I encountered an error while processing your request: {str(error)}",
+        sql_generated=None,
+        data=[],
+        result_count=0,
+        success=False,
+        session_id=session_id,
+        query_understanding=f"Error processing: {request.message}",
+        metadata={"error": str(error), "session_id": session_id}
+    )
+
+async def _log_chat_response(request_id: Optional[str], session_id: str, chat_response: ChatResponse,
+                             processing_time: float, update_analytics: bool = True):
+    """Log the chat response and session outcome to API storage"""
+    if not (api_storage and request_id):
+        return
+    
+    response_dict = chat_response.dict()
+    await api_storage.log_api_response(request_id, response_dict, processing_time)
+    await api_storage.update_session_result(session_id, chat_response.success, processing_time)
+    if update_analytics:
+        await api_storage.update_analytics()
+
+async def _run_agent(message: str, session_id: str, conversation_context: Optional[str],
+                     request_id: Optional[str] = None, bypass_cache: bool = False) -> Any:
+    """Run the shared agent for one message inside its own RequestContext"""
+    # Pools are owned by resource_lifecycle and shared by all requests,
+    # so the agent is used directly instead of per-request `async with`.
+    # Per-request results travel in the RequestContext, so concurrent
+    # chats on the shared agent cannot see each other's tables.
+    with request_scope(session_id=session_id, request_id=request_id, bypass_cache=bypass_cache):
+        if hasattr(agent, 'process_query'):
+            return await agent.process_query(
+                message, 
+                conversation_context=conversation_context,
+                session_id=session_id
+            )
+        return await agent.answer_question(
+            message, 
+            session_id=session_id
+        )
+
+def _admission_error(rejection: AdmissionRejected) -> HTTPException:
+    """Translate an admission rejection into a fast 429 with Retry-After"""
+    logger.warning(f"Rejecting chat request ({rejection.reason}), retry after {rejection.retry_after}s")
+    return HTTPException(
+        status_code=429,
+        detail=f"Server is at capacity ({rejection.reason}). Please retry later.",
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
+
+async def _admit_chat_request() -> float:
+    """Wait for an agent slot, or fail fast when the wait queue is full or the deadline passes"""
+    try:
+        return await chat_admission.acquire()
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+
+def _slot_releaser(service_start: float) -> Callable[[], None]:
+    """Return a callable that gives the admission slot back exactly once"""
+    released = False
+    
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            chat_admission.release(time.time() - service_start)
+    return release
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """StreamingResponse that releases its admission slot even if the stream never starts"""
+    
+    def __init__(self, *args, release, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = release
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+def _format_sse(event: str, data: Any) -> str:
+    """Format a single Server-Sent Events frame"""
+    return f"event: {event}\ndata: {dumps_bytes(data).decode('utf-8')}\n\n"
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, req: Request):
+    """Process chat messages and return structured responses"""
+    _validate_chat_request(request)
+    table_format = negotiate_table_format(req.headers.get(TABLE_FORMAT_HEADER))
+    response_headers = {TABLE_FORMAT_HEADER: table_format}
     
     session_id = request.session_id
     if not session_id:
         session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
+    queue_wait = await _admit_chat_request()
     start_time = time.time()
     request_id = None
     
     try:
         logger.info(f"Processing chat request for session {session_id}: {request.message}")
         
-        if api_storage:
-            request_data = {
-                "session_id": session_id,
-                "endpoint": "/chat",
-                "method": "POST",
-                "user_query": request.message,
-                "ip_address": req.client.host if req.client else "",
-                "user_agent": req.headers.get("user-agent", ""),
-                "headers": dict(req.headers)
-            }
-            request_id = await api_storage.log_api_request(request_data)
-            await api_storage.create_or_update_session(session_id, request_data)
+        request_id = await _log_chat_request(request, req, session_id, "/chat")
+        conversation_context = _record_user_message(session_id, request.message)
         
-        if session_id not in agent_sessions:
-            agent_sessions[session_id] = {
-                "created_at": datetime.now().isoformat(),
-                "messages": []
-            }
+        response_obj = await _run_agent(request.message, session_id, conversation_context, request_id,
+                                        bypass_cache=request.bypass_cache)
         
-        agent_sessions[session_id]["messages"].append({
-            "role": "user",
-            "content": request.message,
-            "timestamp": datetime.now().isoformat()
-        })
+        chat_response = _build_chat_response(response_obj, session_id, start_time, table_format)
+        chat_response.metadata["queue_wait_seconds"] = round(queue_wait, 4)
+        await _log_chat_response(request_id, session_id, chat_response, time.time() - start_time)
         
-        conversation_context = None
-        if len(agent_sessions[session_id]["messages"]) > 1:
-            recent_messages = agent_sessions[session_id]["messages"][-5:]
-            conversation_context = "\n".join([
-                f"{msg['role']}: {msg['content']}" 
-                for msg in recent_messages[:-1]
-            ])
+        chat_latency.record(time.time() - start_time + queue_wait)
+        # The response was validated when it was built; dump it straight to bytes
+        return FastJSONResponse(chat_response, headers=response_headers)
         
-        if hasattr(agent, '__aenter__'):
-            async with agent as ctx_agent:
-                if hasattr(ctx_agent, 'process_query'):
-                    response_obj = await ctx_agent.process_query(
-                        request.message, 
-                        conversation_context=conversation_context
-                    )
-                else:
-                    response_obj = await ctx_agent.answer_question(
-                        request.message, 
-                        session_id=session_id
-                    )
-        else:
-            if hasattr(agent, 'process_query'):
-                response_obj = await agent.process_query(
-                    request.message, 
-                    conversation_context=conversation_context
-                )
-            else:
-                response_obj = await agent.answer_question(
-                    request.message, 
-                    session_id=session_id
-                )
-        
-        if hasattr(response_obj, 'dict'):
-            response_data = response_obj.dict()
-        else:
-            response_data = response_obj
-        
-        if "answer" in response_data:
-            response_text = response_data.get("answer", "Query processed successfully")
-        else:
-            response_text = response_data.get("message", "Query processed successfully")
-        
-        sql_query = response_data.get("sql_query") or response_data.get("sql_generated")
-        data = response_data.get("data", [])
-        result_count = response_data.get("result_count", len(data) if data else 0)
-        success = response_data.get("success", True)
-        query_understanding = response_data.get("query_understanding", "")
-        metadata = response_data.get("metadata", {})
+    except Exception as e:
+        logger.error(f"Error processing chat request: {e}")
+        error_response = _build_chat_error_response(request, session_id, e)
+        await _log_chat_response(request_id, session_id, error_response, time.time() - start_time, update_analytics=False)
+        return FastJSONResponse(error_response, headers=response_headers)
+    finally:
+        chat_admission.release(time.time() - start_time)
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, req: Request):
+    """Process a chat message and stream progress as Server-Sent Events
+    
+    Emits session, status, tool_start/tool_end, sql, table and token events
+    while the agent works, then a final event whose data is the same
+    ChatResponse that /chat returns.
+    """
+    _validate_chat_request(request)
+    
+    if not (hasattr(agent, 'stream_question') or hasattr(agent, 'stream_query')):
+        raise HTTPException(
+            status_code=501,
+            detail="Streaming is not supported by the configured agent."
+        )
+    
+    # The slot is taken before the 200 is committed, so a full queue or a
+    # queue timeout reaches streaming clients as a 429 with Retry-After
+    queue_wait = await _admit_chat_request()
+    release = _slot_releaser(time.time())
+    
+    session_id = request.session_id
+    if not session_id:
+        session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    table_format = negotiate_table_format(req.headers.get(TABLE_FORMAT_HEADER))
+    
+    return AdmittedStreamingResponse(
+        _chat_event_stream(request, req, session_id, queue_wait, release, table_format),
+        release=release,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", TABLE_FORMAT_HEADER: table_format}
+    )
+
+async def _chat_event_stream(request: ChatRequest, req: Request, session_id: str, queue_wait: float,
+                             release: Callable[[], None], table_format: str = "legacy"):
+    """Relay agent events as SSE frames, logging to storage after the final frame"""
+    start_time = time.time()
+    request_id = None
+    chat_response = None
+    first_event_at = None
+    
+    try:
+        yield _format_sse("session", {"session_id": session_id})
         
-        table_data = response_data.get("table_data")
-        if table_data and hasattr(table_data, 'dict'):
-            table_data = table_data.dict()
+        logger.info(f"Streaming chat request for session {session_id}: {request.message}")
         
-        logger.info(f"Response has table_data: {table_data is not None}")
+        request_id = await _log_chat_request(request, req, session_id, "/chat/stream")
+        conversation_context = _record_user_message(session_id, request.message)
         
-        processing_time = time.time() - start_time
+        if hasattr(agent, 'stream_question'):
+            events = agent.stream_question(request.message, session_id=session_id,
+                                           conversation_context=conversation_context)
+        else:
+            events = agent.stream_query(request.message, conversation_context=conversation_context)
         
-        if data and hasattr(data[0], 'data'):
-            data = [item.data for item in data]
+        with request_scope(session_id=session_id, request_id=request_id, bypass_cache=request.bypass_cache):
+            async for event in events:
+                if first_event_at is None and event["event"] != "status":
+                    first_event_at = time.time() - start_time
+            
+                if event["event"] == "final":
+                    chat_response = _build_chat_response(event["data"], session_id, start_time, table_format)
+                    chat_response.metadata["time_to_first_event"] = first_event_at
+                    chat_response.metadata["queue_wait_seconds"] = round(queue_wait, 4)
+                    yield _format_sse("final", chat_response)
+                elif event["event"] == "table":
+                    yield _format_sse("table", encode_table(event["data"], table_format)[0])
+                else:
+                    yield _format_sse(event["event"], event["data"])
         
-        agent_sessions[session_id]["messages"].append({
-            "role": "assistant",
-            "content": response_text,
-            "timestamp": datetime.now().isoformat(),
-            "sql_query": sql_query,
-            "result_count": result_count
-        })
+    except Exception as e:
+        logger.error(f"Error streaming chat request: {e}")
+        chat_response = _build_chat_error_response(request, session_id, e)
+        yield _format_sse("final", chat_response)
+    finally:
+        release()
+    
+    processing_time = time.time() - start_time
+    if chat_response is not None:
+        if chat_response.success:
+            chat_latency.record(processing_time + queue_wait)
+        try:
+            await _log_chat_response(request_id, session_id, chat_response, processing_time)
+        except Exception as e:
+            logger.error(f"Error logging streamed chat response: {e}")
+
+async def _run_batch_item(index: int, question: BatchQuestion, session_id: str, req: Request,
+                          table_format: str = "legacy") -> BatchItemResult:
+    """Answer one batch question, turning every failure into a per-item status"""
+    start_time = time.time()
+    chat_request = ChatRequest(message=question.message, session_id=session_id, bypass_cache=question.bypass_cache)
+    
+    try:
+        _validate_chat_request(chat_request)
+    except HTTPException as e:
+        return BatchItemResult(index=index, status="invalid", session_id=session_id, error=e.detail)
+    
+    try:
+        queue_wait = await chat_admission.acquire(timeout=float(os.getenv("BATCH_QUEUE_TIMEOUT", "300")))
+    except AdmissionRejected as e:
+        return BatchItemResult(
+            index=index, status="rejected", session_id=session_id,
+            duration_seconds=time.time() - start_time,
+            error=f"{e.reason}; retry after {e.retry_after}s"
+        )
+    
+    service_start = time.time()
+    request_id = None
+    try:
+        request_id = await _log_chat_request(chat_request, req, session_id, "/chat/batch")
+        conversation_context = _record_user_message(session_id, question.message)
+        response_obj = await _run_agent(question.message, session_id, conversation_context, request_id,
+                                        bypass_cache=question.bypass_cache)
         
-        metadata.update({
-            "session_id": session_id,
-            "api_version": "1.0.0",
-            "processing_time": processing_time,
-            "agent_type": metadata.get("agent_type", "unknown")
-        })
+        chat_response = _build_chat_response(response_obj, session_id, service_start, table_format)
+        chat_response.metadata["queue_wait_seconds"] = round(queue_wait, 4)
+        await _log_chat_response(request_id, session_id, chat_response, time.time() - service_start)
         
-        chat_response = ChatResponse(
-            response=response_text,
-            sql_generated=sql_query,
-            data=data,
-            result_count=result_count,
-            success=success,
+        return BatchItemResult(
+            index=index,
+            status="ok" if chat_response.success else "error",
             session_id=session_id,
-            query_understanding=query_understanding,
-            metadata=metadata,
-            table_data=table_data
+            duration_seconds=time.time() - start_time,
+            response=chat_response,
+            error=None if chat_response.success else chat_response.metadata.get("error")
         )
-        
-        if api_storage and request_id:
-            response_dict = chat_response.dict()
-            await api_storage.log_api_response(request_id, response_dict, processing_time)
-            await api_storage.update_session_result(session_id, success, processing_time)
-            await api_storage.update_analytics()
-        
-        return chat_response
-        
     except Exception as e:
-        logger.error(f"Error processing chat request: {e}")
-        processing_time = time.time() - start_time
-        
-        if session_id in agent_sessions:
-            agent_sessions[session_id]["messages"].append({
-                "role": "assistant",
-                "content": f"Error: {str(e)}",
-                "timestamp": datetime.now().isoformat(),
-                "error": True
-            })
-        
-        error_response = ChatResponse(
-            response=f"I apologize, but I encountered an error while processing your request: {str(e)}",
-            sql_generated=None,
-            data=[],
-            result_count=0,
-            success=False,
-            session_id=session_id,
-            query_understanding=f"Error processing: {request.message}",
-            metadata={"error": str(e), "session_id": session_id}
+        logger.error(f"Error processing batch item {index}: {e}")
+        error_response = _build_chat_error_response(chat_request, session_id, e)
+        await _log_chat_response(request_id, session_id, error_response, time.time() - service_start, update_analytics=False)
+        return BatchItemResult(
+            index=index, status="error", session_id=session_id,
+            duration_seconds=time.time() - start_time, response=error_response, error=str(e)
         )
-        
-        if api_storage and request_id:
-            response_dict = error_response.dict()
-            await api_storage.log_api_response(request_id, response_dict, processing_time)
-            await api_storage.update_session_result(session_id, False, processing_time)
-        
-        return error_response
+    finally:
+        chat_admission.release(time.time() - service_start)
+
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest, req: Request):
+    """Answer a list of questions with bounded parallelism
+    
+    Questions that share a session_id form a group and run in order so
+    follow-ups see earlier answers; independent groups run concurrently.
+    Results come back in input order and failures are reported per item.
+    """
+    if not agent:
+        raise HTTPException(
+            status_code=503,
+            detail="Agent not available. Please check server logs."
+        )
+    
+    max_questions = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one question")
+    if len(request.questions) > max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large. Maximum is {max_questions} questions."
+        )
+    
+    table_format = negotiate_table_format(req.headers.get(TABLE_FORMAT_HEADER))
+    
+    max_parallel = request.max_parallel or int(os.getenv("BATCH_MAX_PARALLEL", "4"))
+    max_parallel = max(1, min(max_parallel, chat_admission.max_concurrent))
+    
+    # Ungrouped questions get their own session; the random part keeps two
+    # batches started in the same second from sharing conversations
+    batch_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    groups: Dict[str, List[int]] = {}
+    for index, question in enumerate(request.questions):
+        session_id = question.session_id or f"batch_{batch_id}_{index}"
+        groups.setdefault(session_id, []).append(index)
+    
+    results: List[Optional[BatchItemResult]] = [None] * len(request.questions)
+    group_slots = asyncio.Semaphore(max_parallel)
+    
+    async def run_group(session_id: str, indexes: List[int]):
+        async with group_slots:
+            for index in indexes:
+                results[index] = await _run_batch_item(index, request.questions[index], session_id, req, table_format)
+    
+    start_time = time.time()
+    logger.info(f"Processing batch of {len(request.questions)} questions in {len(groups)} groups (parallel={max_parallel})")
+    await asyncio.gather(*(run_group(session_id, indexes) for session_id, indexes in groups.items()))
+    duration = time.time() - start_time
+    
+    succeeded = sum(1 for result in results if result.status == "ok")
+    batch_response = BatchChatResponse(
+        results=results,
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        max_parallel=max_parallel,
+        duration_seconds=duration,
+        throughput_per_second=len(results) / duration if duration > 0 else 0.0
+    )
+    return FastJSONResponse(batch_response, headers={TABLE_FORMAT_HEADER: table_format})
 
 @app.post("/end_session", response_model=SessionResponse)
 async def end_session(session_id: str):
     """End a chat session and clean up resources"""
     try:
         if session_id in agent_sessions:
-            session_data = agent_sessions[session_id]
-            
             if agent and hasattr(agent, 'save_session_summary'):
                 try:
                     await agent.save_session_summary()
                 except Exception as e:
                     logger.warning(f"Error saving session summary: {e}")
             
-            del agent_sessions[session_id]
+            agent_sessions.delete(session_id)
             
             return SessionResponse(
                 message=f"Session {session_id} ended successfully",
@@ -428,21 +779,93 @@ async def end_session(session_id: str):
 async def list_sessions():
     """List all active sessions"""
     return {
-        "active_sessions": list(agent_sessions.keys()),
+        "active_sessions": agent_sessions.keys(),
         "total_sessions": len(agent_sessions),
+        "store_stats": agent_sessions.get_stats(),
         "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/sessions/{session_id}")
 async def get_session(session_id: str):
     """Get session details"""
-    if session_id not in agent_sessions:
+    session_data = agent_sessions.get(session_id)
+    if session_data is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return {
+    return FastJSONResponse({
         "session_id": session_id,
-        "session_data": agent_sessions[session_id],
-        "message_count": len(agent_sessions[session_id]["messages"]),
+        "session_data": session_data,
+        "message_count": len(session_data["messages"]),
+        "timestamp": datetime.now().isoformat()
+    })
+
+def _core_answer_cache():
+    """Answer cache owned by the ReAct agent, if the running agent has one"""
+    core_agent = resolve_core_agent(agent) if resolve_core_agent else None
+    return getattr(core_agent, 'answer_cache', None)
+
+@app.get("/answer-cache/stats")
+async def get_answer_cache_stats():
+    """Get answer cache and semantic SQL reuse statistics"""
+    answer_cache = _core_answer_cache()
+    if answer_cache is None:
+        raise HTTPException(status_code=503, detail="Answer cache not available")
+    
+    semantic_cache = getattr(resolve_core_agent(agent), 'semantic_cache', None)
+    return {
+        "stats": answer_cache.get_stats(),
+        "semantic_sql": semantic_cache.get_stats() if semantic_cache else None,
+        "schema_version": getattr(resolve_core_agent(agent), 'schema_version', None),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/answer-cache/invalidate")
+async def invalidate_answer_cache(question: Optional[str] = None, reload_schema: bool = False):
+    """Invalidate cached answers after a data load or schema change
+    
+    Drops every cached answer, or only those for ``question``. With
+    ``reload_schema`` the schema description is reloaded first, answers
+    built for an older schema version are dropped and reusable SQL is
+    forgotten. Reusable SQL survives data loads since it is re-executed.
+    """
+    answer_cache = _core_answer_cache()
+    if answer_cache is None:
+        raise HTTPException(status_code=503, detail="Answer cache not available")
+    
+    if reload_schema:
+        removed = resolve_core_agent(agent).refresh_schema_version()
+    else:
+        removed = answer_cache.invalidate(question)
+    
+    return {
+        "removed": removed,
+        "question": question,
+        "reload_schema": reload_schema,
+        "stats": answer_cache.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Get in-process runtime metrics (resources, storage writer, admission, latency, serialization, compression, caches and templates)"""
+    answer_cache = _core_answer_cache()
+    core_agent = resolve_core_agent(agent) if resolve_core_agent else None
+    semantic_cache = getattr(core_agent, 'semantic_cache', None)
+    return {
+        "resource_lifecycle": resource_lifecycle.get_stats() if resource_lifecycle else None,
+        "storage_write_behind": api_storage.write_behind.get_stats() if getattr(api_storage, 'write_behind', None) else None,
+        "chat_latency_seconds": chat_latency.summary(),
+        "admission": chat_admission.get_stats(),
+        "serialization_seconds": serialization_latency.summary(),
+        "compression": compression_stats.get_stats(),
+        "answer_cache": answer_cache.get_stats() if answer_cache else None,
+        "semantic_sql_cache": semantic_cache.get_stats() if semantic_cache else None,
+        "query_templates": core_agent.get_template_stats() if hasattr(core_agent, 'get_template_stats') else None,
+        "sql_rewriter": core_agent.sql_rewriter.get_stats() if hasattr(core_agent, 'sql_rewriter') else None,
+        "prompt": core_agent.get_prompt_stats() if hasattr(core_agent, 'get_prompt_stats') else None,
+        "agent_steps": core_agent.get_agent_step_stats() if hasattr(core_agent, 'get_agent_step_stats') else None,
+        "tool_concurrency": core_agent.prefetcher.get_stats() if hasattr(core_agent, 'prefetcher') else None,
+        "llm_cache": llm_cache_stats(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -454,7 +877,7 @@ async def get_analytics(days: int = 7):
     
     try:
         analytics = await api_storage.get_api_analytics(days)
-        return analytics
+        return FastJSONResponse(analytics)
     except Exception as e:
         logger.error(f"Error getting analytics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -467,7 +890,7 @@ async def get_storage_stats():
     
     try:
         stats = await api_storage.get_storage_stats()
-        return stats
+        return FastJSONResponse(stats)
     except Exception as e:
         logger.error(f"Error getting storage stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -550,8 +973,7 @@ async def check_rate_limit_status(ip_address: str, endpoint: str = "/chat"):
 async def reset_session(session_id: Optional[str] = None):
     """Reset/clear session conversation history and create a new session"""
     try:
-        if session_id and session_id in agent_sessions:
-            del agent_sessions[session_id]
+        if session_id and agent_sessions.delete(session_id):
             logger.info(f"Cleared existing session: {session_id}")
         
         if agent:
@@ -615,16 +1037,27 @@ def main():
     parser.add_argument("--port", type=int, default=8002, help="Port to bind to")
     parser.add_argument("--reload", action="store_true", help="Enable auto-reload")
     parser.add_argument("--log-level", default="info", help="Log level")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")),
+                        help="Number of worker processes (sessions and memory are shared through SQLite)")
     
     args = parser.parse_args()
     
-    logger.info(f"Starting server on {args.host}:{args.port}")
+    if args.workers > 1:
+        if args.reload:
+            parser.error("--reload cannot be combined with --workers")
+        # uvicorn spawns workers that import the app afresh, so each opens its
+        # own pools after startup; they inherit only the environment, which
+        # makes them all pick the process-shared session store.
+        os.environ.setdefault("SESSION_STORE_BACKEND", "sqlite")
+    
+    logger.info(f"Starting server on {args.host}:{args.port} with {args.workers} worker(s)")
     
     uvicorn.run(
         "api_server:app",
         host=args.host,
         port=args.port,
         reload=args.reload,
+        workers=args.workers,
         log_level=args.log_level
     )
 
@@ -25,8 +25,39 @@ interface TableData {
   headers: string[];
   data: Record<string, any>[];
   row_count: number;
+  truncated?: boolean;
 }
 
+// Compact wire format requested with the X-Table-Format header: headers once,
+// rows as arrays, repeated strings as indexes into per-column dictionaries.
+// dictionaries is aligned with headers (null for plain columns) so duplicate
+// column names each keep their own dictionary.
+interface ColumnarTableData {
+  format: 'columnar';
+  headers: string[];
+  rows: any[][];
+  row_count: number;
+  truncated?: boolean;
+  dictionaries?: (string[] | null)[];
+}
+
+const decodeTable = (table?: TableData | ColumnarTableData | null): TableData | undefined => {
+  if (!table) return undefined;
+  if ((table as ColumnarTableData).format !== 'columnar') return table as TableData;
+
+  const { headers, rows, row_count, truncated = false, dictionaries = [] } = table as ColumnarTableData;
+  const lookups = headers.map((_, i) => dictionaries[i]);
+  const data = rows.map(row => {
+    const record: Record<string, any> = {};
+    headers.forEach((header, i) => {
+      const value = row[i];
+      record[header] = lookups[i] && value !== null ? lookups[i][value] : value;
+    });
+    return record;
+  });
+  return { headers, data, row_count, truncated };
+};
+
 interface ApiResponse {
   response: string;
   sql_generated?: string;
@@ -35,7 +66,7 @@ interface ApiResponse {
   success: boolean;
   session_id?: string;
   query_understanding?: string;
-  table_data?: TableData;
+  table_data?: TableData | ColumnarTableData;
   metadata?: {
     processing_time?: number;
     agent_type?: string;
@@ -132,6 +163,104 @@ const ChatAssistant: React.FC<ChatAssistantProps> = ({
     scrollToBottom();
   }, [messages]);
 
+  const upsertMessage = (message: Message) => {
+    setMessages(prev => {
+      const index = prev.findIndex(m => m.id === message.id);
+      if (index === -1) {
+        return [...prev, message];
+      }
+      const next = [...prev];
+      next[index] = message;
+      return next;
+    });
+  };
+
+  const updateStreamingMessage = (id: string, update: (message: Message) => Message) => {
+    setMessages(prev => {
+      const index = prev.findIndex(m => m.id === id);
+      const current: Message = index === -1
+        ? { id, text: '', isUser: false, timestamp: new Date(), success: true }
+        : prev[index];
+      const next = index === -1 ? [...prev, current] : [...prev];
+      next[index === -1 ? next.length - 1 : index] = update(current);
+      return next;
+    });
+  };
+
+  // Streams /chat/stream (Server-Sent Events) into a placeholder assistant
+  // message so SQL, tables and text appear as soon as the agent produces them.
+  // Resolves with the final ChatResponse, or null if nothing was streamed.
+  const streamChat = async (requestBody: any, assistantId: string): Promise<ApiResponse | null> => {
+    const response = await fetch(`${apiEndpoint}/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream',
+        'X-Table-Format': 'columnar',
+      },
+      body: JSON.stringify(requestBody)
+    });
+
+    if (!response.ok || !response.body) {
+      return null;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let finalResponse: ApiResponse | null = null;
+
+    const handleEvent = (event: string, payload: any) => {
+      switch (event) {
+        case 'session':
+          if (payload.session_id && !sessionId) {
+            setSessionId(payload.session_id);
+          }
+          break;
+        case 'sql':
+          updateStreamingMessage(assistantId, m => ({ ...m, sql_query: payload.sql }));
+          break;
+        case 'table':
+          updateStreamingMessage(assistantId, m => ({ ...m, table_data: decodeTable(payload), result_count: payload.row_count }));
+          break;
+        case 'token':
+          updateStreamingMessage(assistantId, m => ({ ...m, text: m.text + payload.text }));
+          break;
+        case 'final':
+          finalResponse = payload;
+          break;
+      }
+    };
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        let event = 'message';
+        const dataLines: string[] = [];
+        for (const line of frame.split('\n')) {
+          if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+          } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+          }
+        }
+        if (dataLines.length > 0) {
+          handleEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+      }
+    }
+
+    return finalResponse;
+  };
+
   const sendMessage = async (messageText?: string) => {
     const textToSend = messageText || inputMessage;
     if (!textToSend.trim()) return;
@@ -158,19 +287,31 @@ const ChatAssistant: React.FC<ChatAssistantProps> = ({
         requestBody.session_id = sessionId;
       }
 
-      const response = await fetch(apiEndpoint, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(requestBody)
-      });
+      const assistantId = (Date.now() + 1).toString();
+      let data: ApiResponse | null = null;
 
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
+      try {
+        data = await streamChat(requestBody, assistantId);
+      } catch (streamError) {
+        console.warn('Chat stream unavailable, falling back to /chat:', streamError);
       }
 
-      const data: ApiResponse = await response.json();
+      if (!data) {
+        const response = await fetch(apiEndpoint, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            'X-Table-Format': 'columnar',
+          },
+          body: JSON.stringify(requestBody)
+        });
+
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        data = await response.json();
+      }
       
       // Update session ID if provided
       if (data.session_id && !sessionId) {
@@ -178,7 +319,7 @@ const ChatAssistant: React.FC<ChatAssistantProps> = ({
       }
       
       const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
+        id: assistantId,
         text: data.response || 'I apologize, but I encountered an error processing your request.',
         isUser: false,
         timestamp: new Date(),
@@ -186,10 +327,10 @@ const ChatAssistant: React.FC<ChatAssistantProps> = ({
         result_count: data.result_count,
         processing_time: data.metadata?.processing_time,
         success: data.success,
-        table_data: data.table_data
+        table_data: decodeTable(data.table_data)
       };
 
-      setMessages(prev => [...prev, assistantMessage]);
+      upsertMessage(assistantMessage);
       
       // Generate new questions after each response
       const newQuestions = getRandomQuestions();
@@ -333,7 +474,12 @@ const ChatAssistant: React.FC<ChatAssistantProps> = ({
             </table>
             {tableData.data.length > 20 && (
               <div className="px-6 py-3 text-center text-xs text-slate-500 bg-slate-50 border-t border-slate-200">
-                Displaying first 20 of {tableData.row_count} records
+                Displaying first 20 of {tableData.row_count}{tableData.truncated ? '+' : ''} records
+              </div>
+            )}
+            {tableData.truncated && tableData.data.length <= 20 && (
+              <div className="px-6 py-3 text-center text-xs text-slate-500 bg-slate-50 border-t border-slate-200">
+                Result truncated at {tableData.row_count} records
               </div>
             )}
           </div>
@@ -0,0 +1,103 @@
+"""
+Compare agent latency with per-request resources against long-lived resources
+
+``per_request`` reproduces the old request path: every question runs inside
+``async with agent`` and the pool and HTTP session are torn down afterwards.
+``lifecycle`` starts an AgentResourceLifecycle once, as the API server does,
+and reuses the warm resources for every question. Both modes bypass the
+answer cache so each question reaches the database and the LLM.
+
+Needs the same DB_* and AZURE_OPENAI_* environment as the API server:
+
+    python scripts/benchmark_agent_lifecycle.py --rounds 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.agents.lifecycle import AgentResourceLifecycle
+from src.agents.react_agent import LangGraphReActDatabaseAgent
+from src.state.request_context import request_scope
+from src.utils.metrics import LatencyTracker
+
+DEFAULT_QUESTIONS = [
+    "How many patients are in the database?",
+    "List the 10 most common conditions",
+    "Show patients living in Boston",
+]
+
+
+async def run_per_request(questions: List[str], rounds: int) -> LatencyTracker:
+    """Open and close the agent's resources around every question"""
+    agent = LangGraphReActDatabaseAgent()
+    tracker = LatencyTracker()
+    for _ in range(rounds):
+        for question in questions:
+            start = time.perf_counter()
+            async with agent:
+                with request_scope(bypass_cache=True):
+                    await agent.process_query(question)
+            tracker.record(time.perf_counter() - start)
+    return tracker
+
+
+async def run_lifecycle(questions: List[str], rounds: int) -> LatencyTracker:
+    """Warm the agent's resources once and keep them for every question"""
+    agent = LangGraphReActDatabaseAgent()
+    lifecycle = AgentResourceLifecycle(agent)
+    await lifecycle.start()
+    tracker = LatencyTracker()
+    try:
+        for _ in range(rounds):
+            for question in questions:
+                start = time.perf_counter()
+                with request_scope(bypass_cache=True):
+                    await agent.process_query(question)
+                tracker.record(time.perf_counter() - start)
+    finally:
+        await lifecycle.shutdown()
+    return tracker
+
+
+def _row(mode: str, tracker: LatencyTracker) -> Dict[str, Any]:
+    summary = tracker.summary()
+    return {"mode": mode, "requests": summary["total_count"], "p50": summary["p50"],
+            "p95": summary["p95"], "mean": summary["mean"]}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request vs long-lived agent resources")
+    parser.add_argument("--rounds", type=int, default=5, help="Times each question is asked per mode")
+    parser.add_argument("--question", action="append", dest="questions",
+                        help="Question to ask (repeatable); defaults to a small built-in set")
+    parser.add_argument("--mode", choices=["both", "per_request", "lifecycle"], default="both")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    questions = args.questions or DEFAULT_QUESTIONS
+    rows = []
+    if args.mode in ("both", "per_request"):
+        rows.append(_row("per_request", await run_per_request(questions, args.rounds)))
+    if args.mode in ("both", "lifecycle"):
+        rows.append(_row("lifecycle", await run_lifecycle(questions, args.rounds)))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'mode':<12} {'requests':>8} {'p50 (s)':>10} {'p95 (s)':>10} {'mean (s)':>10}")
+    for row in rows:
+        print(f"{row['mode']:<12} {row['requests']:>8} {row['p50']:>10} {row['p95']:>10} {row['mean']:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -37,6 +37,9 @@ except ImportError:
         print("Warning: JSONResponseSaver not available")
         JSON_SAVER_AVAILABLE = False
 
+from src.state.request_context import request_scope
+from src.utils.table_codec import encode_table, COLUMNAR_FORMAT
+
 class AzureReActDatabaseAgent:
     """Enhanced database agent with JSON memory and response saving"""
     
@@ -71,146 +74,203 @@ class AzureReActDatabaseAgent:
     
     async def process_query(self, user_question: str, conversation_context: str = None, session_id: str = None) -> dict:
         """Process query - alias for answer_question for API compatibility"""
-        return await self.answer_question(user_question, session_id=session_id)
+        return await self.answer_question(user_question, session_id=session_id, conversation_context=conversation_context)
 
-    async def answer_question(self, user_question: str, session_id: str = None, schema_description: str = None) -> dict:
+    async def answer_question(self, user_question: str, session_id: str = None, schema_description: str = None,
+                              conversation_context: str = None) -> dict:
         """Answer user question with enhanced JSON memory and response saving"""
+        with request_scope(session_id=session_id) as request_context:
+            return await self._answer_question_in_context(user_question, request_context.session_id, schema_description,
+                                                          conversation_context)
+    
+    async def _answer_question_in_context(self, user_question: str, session_id: str = None, schema_description: str = None,
+                                          conversation_context: str = None) -> dict:
+        """Answer a question inside an active RequestContext without mutating shared agent state"""
+        actual_session_id = None
         try:
-            if self.memory_manager:
-                actual_session_id = self.memory_manager.current_session_id
-                self.session_id = actual_session_id
-                logger.info(f"Using memory manager session ID: {actual_session_id}")
-            else:
-                if session_id and session_id != self.session_id:
-                    self.session_id = session_id
-                    logger.info(f"Session ID updated to: {session_id}")
-                actual_session_id = self.session_id
-            
-            logger.info(f"Processing question: '{user_question}' for session: {actual_session_id}")
-            
-            conversation_context = ""
-            if self.memory_manager:
-                try:
-                    conversation_context = self.memory_manager.get_conversation_context()
-                    logger.info(f"Retrieved conversation context: {len(conversation_context)} characters")
-                    if self._is_follow_up_question(user_question):
-                        enhanced_question = self._enhance_question_with_context(user_question, conversation_context)
-                        logger.info(f"Enhanced follow-up question: {enhanced_question}")
-                        user_question = enhanced_question
-                except Exception as e:
-                    logger.error(f"Error retrieving conversation context: {e}")
-                    conversation_context = ""
+            actual_session_id, user_question, conversation_context = self._prepare_question(
+                user_question, session_id, conversation_context
+            )
             
             start_time = datetime.now()
             response_obj = await self.agent.process_query(user_question, conversation_context)
             processing_time = (datetime.now() - start_time).total_seconds()
             
-            if hasattr(response_obj, 'dict'):
-                pydantic_response = response_obj.dict()
-            else:
-                pydantic_response = {
-                    "success": getattr(response_obj, 'success', False),
-                    "message": getattr(response_obj, 'message', 'No message'),
-                    "query_understanding": getattr(response_obj, 'query_understanding', user_question),
-                    "sql_query": getattr(response_obj, 'sql_query', None),
-                    "result_count": getattr(response_obj, 'result_count', 0),
-                    "results": getattr(response_obj, 'results', []),
-                    "table_data": getattr(response_obj, 'table_data', None),
-                    "metadata": getattr(response_obj, 'metadata', {})
-                }
-            
-            enhanced_response = {
-                "success": pydantic_response.get("success", False),
-                "answer": pydantic_response.get("message", "No response"),
-                "message": pydantic_response.get("message", "No response"),
-                "query_understanding": pydantic_response.get("query_understanding", user_question),
-                "data": self._extract_data_from_results(pydantic_response.get("results", [])),
-                "sql_generated": pydantic_response.get("sql_query"),
-                "sql_query": pydantic_response.get("sql_query"),
-                "result_count": pydantic_response.get("result_count", 0),
-                "table_data": pydantic_response.get("table_data"),
-                "metadata": {
-                    **pydantic_response.get("metadata", {}),
-                    "processing_time_seconds": processing_time,
-                    "session_id": actual_session_id,
-                    "timestamp": datetime.now().isoformat(),
-                    "agent_type": "enhanced_react_agent_with_json_memory",
-                    "memory_enabled": JSON_MEMORY_AVAILABLE,
-                    "response_saving_enabled": JSON_SAVER_AVAILABLE
-                },
-                "timestamp": datetime.now().isoformat(),
-                "powered_by": "Enhanced LangGraph ReAct Agent with JSON Memory",
-                "structured_response": pydantic_response,
-                "session_id": actual_session_id
-            }
-            
-            if self.memory_manager:
-                try:
-                    memory_summary = self.memory_manager.get_session_summary()
-                    enhanced_response["metadata"]["memory_summary"] = memory_summary
-                    
-                    interaction_id = self.memory_manager.add_interaction(user_question, enhanced_response)
-                    enhanced_response["metadata"]["interaction_id"] = interaction_id
-                except Exception as e:
-                    logger.error(f"Error adding interaction to memory: {e}")
-                    enhanced_response["metadata"]["memory_error"] = str(e)
-            
-            if self.response_saver:
-                try:
-                    saved_file = self.response_saver.save_response(enhanced_response, user_question, actual_session_id)
-                    if saved_file:
-                        enhanced_response["metadata"]["saved_to_file"] = saved_file
-                        logger.info(f"Response saved to: {saved_file}")
-                except Exception as e:
-                    logger.error(f"Error saving response to file: {e}")
-                    enhanced_response["metadata"]["save_error"] = str(e)
-            
-            logger.info(f"Enhanced ReAct agent completed: {enhanced_response['success']}")
-            return enhanced_response
+            return self._finalize_response(user_question, response_obj, processing_time, actual_session_id, session_id)
             
         except Exception as e:
             logger.error(f"Enhanced ReAct agent failed: {str(e)}")
+            return self._finalize_error(user_question, e, actual_session_id or session_id or self.session_id, session_id)
+    
+    async def stream_question(self, user_question: str, session_id: str = None, conversation_context: str = None):
+        """Stream agent progress events, ending with the enhanced response as the final event"""
+        actual_session_id = None
+        try:
+            actual_session_id, user_question, conversation_context = self._prepare_question(
+                user_question, session_id, conversation_context
+            )
             
-            error_response = {
-                "success": False,
-                "answer": f"I apologize, but I encountered an error while processing your question: {str(e)}",
-                "message": f"I apologize, but I encountered an error while processing your question: {str(e)}",
-                "query_understanding": user_question,
-                "data": None,
-                "sql_generated": None,
-                "sql_query": None,
-                "result_count": 0,
-                "metadata": {
-                    "error_type": type(e).__name__, 
-                    "error_details": str(e),
-                    "agent_type": "enhanced_react_agent_with_json_memory",
-                    "session_id": actual_session_id if 'actual_session_id' in locals() else self.session_id,
-                    "timestamp": datetime.now().isoformat(),
-                    "memory_enabled": JSON_MEMORY_AVAILABLE,
-                    "response_saving_enabled": JSON_SAVER_AVAILABLE
-                },
-                "timestamp": datetime.now().isoformat(),
-                "powered_by": "Enhanced LangGraph ReAct Agent with JSON Memory (Error)",
-                "structured_response": None,
-                "session_id": actual_session_id if 'actual_session_id' in locals() else self.session_id
+            start_time = datetime.now()
+            async for event in self.agent.stream_query(user_question, conversation_context):
+                if event["event"] == "final":
+                    processing_time = (datetime.now() - start_time).total_seconds()
+                    yield {"event": "final", "data": self._finalize_response(user_question, event["data"], processing_time,
+                                                                             actual_session_id, session_id)}
+                else:
+                    yield event
+                    
+        except Exception as e:
+            logger.error(f"Enhanced ReAct agent stream failed: {str(e)}")
+            yield {"event": "final", "data": self._finalize_error(user_question, e, actual_session_id or session_id or self.session_id,
+                                                                  session_id)}
+    
+    def _prepare_question(self, user_question: str, session_id: str = None, conversation_context: str = None):
+        """Resolve the session and enrich follow-up questions with conversation context
+        
+        A caller-supplied session_id keys the memory to that session, and a
+        caller-supplied conversation_context is used as is; only callers that
+        pass neither share the memory manager's process-wide session.
+        """
+        if session_id:
+            actual_session_id = session_id
+        elif self.memory_manager:
+            actual_session_id = self.memory_manager.current_session_id
+            logger.info(f"Using memory manager session ID: {actual_session_id}")
+        else:
+            actual_session_id = self.session_id
+        
+        logger.info(f"Processing question: '{user_question}' for session: {actual_session_id}")
+        
+        if conversation_context or self.memory_manager:
+            try:
+                if not conversation_context:
+                    conversation_context = self.memory_manager.get_conversation_context(session_id=session_id)
+                logger.info(f"Retrieved conversation context: {len(conversation_context)} characters")
+                if self._is_follow_up_question(user_question):
+                    enhanced_question = self._enhance_question_with_context(user_question, conversation_context)
+                    logger.info(f"Enhanced follow-up question: {enhanced_question}")
+                    user_question = enhanced_question
+            except Exception as e:
+                logger.error(f"Error retrieving conversation context: {e}")
+                conversation_context = ""
+        
+        return actual_session_id, user_question, conversation_context or ""
+    
+    def _finalize_response(self, user_question: str, response_obj: Any, processing_time: float, actual_session_id: str,
+                           memory_session_id: str = None) -> dict:
+        """Build the enhanced response, then record it in memory and on disk"""
+        if hasattr(response_obj, 'dict'):
+            # table_data is passed through by reference so its rows are not
+            # deep-copied and do not also appear inside structured_response
+            pydantic_response = response_obj.dict(exclude={"table_data"})
+            pydantic_response["table_data"] = getattr(response_obj, 'table_data', None)
+        else:
+            pydantic_response = {
+                "success": getattr(response_obj, 'success', False),
+                "message": getattr(response_obj, 'message', 'No message'),
+                "query_understanding": getattr(response_obj, 'query_understanding', user_question),
+                "sql_query": getattr(response_obj, 'sql_query', None),
+                "result_count": getattr(response_obj, 'result_count', 0),
+                "results": getattr(response_obj, 'results', []),
+                "table_data": getattr(response_obj, 'table_data', None),
+                "metadata": getattr(response_obj, 'metadata', {})
             }
-            
-            if self.memory_manager:
-                try:
-                    interaction_id = self.memory_manager.add_interaction(user_question, error_response)
-                    error_response["metadata"]["interaction_id"] = interaction_id
-                except Exception as e:
-                    logger.error(f"Error adding error interaction to memory: {e}")
-            
-            if self.response_saver:
-                try:
-                    saved_file = self.response_saver.save_response(error_response, user_question, actual_session_id if 'actual_session_id' in locals() else self.session_id)
-                    if saved_file:
-                        error_response["metadata"]["saved_to_file"] = saved_file
-                except Exception as e:
-                    logger.error(f"Error saving error response to file: {e}")
-            
-            return error_response
+        
+        enhanced_response = {
+            "success": pydantic_response.get("success", False),
+            "answer": pydantic_response.get("message", "No response"),
+            "message": pydantic_response.get("message", "No response"),
+            "query_understanding": pydantic_response.get("query_understanding", user_question),
+            "data": self._extract_data_from_results(pydantic_response.get("results", [])),
+            "sql_generated": pydantic_response.get("sql_query"),
+            "sql_query": pydantic_response.get("sql_query"),
+            "result_count": pydantic_response.get("result_count", 0),
+            "table_data": pydantic_response.get("table_data"),
+            "metadata": {
+                **pydantic_response.get("metadata", {}),
+                "processing_time_seconds": processing_time,
+                "session_id": actual_session_id,
+                "timestamp": datetime.now().isoformat(),
+                "agent_type": "enhanced_react_agent_with_json_memory",
+                "memory_enabled": JSON_MEMORY_AVAILABLE,
+                "response_saving_enabled": JSON_SAVER_AVAILABLE
+            },
+            "timestamp": datetime.now().isoformat(),
+            "powered_by": "Enhanced LangGraph ReAct Agent with JSON Memory",
+            "structured_response": {k: v for k, v in pydantic_response.items() if k != "table_data"},
+            "session_id": actual_session_id
+        }
+        
+        if self.memory_manager:
+            try:
+                memory_summary = self.memory_manager.get_session_summary(memory_session_id)
+                enhanced_response["metadata"]["memory_summary"] = memory_summary
+                
+                interaction_id = self.memory_manager.add_interaction(user_question, enhanced_response, session_id=memory_session_id)
+                enhanced_response["metadata"]["interaction_id"] = interaction_id
+            except Exception as e:
+                logger.error(f"Error adding interaction to memory: {e}")
+                enhanced_response["metadata"]["memory_error"] = str(e)
+        
+        if self.response_saver:
+            try:
+                saved_response = enhanced_response
+                if enhanced_response["table_data"] is not None:
+                    saved_response = {**enhanced_response, "table_data": encode_table(enhanced_response["table_data"], COLUMNAR_FORMAT)[0]}
+                saved_file = self.response_saver.save_response(saved_response, user_question, actual_session_id)
+                if saved_file:
+                    enhanced_response["metadata"]["saved_to_file"] = saved_file
+                    logger.info(f"Response saved to: {saved_file}")
+            except Exception as e:
+                logger.error(f"Error saving response to file: {e}")
+                enhanced_response["metadata"]["save_error"] = str(e)
+        
+        logger.info(f"Enhanced ReAct agent completed: {enhanced_response['success']}")
+        return enhanced_response
+    
+    def _finalize_error(self, user_question: str, error: Exception, actual_session_id: str,
+                        memory_session_id: str = None) -> dict:
+        """Build the error response, then record it in memory and on disk"""
+        error_response = {
+            "success": False,
+            "answer": f"I apologize, but I encountered an error while processing your question: {str(error)}",
+            "message": f"I apologize, but I encountered an error while processing your question: {str(error)}",
+            "query_understanding": user_question,
+            "data": None,
+            "sql_generated": None,
+            "sql_query": None,
+            "result_count": 0,
+            "metadata": {
+                "error_type": type(error).__name__, 
+                "error_details": str(error),
+                "agent_type": "enhanced_react_agent_with_json_memory",
+                "session_id": actual_session_id,
+                "timestamp": datetime.now().isoformat(),
+                "memory_enabled": JSON_MEMORY_AVAILABLE,
+                "response_saving_enabled": JSON_SAVER_AVAILABLE
+            },
+            "timestamp": datetime.now().isoformat(),
+            "powered_by": "Enhanced LangGraph ReAct Agent with JSON Memory (Error)",
+            "structured_response": None,
+            "session_id": actual_session_id
+        }
+        
+        if self.memory_manager:
+            try:
+                interaction_id = self.memory_manager.add_interaction(user_question, error_response, session_id=memory_session_id)
+                error_response["metadata"]["interaction_id"] = interaction_id
+            except Exception as e:
+                logger.error(f"Error adding error interaction to memory: {e}")
+        
+        if self.response_saver:
+            try:
+                saved_file = self.response_saver.save_response(error_response, user_question, actual_session_id)
+                if saved_file:
+                    error_response["metadata"]["saved_to_file"] = saved_file
+            except Exception as e:
+                logger.error(f"Error saving error response to file: {e}")
+        
+        return error_response
     
     def _is_follow_up_question(self, user_question: str) -> bool:
         """Check if the question is a follow-up to previous interactions"""
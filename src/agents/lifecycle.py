@@ -0,0 +1,192 @@
+"""
+Resource lifecycle management for long-lived database agents
+
+Creates and warms the agent's database pool and HTTP session once, keeps them
+healthy in the background, and drains them only on application shutdown.
+"""
+
+import asyncio
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+def resolve_core_agent(agent: Any) -> Any:
+    """Return the object that owns db_connection / HTTP resources.
+
+    AzureReActDatabaseAgent wraps a LangGraphReActDatabaseAgent in ``agent``;
+    the LangGraph agent owns the resources itself.
+    """
+    if agent is None:
+        return None
+    if hasattr(agent, 'db_connection'):
+        return agent
+    inner = getattr(agent, 'agent', None)
+    if inner is not None and hasattr(inner, 'db_connection'):
+        return inner
+    return None
+
+
+class AgentResourceLifecycle:
+    """Owns the shared database pool and HTTP session of a long-lived agent"""
+
+    def __init__(self, agent: Any, health_interval: Optional[float] = None, warm_connections: Optional[int] = None):
+        self.agent = agent
+        self.core_agent = resolve_core_agent(agent)
+        self.health_interval = health_interval or float(os.getenv("RESOURCE_HEALTH_INTERVAL", "30"))
+        self.warm_connections = warm_connections or int(os.getenv("DB_WARM_CONNECTIONS", "4"))
+
+        self._health_task: Optional[asyncio.Task] = None
+        self._started = False
+        self.started_at: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+        self.warmed_connections = 0
+        self.health = {
+            "database_connected": False,
+            "readiness_state": None,
+            "http_session_open": False,
+            "last_check": None,
+            "last_error": None,
+            "consecutive_failures": 0,
+            "checks": 0
+        }
+
+    @property
+    def is_started(self) -> bool:
+        return self._started
+
+    async def start(self):
+        """Create and warm pools, then start the background health checker"""
+        if self._started:
+            return
+
+        if self.core_agent is None:
+            logger.warning("Agent does not expose managed resources - lifecycle disabled")
+            return
+
+        start = time.perf_counter()
+
+        # The agent no longer tears its resources down at the end of each request
+        self.core_agent._lifecycle_managed = True
+
+        db_connection = self.core_agent.db_connection
+        try:
+            if hasattr(db_connection, 'warm_pool'):
+                self.warmed_connections = await db_connection.warm_pool(self.warm_connections)
+            if hasattr(self.core_agent, '_ensure_ready'):
+                await self.core_agent._ensure_ready()
+        except Exception as e:
+            logger.warning(f"Database warm-up failed, continuing with lazy connections: {e}")
+            self.health["last_error"] = str(e)
+
+        connection_manager = getattr(self.core_agent, '_connection_manager', None)
+        if connection_manager is not None:
+            try:
+                await connection_manager.get_session()
+            except Exception as e:
+                logger.warning(f"HTTP session warm-up failed: {e}")
+
+        self.warmup_seconds = time.perf_counter() - start
+        self.started_at = datetime.now().isoformat()
+        self._started = True
+
+        await self.check_health()
+        self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"✅ Agent resources warmed in {self.warmup_seconds:.3f}s")
+
+    async def check_health(self) -> Dict[str, Any]:
+        """Run a single health check against the shared resources"""
+        if self.core_agent is None:
+            return self.health
+
+        self.health["checks"] += 1
+        self.health["last_check"] = datetime.now().isoformat()
+
+        readiness = getattr(self.core_agent.db_connection, 'readiness', None)
+        if readiness is not None:
+            # Database state is owned by the readiness monitor; this loop is its heartbeat
+            try:
+                await readiness.heartbeat()
+            except Exception as e:
+                logger.warning(f"Database heartbeat error: {e}")
+            self.health["database_connected"] = readiness.is_ready
+            self.health["readiness_state"] = readiness.state
+            self.health["consecutive_failures"] = readiness.consecutive_failures
+            if readiness.last_error:
+                self.health["last_error"] = readiness.last_error
+            if not readiness.is_ready:
+                logger.warning(f"Background database health check: {readiness.state} ({readiness.last_error})")
+
+        connection_manager = getattr(self.core_agent, '_connection_manager', None)
+        if connection_manager is not None:
+            session = getattr(connection_manager, '_session', None)
+            if session is None or session.closed:
+                try:
+                    await connection_manager.get_session()
+                except Exception as e:
+                    logger.warning(f"Could not reopen HTTP session: {e}")
+            session = getattr(connection_manager, '_session', None)
+            self.health["http_session_open"] = bool(session is not None and not session.closed)
+
+        return self.health
+
+    async def _health_loop(self):
+        """Periodically check resource health until cancelled"""
+        while True:
+            try:
+                await asyncio.sleep(self.health_interval)
+                await self.check_health()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"Health check loop error: {e}")
+
+    async def shutdown(self):
+        """Stop background checks and drain all pooled resources"""
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+        if self.core_agent is not None and hasattr(self.core_agent, '_cleanup'):
+            try:
+                await self.core_agent._cleanup()
+                logger.info("✅ Agent resources drained")
+            except Exception as e:
+                logger.warning(f"Error draining agent resources: {e}")
+
+        self._started = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lifecycle and pool statistics"""
+        stats = {
+            "started": self._started,
+            "started_at": self.started_at,
+            "warmup_seconds": round(self.warmup_seconds, 4) if self.warmup_seconds is not None else None,
+            "warmed_connections": self.warmed_connections,
+            "health_interval_seconds": self.health_interval,
+            "health": dict(self.health)
+        }
+        if self.core_agent is not None and hasattr(self.core_agent.db_connection, 'get_pool_status'):
+            stats["pool"] = self.core_agent.db_connection.get_pool_status()
+        if self.core_agent is not None and hasattr(self.core_agent.db_connection, 'get_fetch_stats'):
+            stats["fetch"] = self.core_agent.db_connection.get_fetch_stats()
+        if self.core_agent is not None and hasattr(self.core_agent.db_connection, 'prepared_statements'):
+            stats["prepared_statements"] = self.core_agent.db_connection.prepared_statements.get_stats()
+        if self.core_agent is not None and hasattr(self.core_agent.db_connection, 'schema_snapshot'):
+            stats["schema_snapshot"] = self.core_agent.db_connection.schema_snapshot.get_stats()
+        if self.core_agent is not None and hasattr(self.core_agent.db_connection, 'readiness'):
+            stats["readiness"] = self.core_agent.db_connection.readiness.get_stats()
+        return stats
@@ -2,12 +2,16 @@
 
 import json
 import re
+import hashlib
+import time
 import logging
 from typing import Dict, Any, List, Optional
 from langchain_openai import AzureChatOpenAI
 from langchain_core.tools import BaseTool
 from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.messages import SystemMessage
 from langgraph.prebuilt import create_react_agent
+from langgraph.errors import GraphRecursionError
 from pydantic import Field
 from dotenv import load_dotenv
 import os
@@ -25,14 +29,26 @@ except ImportError:
     logger = logging.getLogger(__name__)
 
 try:
-    from src.models.response_models import DatabaseResponse, QueryResult
+    from src.models.response_models import DatabaseResponse, QueryResult, TableData, FinalAnswer
     from src.database.connection import DatabaseConnection
 except ImportError:
     print("Warning: Could not import response models or database connection")
     DatabaseResponse = None
     QueryResult = None
+    TableData = None
+    FinalAnswer = None
     DatabaseConnection = None
 
+from src.state.request_context import get_request_context, request_scope
+from src.cache.answer_cache import AnswerCache, references_context
+from src.cache.semantic_cache import SemanticSQLCache
+from src.cache.llm_cache import get_llm_cache
+from src.query.templates import QueryTemplateEngine
+from src.query.sql_rewriter import SQLColumnRewriter
+from src.query.schema_retriever import SchemaRetriever
+from src.agents.tool_concurrency import RequestTimeline, SpeculativePrefetcher
+from src.utils.metrics import LatencyTracker
+
 load_dotenv()
 
 def _validate_azure_env_vars():
@@ -242,14 +258,17 @@ class DatabaseQueryTool(BaseTool):
         default="Execute a SQL query against the database. Returns structured data that should be interpreted for the user."
     )
     db_connection: Any = Field(description="Database connection instance")
-    agent_instance: Any = Field(default=None, description="Agent instance to store data")
+    agent_instance: Any = Field(default=None, description="Agent instance used for column mapping")
     
     def __init__(self, db_connection: Any, agent_instance: Any = None, **kwargs):
         """Initialize the database query tool.
         
+        Query results are stored on the current RequestContext, never on the
+        shared agent instance.
+        
         Args:
             db_connection: Database connection instance
-            agent_instance: Agent instance to store structured data
+            agent_instance: Agent instance providing column name mapping
             **kwargs: Additional keyword arguments
         """
         super().__init__(db_connection=db_connection, agent_instance=agent_instance, **kwargs)
@@ -268,10 +287,6 @@ class DatabaseQueryTool(BaseTool):
             mapped_query = query
             if self.agent_instance and hasattr(self.agent_instance, '_map_column_names'):
                 mapped_query = self.agent_instance._map_column_names(query)
-                
-                if '""' in mapped_query:
-                    logger.warning(f"Detected double quotes in SQL, attempting to fix: {mapped_query}")
-                    mapped_query = mapped_query.replace('""', '"')
             
             try:
                 loop = asyncio.get_running_loop()
@@ -284,12 +299,15 @@ class DatabaseQueryTool(BaseTool):
             
             if success:
                 if data:
-                    if self.agent_instance and hasattr(self.agent_instance, 'last_query_data'):
-                        self.agent_instance.last_query_data = data
-                        self.agent_instance.last_query_sql = mapped_query
-                        logger.info(f"Stored {len(data)} rows in last_query_data for table display")
+                    request_context = get_request_context()
+                    if request_context is not None:
+                        request_context.record_query(mapped_query, data)
+                        logger.info(f"Stored {len(data)} rows in request context for table display")
                     
                     result_str = "✅ Query executed successfully."
+                    if getattr(data, "truncated", False):
+                        result_str += (f" The result has more than {len(data)} rows and was cut to the first {len(data)};"
+                                       " tell the user it is truncated, or use an aggregate if they need totals.")
                     return result_str
                 else:
                     return "✅ Query executed successfully but returned no results. Please inform the user that no matching records were found."
@@ -320,21 +338,20 @@ class DatabaseQueryTool(BaseTool):
             mapped_query = query
             if self.agent_instance and hasattr(self.agent_instance, '_map_column_names'):
                 mapped_query = self.agent_instance._map_column_names(query)
-                
-                if '""' in mapped_query:
-                    logger.warning(f"Detected double quotes in SQL, attempting to fix: {mapped_query}")
-                    mapped_query = mapped_query.replace('""', '"')
             
             success, data, error, status_code = await self.db_connection.execute_query(mapped_query)
             
             if success:
                 if data:
-                    if self.agent_instance and hasattr(self.agent_instance, 'last_query_data'):
-                        self.agent_instance.last_query_data = data
-                        self.agent_instance.last_query_sql = mapped_query
-                        logger.info(f"Stored {len(data)} rows in last_query_data for table display")
+                    request_context = get_request_context()
+                    if request_context is not None:
+                        request_context.record_query(mapped_query, data)
+                        logger.info(f"Stored {len(data)} rows in request context for table display")
                     
                     result_str = "✅ Query executed successfully."
+                    if getattr(data, "truncated", False):
+                        result_str += (f" The result has more than {len(data)} rows and was cut to the first {len(data)};"
+                                       " tell the user it is truncated, or use an aggregate if they need totals.")
                     return result_str
                 else:
                     return "✅ Query executed successfully but returned no results. Please inform the user that no matching records were found."
@@ -400,23 +417,16 @@ class DatabaseSchemaReaderTool(BaseTool):
                 requested_tables = [name.strip() for name in table_names.split(",")]
                 result = "📊 EXACT COLUMN NAMES FOR SQL QUERIES:\n\n"
                 
+                request_context = get_request_context()
+                prefetch = request_context.metadata.get("prefetch") if request_context is not None else None
+                prefetched_blocks = prefetch.schema_blocks if prefetch is not None else {}
+                
                 for table_key, table_info in schema.get("tables", {}).items():
                     table_name = table_info["name"]
                     
                     if table_name.lower() in [t.lower() for t in requested_tables]:
-                        result += f"📋 Table: {table_name}\n"
-                        result += "📝 Exact Column Names (use these in SQL):\n"
-                        
-                        for col in table_info.get("columns", []):
-                            exact_col_name = col['name']
-                            col_info = f"   • {exact_col_name} ({col['type']})"
-                            if not col.get('nullable', True):
-                                col_info += " NOT NULL"
-                            if col.get('primary_key'):
-                                col_info += " PRIMARY KEY"
-                            result += col_info + "\n"
-                        
-                        result += "\n"
+                        block = prefetched_blocks.get(table_name.lower())
+                        result += block if block is not None else self.format_table(table_info)
                 
                 relationships = schema.get("relationships", [])
                 relevant_rels = [
@@ -439,6 +449,29 @@ class DatabaseSchemaReaderTool(BaseTool):
         except Exception as e:
             return f"❌ Error reading schema: {str(e)}"
     
+    @staticmethod
+    def format_table(table_info: Dict[str, Any]) -> str:
+        """Format the exact column names of one table.
+        
+        Args:
+            table_info: Table entry from the database schema cache
+            
+        Returns:
+            Schema block for the table
+        """
+        result = f"📋 Table: {table_info['name']}\n"
+        result += "📝 Exact Column Names (use these in SQL):\n"
+        
+        for col in table_info.get("columns", []):
+            col_info = f"   • {col['name']} ({col['type']})"
+            if not col.get('nullable', True):
+                col_info += " NOT NULL"
+            if col.get('primary_key'):
+                col_info += " PRIMARY KEY"
+            result += col_info + "\n"
+        
+        return result + "\n"
+    
     async def _arun(self, table_names: str = "", run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
         """Async version of schema reading.
         
@@ -518,6 +551,40 @@ class DatabaseListTablesTool(BaseTool):
         return self._run(query, run_manager)
 
 
+FINAL_ANSWER_TOOL = "final_answer"
+
+
+class FinalAnswerTool(BaseTool):
+    """Tool the agent calls to end its run with a structured final answer."""
+    
+    name: str = Field(default=FINAL_ANSWER_TOOL)
+    description: str = Field(
+        default="Finish with the final answer for the user. Call this exactly once, as the last step, instead of replying with plain text."
+    )
+    args_schema: Any = FinalAnswer
+    return_direct: bool = True
+    
+    def _run(self, message: str, sql: Optional[str] = None, result_ref: str = "last",
+             run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        """Return the answer message; the arguments are read from the tool call itself.
+        
+        Args:
+            message: Brief answer for the user
+            sql: SQL query whose results answer the question
+            result_ref: 'last' to show the last query's rows, 'none' for no table
+            run_manager: Optional callback manager for tool execution
+            
+        Returns:
+            The answer message
+        """
+        return message
+    
+    async def _arun(self, message: str, sql: Optional[str] = None, result_ref: str = "last",
+                    run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        """Async version of the final answer tool."""
+        return self._run(message, sql, result_ref, run_manager)
+
+
 class ConnectionManager:
     """Manages HTTP connections and SSL contexts for the agent."""
     
@@ -600,10 +667,7 @@ class LangGraphReActDatabaseAgent:
         self.top_k = top_k
         self._connection_manager = ConnectionManager()
         self._cleanup_tasks = []
-        
-        self.last_query_data = None
-        self.last_query_sql = None
-        self.last_table_data = None
+        self._lifecycle_managed = False
         
         self.column_mapping = {
             'first_name': '"FIRST"',
@@ -623,6 +687,7 @@ class LangGraphReActDatabaseAgent:
             'healthcare_expenses': '"HEALTHCARE_EXPENSES"',
             'healthcare_coverage': '"HEALTHCARE_COVERAGE"'
         }
+        self.sql_rewriter = SQLColumnRewriter(self.column_mapping)
         
         self.llm = AzureChatOpenAI(
             azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
@@ -633,7 +698,8 @@ class LangGraphReActDatabaseAgent:
             temperature=0.0,  # Reduce for faster, more deterministic responses
             request_timeout=15.0,  # Reduce timeout for faster failure
             max_retries=1,  # Reduce retries for speed
-            max_tokens=512  # Limit response length for speed
+            max_tokens=512,  # Limit response length for speed
+            cache=get_llm_cache("react_agent")  # Deterministic at temperature 0, so repeats come from disk
         )
         
         if DatabaseConnection:
@@ -646,17 +712,57 @@ class LangGraphReActDatabaseAgent:
             logger.warning("TAVILY_API_KEY not found in environment variables")
             
         self.schema_description = self._load_schema_description()
+        self.schema_version = self._compute_schema_version()
+        self.answer_cache = AnswerCache()
+        self.semantic_cache = SemanticSQLCache()
+        self.query_templates = QueryTemplateEngine(row_limit=int(os.getenv("TEMPLATE_ROW_LIMIT", "100")))
+        self.agent_latency = LatencyTracker()
+        self.schema_subsetting = os.getenv("SCHEMA_SUBSETTING", "true").lower() == "true"
+        # With the schema in the prompt the discovery tools only cost extra LLM round trips
+        self.schema_preloaded = os.getenv("REACT_SCHEMA_PRELOADED", "true").lower() == "true" and bool(self.schema_description)
+        self.schema_retriever = self._create_schema_retriever()
+        self.max_steps = int(os.getenv("REACT_MAX_STEPS", "6"))
+        # Each ReAct step is an agent superstep plus a tools superstep
+        self.agent_config = {"recursion_limit": 2 * self.max_steps + 1}
+        self.llm_calls_per_answer = LatencyTracker()
+        self.tool_calls_per_answer = LatencyTracker()
+        self.tool_call_totals: Dict[str, int] = {}
+        self.step_budget_exhausted = 0
+        self.structured_final_answer = os.getenv("STRUCTURED_FINAL_ANSWER", "true").lower() == "true" and FinalAnswer is not None
+        self.final_answer_counts = {"structured": 0, "regex_fallback": 0}
+        self.prefetcher = SpeculativePrefetcher(
+            self.db_connection,
+            schema_block=None if self.schema_preloaded else self._schema_block_for
+        )
         self.tools = self._setup_tools()
         self.system_prompt = self._create_enhanced_system_prompt()
         
         self.agent = create_react_agent(
             self.llm,
             self.tools,
-            prompt=self.system_prompt,
+            prompt=self._prompt_for_state if self.schema_subsetting else self.system_prompt,
         )
         
         self._register_cleanup()
     
+    @property
+    def last_query_data(self):
+        """Rows of the last query executed in the current request."""
+        request_context = get_request_context()
+        return request_context.last_query_data if request_context else None
+    
+    @property
+    def last_query_sql(self):
+        """SQL of the last query executed in the current request."""
+        request_context = get_request_context()
+        return request_context.last_query_sql if request_context else None
+    
+    @property
+    def last_table_data(self):
+        """Table data built for the current request."""
+        request_context = get_request_context()
+        return request_context.last_table_data if request_context else None
+    
     def _load_schema_description(self) -> str:
         """Load the database description from description.json.
         
@@ -673,17 +779,63 @@ class LangGraphReActDatabaseAgent:
             logger.error(f"Error loading description.json: {e}")
             return ""
     
+    def _compute_schema_version(self) -> str:
+        """Derive the schema version used in answer cache keys.
+        
+        Returns:
+            Short hash of description.json, the database catalog fingerprint
+            once the schema is loaded, and the optional SCHEMA_VERSION override
+        """
+        self._catalog_fingerprint = getattr(self.db_connection, 'schema_fingerprint', None)
+        fingerprint = f"{os.getenv('SCHEMA_VERSION', '')}\x00{self._catalog_fingerprint or ''}\x00{self.schema_description}"
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+    
+    def refresh_schema_version(self) -> int:
+        """Reload description.json and drop cached answers built for an older schema.
+        
+        Returns:
+            Number of cached answers invalidated
+        """
+        self.schema_description = self._load_schema_description()
+        self.schema_version = self._compute_schema_version()
+        self.schema_retriever = self._create_schema_retriever()
+        self.system_prompt = self._create_enhanced_system_prompt()
+        self.semantic_cache.invalidate()
+        return self.answer_cache.invalidate_schema(self.schema_version)
+    
+    def _create_schema_retriever(self) -> SchemaRetriever:
+        """Create the per-question schema retriever for the current description.json.
+        
+        Returns:
+            Schema retriever; lists the columns of unselected tables when discovery tools are off
+        """
+        return SchemaRetriever(self.schema_description, list_other_columns=self.schema_preloaded)
+    
+    def _schema_block_for(self, table_name: str) -> Optional[str]:
+        """sql_db_schema output for one table, built ahead of the tool call by the prefetcher."""
+        for table_info in (self.db_connection.schema_cache or {}).get("tables", {}).values():
+            if table_info["name"].lower() == table_name.lower():
+                return DatabaseSchemaReaderTool.format_table(table_info)
+        return None
+    
     def _setup_tools(self) -> List[BaseTool]:
         """Setup tools for the ReAct agent including Tavily search.
         
         Returns:
             List of configured tools for the agent
         """
-        tools = [
-            DatabaseListTablesTool(db_connection=self.db_connection),
-            DatabaseSchemaReaderTool(db_connection=self.db_connection),
-            DatabaseQueryTool(db_connection=self.db_connection, agent_instance=self)
-        ]
+        if self.schema_preloaded:
+            tools = [DatabaseQueryTool(db_connection=self.db_connection, agent_instance=self)]
+            logger.info("Schema preloaded into the prompt - discovery tools disabled")
+        else:
+            tools = [
+                DatabaseListTablesTool(db_connection=self.db_connection),
+                DatabaseSchemaReaderTool(db_connection=self.db_connection),
+                DatabaseQueryTool(db_connection=self.db_connection, agent_instance=self)
+            ]
+        
+        if self.structured_final_answer:
+            tools.append(FinalAnswerTool())
         
         if self.tavily_api_key:
             tools.append(TavilyHealthcareSearchTool(
@@ -696,18 +848,66 @@ class LangGraphReActDatabaseAgent:
         
         return tools
     
-    def _create_enhanced_system_prompt(self) -> str:
+    def _create_enhanced_system_prompt(self, schema_context: Optional[str] = None) -> str:
         """Create system prompt for the agent.
         
+        Args:
+            schema_context: Schema section to embed; defaults to the full description.json
+            
         Returns:
             Complete system prompt for the agent
         """
+        if schema_context is None:
+            schema_context = self.schema_description
+        return f"""{self._create_core_prompt()}
+**Database Context:**
+{schema_context}
+"""
+    
+    def _prompt_for_state(self, state) -> List[Any]:
+        """Build the model input for one ReAct step with only the schema the question needs.
+        
+        The core prompt comes first and never changes, so it stays a stable
+        prefix; the per-question schema subset follows it.
+        
+        Args:
+            state: ReAct graph state holding the conversation messages
+            
+        Returns:
+            System message followed by the conversation messages
+        """
+        messages = state["messages"] if isinstance(state, dict) else state.messages
+        prompt_prefix = self._optimize_query_prompt("")
+        retrieval_text = " ".join(
+            str(message.content).replace(prompt_prefix, "")
+            for message in messages if getattr(message, "type", None) in ("human", "system")
+        )
+        schema_context = self.schema_retriever.retrieve(retrieval_text)
+        
+        # Name lookups prefetched while the first LLM call ran are available from the second step on
+        request_context = get_request_context()
+        prefetch = request_context.metadata.get("prefetch") if request_context is not None else None
+        name_hints = prefetch.ready_name_hints() if prefetch is not None else None
+        if name_hints:
+            schema_context = f"{schema_context}\n\n{name_hints}"
+        return [SystemMessage(content=self._create_enhanced_system_prompt(schema_context))] + list(messages)
+    
+    def get_prompt_stats(self) -> Dict[str, Any]:
+        """Prompt size with per-question schema subsetting versus the full description."""
+        stats = self.schema_retriever.get_stats()
+        stats["schema_subsetting"] = self.schema_subsetting
+        stats["core_prompt_tokens"] = self.schema_retriever.token_counter.count(self._create_core_prompt())
+        return stats
+    
+    def _create_core_prompt(self) -> str:
+        """Create the schema-independent part of the system prompt.
+        
+        Returns:
+            Role, query guidelines, tool strategy and response format instructions
+        """
         return f"""
 You are a healthcare database assistant with access to both patient data and external medical information.
 
-**Database Context:**
-{self.schema_description}
-
 **IMPORTANT - Follow-up Question Handling:**
 - Pay careful attention to context from previous queries
 - When users ask follow-up questions (using words like "also", "more", "what about", "show me their", etc.), refer to the previous context
@@ -728,12 +928,11 @@ You are a healthcare database assistant with access to both patient data and ext
 
 
 **Tool Usage Strategy:**
-1. **Database Tools** (for patient-specific data):
-   - sql_db_list_tables: See available tables
-   - sql_db_schema: Get exact column names
-   - sql_db_query: Execute SQL queries
+{self._database_tool_strategy()}
 
 2. **Healthcare Search** (for medical information):tavily_healthcare_search
+3. Independent tool calls (for example a query and a healthcare search) can be requested in the same turn - they run concurrently
+{self._final_answer_instruction()}
 
 **Response Format:**
 - NEVER create markdown tables with | symbols - the frontend handles table display
@@ -751,6 +950,23 @@ You are a healthcare database assistant with access to both patient data and ext
 Remember: Database queries for patient data, Tavily search for medical knowledge and context. 
 """
     
+    def _database_tool_strategy(self) -> str:
+        """Describe the database tools the agent has in the current mode."""
+        if self.schema_preloaded:
+            return """1. **Database Tools** (for patient-specific data):
+   - sql_db_query: Execute SQL queries
+   - The Database Context below already has every table and column you need - write the SQL directly, do not explore the schema first"""
+        return """1. **Database Tools** (for patient-specific data):
+   - sql_db_list_tables: See available tables
+   - sql_db_schema: Get exact column names
+   - sql_db_query: Execute SQL queries"""
+    
+    def _final_answer_instruction(self) -> str:
+        """Tell the agent how to finish when structured final answers are enabled."""
+        if not self.structured_final_answer:
+            return ""
+        return f"""4. **{FINAL_ANSWER_TOOL}**: always finish by calling it once with message (1-2 sentences), sql (the query whose rows answer the question) and result_ref ('last' to show the last query's rows, 'none' for no table) - never end with plain text"""
+    
     def _register_cleanup(self):
         """Register cleanup handlers for proper resource management."""
         import weakref
@@ -800,138 +1016,579 @@ Remember: Database queries for patient data, Tavily search for medical knowledge
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit.
-        
+
+        Resources owned by an AgentResourceLifecycle are left open and are
+        only drained when the lifecycle shuts down.
+
         Args:
             exc_type: Exception type if any
             exc_val: Exception value if any
             exc_tb: Exception traceback if any
         """
+        if self._lifecycle_managed:
+            return
         await self._cleanup()
     
-    async def process_query(self, user_question: str, conversation_context: str = None):
+    async def process_query(self, user_question: str, conversation_context: str = None, session_id: str = None):
         """Process user question with optimized ReAct agent.
         
         Args:
             user_question: User's question or query
             conversation_context: Optional conversation context
+            session_id: Optional session the question belongs to
             
         Returns:
             Processed response from the agent
         """
+        with request_scope(session_id=session_id):
+            return await self._process_query_in_context(user_question, conversation_context)
+    
+    async def _process_query_in_context(self, user_question: str, conversation_context: str = None):
+        """Run process_query inside an active RequestContext."""
         try:
             logger.info(f"Processing query: {user_question}")
             
-            await self._ensure_ready()
-            
-            actual_question = user_question
-            if "Current question:" in user_question:
-                parts = user_question.split("Current question:")
-                if len(parts) > 1:
-                    actual_question = parts[1].strip()
-                    if "\n\nPlease use" in actual_question:
-                        actual_question = actual_question.split("\n\nPlease use")[0].strip()
-            
-            greeting_words = ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']
-            question_lower = actual_question.lower().strip()
-            
-            is_pure_greeting = (
-                question_lower in greeting_words or
-                (len(question_lower.split()) <= 3 and any(word in question_lower for word in greeting_words) and
-                 not any(other in question_lower for other in ['show', 'find', 'get', 'list', 'what', 'who', 'where', 'when']))
-            )
-            
-            is_follow_up = (
-                (conversation_context is not None and len(conversation_context) > 0) or
-                "Previous conversation context" in user_question or
-                any(indicator in question_lower for indicator in [
-                    'also', 'more', 'what about', 'show me', 'tell me', 
-                    'from', 'previous', 'last', 'that', 'those', 'them',
-                    'his', 'her', 'their', 'the same', 'additionally'
-                ])
-            )
-            
-            if is_pure_greeting and not is_follow_up:
-                return DatabaseResponse(
-                    success=True,
-                    message="Hello! I'm your Healthcare Database Assistant. I can help you query patient data, medical records, and provide healthcare information. What would you like to know?",
-                    result_count=0,
-                    metadata={"type": "greeting"}
-                )
-            
-            question_upper = user_question.strip().upper()
-            if question_upper.startswith(('SELECT', 'DESCRIBE', 'EXPLAIN')):
-                return await self._handle_direct_sql(user_question.strip())
-            elif question_upper.startswith('SHOW') and any(keyword in question_upper for keyword in ['TABLES', 'COLUMNS', 'DATABASES', 'INDEXES']):
-                return await self._handle_direct_sql(user_question.strip())
-            
-            if not any(word in user_question.lower() for word in ['over', 'under', 'age', 'years']):
-                quick_response = await self._try_quick_patterns(user_question)
-                if quick_response:
-                    return quick_response
+            self._sync_schema_version()
+            schema_version = self.schema_version
+            cache_key = self.answer_cache.make_key(user_question, conversation_context, schema_version)
+            cached_response = self._lookup_cached_answer(cache_key)
+            if cached_response is not None:
+                return cached_response
             
+            await self._ensure_ready()
+            if self.schema_version != schema_version:
+                # Loading the schema changed the version; store under the key for the new one
+                cache_key = self.answer_cache.make_key(user_question, conversation_context, self.schema_version)
+            
+            fast_response = await self._try_fast_paths(user_question, conversation_context)
+            if fast_response is None:
+                fast_response = await self._try_semantic_sql(user_question, conversation_context)
+            if fast_response is not None:
+                self.answer_cache.put(cache_key, fast_response, self.schema_version, user_question)
+                return fast_response
+            
+            timeline, prefetch = self._start_prefetch(user_question)
+            agent_start = time.perf_counter()
             try:
-                messages = []
-                if conversation_context:
-                    messages.append(("system", f"Previous conversation context:\n{conversation_context}"))
-                messages.append(("user", self._optimize_query_prompt(user_question)))
-                
                 result = await asyncio.wait_for(
                     self.agent.ainvoke({
-                        "messages": messages
-                    }), 
+                        "messages": self._build_agent_messages(user_question, conversation_context)
+                    }, config={**self.agent_config, "callbacks": [timeline]}), 
                     timeout=12.0
                 )
             except asyncio.TimeoutError:
                 logger.warning("Agent timeout, falling back to direct query")
                 return await self._handle_timeout_fallback(user_question)
+            except GraphRecursionError:
+                return self._step_budget_exhausted_response(user_question)
             except Exception as agent_error:
                 logger.error(f"Agent execution error: {agent_error}")
                 return self._create_error_response(user_question, str(agent_error))
+            finally:
+                overlap = self._finish_prefetch(prefetch, timeline)
+            
+            self.agent_latency.record(time.perf_counter() - agent_start)
             
+            executed_sql = self._single_executed_sql()
             parsed_response = self._parse_agent_response(result, user_question)
+            self._record_agent_steps(result, parsed_response, overlap)
+            self.answer_cache.put(cache_key, parsed_response, self.schema_version, user_question)
+            self._remember_sql(user_question, conversation_context, executed_sql, result, parsed_response)
             return parsed_response
             
         except Exception as e:
             logger.error(f"Error processing query: {e}")
             return self._create_error_response(user_question, str(e))
     
+    def _lookup_cached_answer(self, cache_key: str):
+        """Return a cached answer unless the current request asked to bypass the cache.
+        
+        Args:
+            cache_key: Answer cache key for the question
+            
+        Returns:
+            Cached response, or None on a miss or bypass
+        """
+        request_context = get_request_context()
+        if request_context is not None and request_context.bypass_cache:
+            self.answer_cache.record_bypass()
+            return None
+        cached_response = self.answer_cache.get(cache_key)
+        if cached_response is not None:
+            logger.info("Answer cache hit - skipping ReAct loop")
+        return cached_response
+    
+    def _start_prefetch(self, user_question: str):
+        """Start speculative lookups for the question before the first LLM call.
+        
+        Args:
+            user_question: User's question or query
+            
+        Returns:
+            Timeline callback for the run and the prefetch handle, if anything was prefetched
+        """
+        timeline = RequestTimeline()
+        prefetch = self.prefetcher.start(user_question, timeline)
+        request_context = get_request_context()
+        if request_context is not None and prefetch is not None:
+            request_context.metadata["prefetch"] = prefetch
+        return timeline, prefetch
+    
+    def _finish_prefetch(self, prefetch: Any, timeline: RequestTimeline) -> Optional[Dict[str, Any]]:
+        """Cancel unfinished lookups and summarize tool and prefetch overlap for the request."""
+        request_context = get_request_context()
+        if request_context is not None:
+            request_context.metadata.pop("prefetch", None)
+        return self.prefetcher.finish(prefetch, timeline)
+    
+    def _record_agent_steps(self, agent_result: Dict, parsed_response: Any,
+                            overlap: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Count the LLM calls and tool calls one answer took and attach them to the response.
+        
+        Args:
+            agent_result: Final graph state of the ReAct run
+            parsed_response: Parsed agent response, annotated in place
+            overlap: Tool and prefetch overlap measured for the run
+            
+        Returns:
+            Per-request step counts
+        """
+        messages = agent_result.get("messages", []) if isinstance(agent_result, dict) else []
+        llm_calls = sum(1 for message in messages if getattr(message, "type", None) == "ai")
+        tool_calls: Dict[str, int] = {}
+        for message in messages:
+            if getattr(message, "type", None) == "tool" and getattr(message, "name", None) != FINAL_ANSWER_TOOL:
+                name = getattr(message, "name", None) or "unknown"
+                tool_calls[name] = tool_calls.get(name, 0) + 1
+        
+        steps = {
+            "llm_calls": llm_calls,
+            "tool_calls": sum(tool_calls.values()),
+            "tools": tool_calls,
+            "max_steps": self.max_steps,
+            "schema_preloaded": self.schema_preloaded,
+            "overlap": overlap
+        }
+        self.llm_calls_per_answer.record(llm_calls)
+        self.tool_calls_per_answer.record(steps["tool_calls"])
+        for name, count in tool_calls.items():
+            self.tool_call_totals[name] = self.tool_call_totals.get(name, 0) + count
+        
+        request_context = get_request_context()
+        if request_context is not None:
+            request_context.metadata["agent_steps"] = steps
+        metadata = getattr(parsed_response, "metadata", None)
+        if isinstance(metadata, dict):
+            metadata["agent_steps"] = steps
+        return steps
+    
+    def _step_budget_exhausted_response(self, user_question: str):
+        """Error response for a ReAct run that hit REACT_MAX_STEPS."""
+        self.step_budget_exhausted += 1
+        logger.warning(f"Agent exceeded its step budget of {self.max_steps}")
+        return self._create_error_response(
+            user_question, f"the question needed more than {self.max_steps} reasoning steps"
+        )
+    
+    def get_agent_step_stats(self) -> Dict[str, Any]:
+        """LLM and tool calls per answer, for judging the preloaded-schema mode."""
+        return {
+            "schema_preloaded": self.schema_preloaded,
+            "max_steps": self.max_steps,
+            "recursion_limit": self.agent_config["recursion_limit"],
+            "llm_calls_per_answer": self.llm_calls_per_answer.summary(),
+            "tool_calls_per_answer": self.tool_calls_per_answer.summary(),
+            "tool_call_totals": dict(self.tool_call_totals),
+            "step_budget_exhausted": self.step_budget_exhausted,
+            "structured_final_answer": self.structured_final_answer,
+            "final_answer_parsing": dict(self.final_answer_counts)
+        }
+    
+    def get_template_stats(self) -> Dict[str, Any]:
+        """Template coverage and latency saved relative to full agent runs."""
+        return self.query_templates.get_stats(self.agent_latency.summary()["mean"])
+    
+    def _depends_on_context(self, user_question: str, conversation_context: str = None) -> bool:
+        """Whether the SQL for a question could depend on earlier turns of the conversation."""
+        if "Previous conversation context" in user_question or "Current question:" in user_question:
+            return True
+        return bool(conversation_context) and references_context(user_question)
+    
+    def _single_executed_sql(self) -> Optional[str]:
+        """SQL of the current request when exactly one query answered it, else None."""
+        request_context = get_request_context()
+        if request_context is None or request_context.queries_executed != 1:
+            return None
+        return request_context.last_query_sql
+    
+    def _remember_sql(self, user_question: str, conversation_context: Optional[str], executed_sql: Optional[str],
+                      agent_result: Dict, parsed_response: Any):
+        """Index the SQL behind a successful agent answer for reuse by paraphrased questions.
+        
+        Args:
+            user_question: User's question or query
+            conversation_context: Optional conversation context
+            executed_sql: The single query that produced the answer, if any
+            agent_result: Final graph state, used to count the LLM calls the answer took
+            parsed_response: Parsed agent response
+        """
+        if not executed_sql or not getattr(parsed_response, "success", False) or parsed_response.table_data is None:
+            return
+        if self._depends_on_context(user_question, conversation_context):
+            return
+        llm_calls = sum(1 for message in agent_result.get("messages", []) if getattr(message, "type", None) == "ai")
+        self.semantic_cache.store(user_question, executed_sql, self.schema_version, llm_calls)
+    
+    async def _try_semantic_sql(self, user_question: str, conversation_context: str = None):
+        """Re-execute the SQL of a previously answered paraphrase instead of calling the LLM.
+        
+        Args:
+            user_question: User's question or query
+            conversation_context: Optional conversation context
+            
+        Returns:
+            Response built from the reused SQL, or None if no confident match exists
+        """
+        request_context = get_request_context()
+        if request_context is not None and request_context.bypass_cache:
+            return None
+        if self._depends_on_context(user_question, conversation_context):
+            return None
+        
+        match = self.semantic_cache.lookup(user_question, self.schema_version)
+        if match is None:
+            return None
+        
+        # Stored LLM SQL has no bind parameters, so a stray ":word" in it must not be read as one
+        success, data, error, status_code = await self.db_connection.execute_query(match["sql"])
+        if not success:
+            logger.warning(f"Reused SQL failed ({error}) - dropping it and falling back to the agent")
+            self.semantic_cache.record_execution_failure(match["sql"])
+            return None
+        
+        self.semantic_cache.record_reuse(match)
+        logger.info(f"Reusing SQL of similar question (similarity {match['similarity']}): {match['matched_question']}")
+        
+        table_data = TableData.from_rows(data) if data else None
+        if table_data is not None and request_context is not None:
+            request_context.record_query(match["sql"], data)
+            request_context.last_table_data = table_data
+        
+        metadata = {
+            "type": "semantic_sql_reuse",
+            "semantic_cache": {
+                "matched_question": match["matched_question"],
+                "similarity": match["similarity"],
+                "llm_calls_avoided": match["llm_calls_avoided"]
+            }
+        }
+        if table_data is not None and table_data.truncated:
+            metadata["truncated"] = True
+        
+        return DatabaseResponse(
+            success=True,
+            message=f"{self._create_table_text(data, len(data or []))}, using the query from a similar earlier question.",
+            query_understanding=f"Same question as: {match['matched_question']}",
+            sql_query=match["sql"],
+            result_count=len(data or []),
+            table_data=table_data,
+            metadata=metadata
+        )
+    
+    async def _try_fast_paths(self, user_question: str, conversation_context: str = None):
+        """Answer greetings, direct SQL and quick patterns without the ReAct loop.
+        
+        Args:
+            user_question: User's question or query
+            conversation_context: Optional conversation context
+            
+        Returns:
+            Response for the question, or None if the agent is needed
+        """
+        actual_question = user_question
+        if "Current question:" in user_question:
+            parts = user_question.split("Current question:")
+            if len(parts) > 1:
+                actual_question = parts[1].strip()
+                if "\n\nPlease use" in actual_question:
+                    actual_question = actual_question.split("\n\nPlease use")[0].strip()
+        
+        greeting_words = ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']
+        question_lower = actual_question.lower().strip()
+        
+        is_pure_greeting = (
+            question_lower in greeting_words or
+            (len(question_lower.split()) <= 3 and any(word in question_lower for word in greeting_words) and
+             not any(other in question_lower for other in ['show', 'find', 'get', 'list', 'what', 'who', 'where', 'when']))
+        )
+        
+        is_follow_up = (
+            (conversation_context is not None and len(conversation_context) > 0) or
+            "Previous conversation context" in user_question or
+            any(indicator in question_lower for indicator in [
+                'also', 'more', 'what about', 'show me', 'tell me', 
+                'from', 'previous', 'last', 'that', 'those', 'them',
+                'his', 'her', 'their', 'the same', 'additionally'
+            ])
+        )
+        
+        if is_pure_greeting and not is_follow_up:
+            return DatabaseResponse(
+                success=True,
+                message="Hello! I'm your Healthcare Database Assistant. I can help you query patient data, medical records, and provide healthcare information. What would you like to know?",
+                result_count=0,
+                metadata={"type": "greeting"}
+            )
+        
+        question_upper = user_question.strip().upper()
+        if question_upper.startswith(('SELECT', 'DESCRIBE', 'EXPLAIN')):
+            return await self._handle_direct_sql(user_question.strip())
+        elif question_upper.startswith('SHOW') and any(keyword in question_upper for keyword in ['TABLES', 'COLUMNS', 'DATABASES', 'INDEXES']):
+            return await self._handle_direct_sql(user_question.strip())
+        
+        if not any(word in user_question.lower() for word in ['over', 'under', 'age', 'years']):
+            quick_response = await self._try_quick_patterns(user_question, conversation_context)
+            if quick_response:
+                return quick_response
+        
+        return None
+    
+    def _build_agent_messages(self, user_question: str, conversation_context: str = None) -> List[Any]:
+        """Build the input messages for the ReAct graph.
+        
+        Args:
+            user_question: User's question or query
+            conversation_context: Optional conversation context
+            
+        Returns:
+            List of (role, content) message tuples
+        """
+        messages = []
+        if conversation_context:
+            messages.append(("system", f"Previous conversation context:\n{conversation_context}"))
+        messages.append(("user", self._optimize_query_prompt(user_question)))
+        return messages
+    
+    async def stream_query(self, user_question: str, conversation_context: str = None):
+        """Stream progress events for a question while the ReAct loop runs.
+        
+        Yields dicts of the form {"event": name, "data": payload} in this order:
+        status, then tool_start / sql / table / tool_end as tools run, token
+        events for the narrative, and a single final event carrying the same
+        response object process_query would return.
+        
+        Args:
+            user_question: User's question or query
+            conversation_context: Optional conversation context
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(
+            self._produce_stream_events(user_question, conversation_context, queue)
+        )
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            if not producer.done():
+                producer.cancel()
+    
+    async def _produce_stream_events(self, user_question: str, conversation_context: str, queue: asyncio.Queue):
+        """Run the agent event stream in its own task and push mapped events to the queue."""
+        with request_scope() as request_context:
+            try:
+                await queue.put({"event": "status", "data": {"stage": "started", "request_id": request_context.request_id}})
+                
+                self._sync_schema_version()
+                schema_version = self.schema_version
+                cache_key = self.answer_cache.make_key(user_question, conversation_context, schema_version)
+                cached_response = self._lookup_cached_answer(cache_key)
+                if cached_response is not None:
+                    await queue.put({"event": "status", "data": {"stage": "cache_hit"}})
+                    if cached_response.table_data is not None:
+                        await queue.put({"event": "table", "data": cached_response.table_data})
+                    await queue.put({"event": "final", "data": cached_response})
+                    return
+                
+                await self._ensure_ready()
+                if self.schema_version != schema_version:
+                    # Loading the schema changed the version; store under the key for the new one
+                    cache_key = self.answer_cache.make_key(user_question, conversation_context, self.schema_version)
+                
+                fast_response = await self._try_fast_paths(user_question, conversation_context)
+                if fast_response is None:
+                    fast_response = await self._try_semantic_sql(user_question, conversation_context)
+                    if fast_response is not None:
+                        await queue.put({"event": "status", "data": {"stage": "semantic_sql_reuse"}})
+                        if fast_response.table_data is not None:
+                            await queue.put({"event": "table", "data": fast_response.table_data})
+                if fast_response is not None:
+                    self.answer_cache.put(cache_key, fast_response, self.schema_version, user_question)
+                    await queue.put({"event": "final", "data": fast_response})
+                    return
+                
+                final_state = {}
+                timeline, prefetch = self._start_prefetch(user_question)
+                
+                async def _consume_agent_events():
+                    nonlocal final_state
+                    async for event in self.agent.astream_events(
+                        {"messages": self._build_agent_messages(user_question, conversation_context)},
+                        config={**self.agent_config, "callbacks": [timeline]},
+                        version="v2"
+                    ):
+                        kind = event.get("event")
+                        name = event.get("name")
+                        
+                        if kind == "on_tool_start" and name == FINAL_ANSWER_TOOL:
+                            tool_input = event.get("data", {}).get("input")
+                            message = tool_input.get("message") if isinstance(tool_input, dict) else None
+                            if message:
+                                await queue.put({"event": "token", "data": {"text": message}})
+                        
+                        elif kind == "on_tool_end" and name == FINAL_ANSWER_TOOL:
+                            continue
+                        
+                        elif kind == "on_tool_start":
+                            await queue.put({"event": "tool_start", "data": {"tool": name}})
+                            tool_input = event.get("data", {}).get("input")
+                            if name == "sql_db_query":
+                                sql_text = tool_input.get("query") if isinstance(tool_input, dict) else tool_input
+                                if sql_text:
+                                    await queue.put({"event": "sql", "data": {"sql": self._map_column_names(str(sql_text))}})
+                        
+                        elif kind == "on_tool_end":
+                            if name == "sql_db_query" and request_context.last_query_data:
+                                rows = request_context.last_query_data
+                                await queue.put({"event": "table", "data": {
+                                    "headers": list(rows[0].keys()) if isinstance(rows[0], dict) else [],
+                                    "data": rows,
+                                    "row_count": len(rows),
+                                    "truncated": request_context.last_query_truncated
+                                }})
+                            await queue.put({"event": "tool_end", "data": {"tool": name}})
+                        
+                        elif kind == "on_chat_model_stream":
+                            chunk = event.get("data", {}).get("chunk")
+                            content = getattr(chunk, "content", None)
+                            if isinstance(content, str) and content:
+                                await queue.put({"event": "token", "data": {"text": content}})
+                        
+                        elif kind == "on_chain_end" and not event.get("parent_ids"):
+                            output = event.get("data", {}).get("output")
+                            if isinstance(output, dict):
+                                final_state = output
+                
+                agent_start = time.perf_counter()
+                try:
+                    await asyncio.wait_for(_consume_agent_events(), timeout=12.0)
+                except asyncio.TimeoutError:
+                    logger.warning("Agent stream timeout, falling back to direct query")
+                    await queue.put({"event": "final", "data": await self._handle_timeout_fallback(user_question)})
+                    return
+                except GraphRecursionError:
+                    await queue.put({"event": "final", "data": self._step_budget_exhausted_response(user_question)})
+                    return
+                finally:
+                    overlap = self._finish_prefetch(prefetch, timeline)
+                
+                self.agent_latency.record(time.perf_counter() - agent_start)
+                
+                executed_sql = self._single_executed_sql()
+                parsed_response = self._parse_agent_response(final_state, user_question)
+                self._record_agent_steps(final_state, parsed_response, overlap)
+                self.answer_cache.put(cache_key, parsed_response, self.schema_version, user_question)
+                self._remember_sql(user_question, conversation_context, executed_sql, final_state, parsed_response)
+                await queue.put({"event": "final", "data": parsed_response})
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error streaming query: {e}")
+                await queue.put({"event": "final", "data": self._create_error_response(user_question, str(e))})
+            finally:
+                queue.put_nowait(None)
+    
     def _optimize_query_prompt(self, user_question: str) -> str:
         """Optimize the query prompt for faster processing."""
         return f"Execute this healthcare database query efficiently: {user_question}"
     
     def _map_column_names(self, sql_query: str) -> str:
-        """Map common column names to actual database column names."""
-        for common_name, actual_name in self.column_mapping.items():
-            pattern = r'(?<!")\b' + re.escape(common_name) + r'\b(?!")'
-            sql_query = re.sub(pattern, actual_name, sql_query, flags=re.IGNORECASE)
-        return sql_query
-    
-    async def _try_quick_patterns(self, user_question: str):
-        """Try to handle common query patterns quickly without full agent."""
-        return None
+        """Map common column names to actual database column names, leaving literals and comments alone."""
+        self.sql_rewriter.load_schema(getattr(self.db_connection, 'schema_cache', None))
+        return self.sql_rewriter.rewrite(sql_query)
+    
+    async def _try_quick_patterns(self, user_question: str, conversation_context: str = None):
+        """Answer common question shapes from SQL templates without the full agent.
+        
+        Args:
+            user_question: User's question or query
+            conversation_context: Optional conversation context
+            
+        Returns:
+            Response built from a template query, or None if no template matches
+        """
+        if self._depends_on_context(user_question, conversation_context):
+            return None
+        
+        template = self.query_templates.match(user_question)
+        if template is None:
+            return None
+        
+        start = time.perf_counter()
+        success, data, error, status_code = await self.db_connection.execute(template.sql, template.params)
+        elapsed = time.perf_counter() - start
+        self.query_templates.record_execution(elapsed, success)
+        if not success:
+            logger.warning(f"Template {template.name} failed ({error}) - falling back to the agent")
+            return None
+        
+        logger.info(f"Answered with template {template.name} in {elapsed:.3f}s")
+        data = data or []
+        table_data = TableData.from_rows(data) if data else None
+        if table_data is not None:
+            request_context = get_request_context()
+            if request_context is not None:
+                request_context.record_query(template.sql, data)
+                request_context.last_table_data = table_data
+        
+        metadata = {
+            "type": "query_template",
+            "template": template.name,
+            "slots": template.slots,
+            "execution_time": round(elapsed, 4)
+        }
+        if table_data is not None and table_data.truncated:
+            metadata["truncated"] = True
+        
+        return DatabaseResponse(
+            success=True,
+            message=template.summarize(data),
+            query_understanding=f"Recognized as {template.name.replace('_', ' ')}",
+            sql_query=template.sql,
+            result_count=len(data),
+            table_data=table_data,
+            metadata=metadata
+        )
     
     async def _handle_direct_sql(self, sql_query: str):
         """Handle direct SQL queries without agent overhead."""
         try:
             mapped_sql = self._map_column_names(sql_query)
             
-            if '""' in mapped_sql:
-                logger.warning(f"Detected double quotes in SQL, attempting to fix: {mapped_sql}")
-                mapped_sql = mapped_sql.replace('""', '"')
-            
             success, data, error, status_code = await self.db_connection.execute_query(mapped_sql)
             
             if success and data:
-                self.last_query_data = data
-                self.last_query_sql = mapped_sql
+                request_context = get_request_context()
+                if request_context is not None:
+                    request_context.record_query(mapped_sql, data)
                 
-                if isinstance(data[0], dict):
-                    from src.models.response_models import TableData
-                    headers = list(data[0].keys())
-                    rows = [[str(row.get(col, '')) for col in headers] for row in data]
-                    table_data = TableData(headers=headers, rows=rows, row_count=len(rows))
-                else:
-                    table_data = None
+                table_data = TableData.from_rows(data)
+                metadata = {"type": "direct_sql", "execution_time": "fast"}
+                if table_data.truncated:
+                    metadata["truncated"] = True
                 
                 return DatabaseResponse(
                     success=True,
@@ -939,7 +1596,7 @@ Remember: Database queries for patient data, Tavily search for medical knowledge
                     result_count=len(data),
                     sql_query=mapped_sql,
                     table_data=table_data,
-                    metadata={"type": "direct_sql", "execution_time": "fast"}
+                    metadata=metadata
                 )
             else:
                 return DatabaseResponse(
@@ -1120,17 +1777,33 @@ Remember: Database queries for patient data, Tavily search for medical knowledge
         return "\n".join(insights[:1])
     
     async def _ensure_ready(self):
-        """Ensure database connection and schema are ready."""
+        """Ensure database connection and schema are ready.
+        
+        Only the cached readiness state is checked once the database is up;
+        the background heartbeat and failed queries keep it current.
+        """
         try:
-            connected, error = await self.db_connection.test_connection()
-            if not connected:
-                raise Exception(f"Database connection failed: {error}")
-            
-            if not hasattr(self.db_connection, 'schema_cache') or not self.db_connection.schema_cache:
-                await self.db_connection.extract_complete_schema()
+            await self.db_connection.readiness.ensure_ready()
         except Exception as e:
             logger.error(f"Error ensuring database readiness: {e}")
             raise
+        self._sync_schema_version()
+    
+    def _sync_schema_version(self) -> bool:
+        """Follow a change of the database catalog fingerprint into the schema version.
+        
+        Returns:
+            True if the version changed and answers cached for the old one were dropped
+        """
+        if getattr(self.db_connection, 'schema_fingerprint', None) == self._catalog_fingerprint:
+            return False
+        previous_version = self.schema_version
+        self.schema_version = self._compute_schema_version()
+        if self.schema_version == previous_version:
+            return False
+        removed = self.answer_cache.invalidate_schema(self.schema_version)
+        logger.info(f"Database schema changed - schema version {self.schema_version}, {removed} cached answers dropped")
+        return True
     
     def _parse_agent_response(self, agent_result: Dict, user_question: str):
         """Parse LangGraph agent response.
@@ -1153,11 +1826,10 @@ Remember: Database queries for patient data, Tavily search for medical knowledge
                     final_message = msg.content
                     break
             
-            if not final_message:
+            final_answer = self._structured_final_answer(messages)
+            if not final_message and final_answer is None:
                 return self._create_error_response(user_question, "No content found in response")
             
-            logger.info(f"Processing agent output: {final_message[:200]}...")
-            
             response_data = {
                 "success": True,
                 "message": "",
@@ -1168,38 +1840,54 @@ Remember: Database queries for patient data, Tavily search for medical knowledge
                 "metadata": {}
             }
             
-            stored_sql = None
-            if hasattr(self, 'last_query_sql') and self.last_query_sql:
-                stored_sql = self.last_query_sql
+            request_context = get_request_context()
+            stored_sql = request_context.last_query_sql if request_context else None
+            query_data = request_context.last_query_data if request_context else None
             
-            if hasattr(self, 'last_query_data') and self.last_query_data:
+            if query_data:
                 try:
-                    from src.models.response_models import TableData
-                    if isinstance(self.last_query_data, list) and len(self.last_query_data) > 0:
-                        if isinstance(self.last_query_data[0], dict):
-                            headers = list(self.last_query_data[0].keys())
-                            
-                            response_data["table_data"] = TableData(
-                                headers=headers,
-                                data=self.last_query_data,
-                                row_count=len(self.last_query_data)
-                            )
-                            response_data["result_count"] = len(self.last_query_data)
-                            logger.info(f"Created table_data with {len(headers)} columns and {len(self.last_query_data)} rows")
+                    table_data = TableData.from_rows(query_data)
+                    if table_data is not None:
+                        table_data.truncated = request_context.last_query_truncated
+                        response_data["table_data"] = table_data
+                        if request_context.last_query_truncated:
+                            response_data["metadata"]["truncated"] = True
+                        response_data["result_count"] = len(query_data)
+                        request_context.last_table_data = table_data
+                        logger.info(f"Created table_data with {len(table_data.headers)} columns and {len(query_data)} rows")
                 except Exception as e:
                     logger.warning(f"Error creating table data: {e}")
                 
-                self.last_query_data = None
-                self.last_query_sql = None
+                request_context.last_query_data = None
+                request_context.last_query_sql = None
+                request_context.last_query_truncated = False
+            
+            if final_answer is not None:
+                self.final_answer_counts["structured"] += 1
+                response_data["message"] = final_answer.get("message") or "Query processed successfully."
+                # The executed (rewritten) SQL matches the table; the model's claim is only a fallback
+                response_data["sql_query"] = stored_sql or final_answer.get("sql") or ""
+                if str(final_answer.get("result_ref", "last")).lower() == "none":
+                    response_data["table_data"] = None
+                    response_data["result_count"] = 0
+                    if request_context is not None:
+                        request_context.last_table_data = None
+                response_data["metadata"]["final_answer_format"] = "structured"
+                return DatabaseResponse(**response_data) if DatabaseResponse else response_data
+            
+            # Fallback for runs that ended in plain text instead of a final_answer call
+            self.final_answer_counts["regex_fallback"] += 1
+            response_data["metadata"]["final_answer_format"] = "regex_fallback"
+            logger.info(f"Processing agent output: {final_message[:200]}...")
             
             sql_pattern = r'(?:SELECT|INSERT|UPDATE|DELETE)[^;]+;?'
             sql_matches = re.findall(sql_pattern, final_message, re.IGNORECASE | re.DOTALL)
-            if sql_matches:
-                response_data["sql_query"] = sql_matches[-1].strip()
-                logger.info(f"Extracted SQL from response: {sql_matches[-1].strip()[:100]}...")
-            elif stored_sql:
+            if stored_sql:
                 response_data["sql_query"] = stored_sql
                 logger.info(f"Using stored SQL: {stored_sql[:100]}...")
+            elif sql_matches:
+                response_data["sql_query"] = sql_matches[-1].strip()
+                logger.info(f"Extracted SQL from response: {sql_matches[-1].strip()[:100]}...")
             
             json_pattern = r'\{[^{}]*\}'
             json_matches = re.findall(json_pattern, final_message)
@@ -1237,6 +1925,26 @@ Remember: Database queries for patient data, Tavily search for medical knowledge
             logger.error(f"Error parsing agent response: {e}")
             return self._create_error_response(user_question, str(e))
     
+    def _structured_final_answer(self, messages: List[Any]) -> Optional[Dict[str, Any]]:
+        """Arguments of the final_answer call in the agent's last turn, if it made one.
+        
+        Args:
+            messages: Messages of the final graph state
+            
+        Returns:
+            FinalAnswer arguments, or None when the run ended with plain text
+        """
+        if not self.structured_final_answer:
+            return None
+        for message in reversed(messages):
+            if getattr(message, "type", None) != "ai":
+                continue
+            for tool_call in getattr(message, "tool_calls", None) or []:
+                if tool_call.get("name") == FINAL_ANSWER_TOOL and isinstance(tool_call.get("args"), dict):
+                    return tool_call["args"]
+            return None
+        return None
+    
     def _is_just_raw_data(self, message: str) -> bool:
         """Check if message is just raw data without interpretation.
         
@@ -1521,9 +2229,9 @@ Remember: Database queries for patient data, Tavily search for medical knowledge
     def clear_session_memory(self):
         """Clear session memory and cached data"""
         try:
-            self.last_query_data = None
-            self.last_query_sql = None
-            self.last_table_data = None
+            request_context = get_request_context()
+            if request_context is not None:
+                request_context.clear_query_data()
             
             logger.info("Cleared cached query data from agent")
         except Exception as e:
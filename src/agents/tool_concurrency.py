@@ -0,0 +1,289 @@
+"""
+Tool concurrency accounting and speculative prefetch for the ReAct agent
+
+LangGraph's ToolNode already runs the tool calls of one model turn with
+asyncio.gather when the graph is driven asynchronously, so a query and a
+Tavily search requested together overlap on the event loop. RequestTimeline
+records when every LLM call and tool call ran so that overlap can be
+measured per request. SpeculativePrefetcher starts cheap lookups for the
+tables and patient names a question mentions as soon as the question
+arrives, so they run while the first LLM call is in flight and their
+results are ready for the later steps.
+"""
+
+import asyncio
+import os
+import re
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from src.utils.metrics import LatencyTracker
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+# Two capitalized words, allowing Synthea's numeric suffixes ("Abe604 Smith91")
+_PERSON_NAME = re.compile(r"\b([A-Z][a-z'\-]+\d*)\s+([A-Z][a-z'\-]+\d*)\b")
+
+_NOT_NAME_WORDS = frozenset("""
+show list find get give tell display what which who whom how when where why is are does do did can could
+please patient patients doctor dr mr mrs ms miss the a an and or for of in on with all any
+january february march april may june july august september october november december
+monday tuesday wednesday thursday friday saturday sunday
+""".split())
+
+
+def _union_length(intervals: List[Tuple[float, float]]) -> float:
+    """Total time covered by a set of possibly overlapping intervals"""
+    total = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def _intersection_length(interval: Tuple[float, float], others: List[Tuple[float, float]]) -> float:
+    """Time of one interval covered by the union of others"""
+    start, end = interval
+    clipped = [(max(start, other_start), min(end, other_end)) for other_start, other_end in others
+               if other_start < end and other_end > start]
+    return _union_length(clipped)
+
+
+class RequestTimeline(AsyncCallbackHandler):
+    """Callback handler recording when the LLM calls, tool calls and prefetches of one request ran"""
+
+    def __init__(self):
+        super().__init__()
+        self._open: Dict[UUID, Tuple[str, float]] = {}
+        self.llm_calls: List[Tuple[float, float]] = []
+        self.tool_calls: List[Tuple[str, float, float]] = []
+        self.prefetches: List[Tuple[str, float, float]] = []
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *,
+                                  run_id: UUID, **kwargs: Any):
+        self._open[run_id] = ("llm", time.perf_counter())
+
+    async def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        self._close(run_id)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._close(run_id)
+
+    async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        self._open[run_id] = ((serialized or {}).get("name") or kwargs.get("name") or "tool", time.perf_counter())
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._close(run_id)
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._close(run_id)
+
+    def _close(self, run_id: UUID):
+        opened = self._open.pop(run_id, None)
+        if opened is None:
+            return
+        name, start = opened
+        if name == "llm":
+            self.llm_calls.append((start, time.perf_counter()))
+        else:
+            self.tool_calls.append((name, start, time.perf_counter()))
+
+    def record_prefetch(self, name: str, start: float, end: float):
+        self.prefetches.append((name, start, end))
+
+    def summary(self) -> Dict[str, Any]:
+        """Tool time, wall time and overlap, plus prefetch time hidden behind LLM calls"""
+        tool_intervals = [(start, end) for _, start, end in self.tool_calls]
+        tool_busy = sum(end - start for start, end in tool_intervals)
+        tool_wall = _union_length(tool_intervals)
+        concurrent_tools = sum(
+            1 for position, interval in enumerate(tool_intervals)
+            if _intersection_length(interval, tool_intervals[:position] + tool_intervals[position + 1:]) > 0
+        )
+        prefetch_busy = sum(end - start for _, start, end in self.prefetches)
+        prefetch_hidden = sum(_intersection_length((start, end), self.llm_calls) for _, start, end in self.prefetches)
+        return {
+            "llm_calls": len(self.llm_calls),
+            "tool_calls": len(self.tool_calls),
+            "concurrent_tool_calls": concurrent_tools,
+            "tool_busy_seconds": round(tool_busy, 4),
+            "tool_wall_seconds": round(tool_wall, 4),
+            "tool_overlap_seconds": round(tool_busy - tool_wall, 4),
+            "prefetches": len(self.prefetches),
+            "prefetch_seconds": round(prefetch_busy, 4),
+            "prefetch_hidden_seconds": round(prefetch_hidden, 4)
+        }
+
+
+class PrefetchHandle:
+    """The speculative lookups started for one question"""
+
+    def __init__(self, tables: List[str], names: List[Tuple[str, str]]):
+        self.tables = tables
+        self.names = names
+        self.schema_blocks: Dict[str, str] = {}
+        self.resolved_names: Dict[str, List[Dict[str, Any]]] = {}
+        self.tasks: List[asyncio.Task] = []
+        self.used = False
+
+    def ready_name_hints(self) -> Optional[str]:
+        """Prompt lines for the name lookups that have already finished"""
+        lines = []
+        for name, rows in self.resolved_names.items():
+            if not rows:
+                lines.append(f"- {name}: no matching patient")
+                continue
+            matches = "; ".join(
+                f"\"PATIENT_ID\" = '{row.get('PATIENT_ID')}' ({row.get('FIRST')} {row.get('LAST')}, born {row.get('BIRTHDATE')})"
+                for row in rows
+            )
+            lines.append(f"- {name}: {matches}")
+        if not lines:
+            return None
+        self.used = True
+        return "**Patients matching names in the question:**\n" + "\n".join(lines)
+
+    def cancel(self):
+        for task in self.tasks:
+            if not task.done():
+                task.cancel()
+
+
+class SpeculativePrefetcher:
+    """Starts schema and patient-name lookups for a question before the first LLM call returns"""
+
+    def __init__(self, db_connection: Any, schema_block: Any = None, enabled: Optional[bool] = None,
+                 max_names: int = 2, name_limit: int = 5):
+        self.db_connection = db_connection
+        self.schema_block = schema_block
+        if enabled is None:
+            enabled = os.getenv("SPECULATIVE_PREFETCH", "true").lower() == "true"
+        self.enabled = enabled
+        self.max_names = max_names
+        self.name_limit = name_limit
+
+        self.requests = 0
+        self.tables_prefetched = 0
+        self.names_looked_up = 0
+        self.names_resolved = 0
+        self.prefetches_used = 0
+        self.prefetches_cancelled = 0
+        self.concurrent_tool_calls = 0
+        self.tool_overlap = LatencyTracker()
+        self.prefetch_hidden = LatencyTracker()
+
+    def _table_names(self) -> List[str]:
+        schema = getattr(self.db_connection, "schema_cache", None) or {}
+        return [table_info["name"] for table_info in schema.get("tables", {}).values()]
+
+    def detect(self, question: str) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """Tables and "First Last" patient names mentioned in a question"""
+        lowered = question.lower()
+        tables = []
+        for table_name in self._table_names():
+            spoken = table_name.replace("_", " ")
+            singular = spoken[:-3] + "y" if spoken.endswith("ies") else spoken.rstrip("s")
+            if re.search(r"\b(" + re.escape(spoken) + "|" + re.escape(singular) + r")\b", lowered):
+                tables.append(table_name)
+
+        names = []
+        for first, last in _PERSON_NAME.findall(question):
+            if first.lower() in _NOT_NAME_WORDS or last.lower() in _NOT_NAME_WORDS:
+                continue
+            names.append((first, last))
+        return tables, names[:self.max_names]
+
+    def start(self, question: str, timeline: Optional[RequestTimeline] = None) -> Optional[PrefetchHandle]:
+        """Detect entities and launch their lookups as background tasks"""
+        if not self.enabled:
+            return None
+        tables, names = self.detect(question)
+        if not tables and not names:
+            return None
+
+        self.requests += 1
+        handle = PrefetchHandle(tables, names)
+        if self.schema_block is not None:
+            for table_name in tables:
+                handle.tasks.append(asyncio.create_task(self._prefetch_schema(handle, table_name, timeline)))
+        for first, last in names:
+            handle.tasks.append(asyncio.create_task(self._prefetch_name(handle, first, last, timeline)))
+        return handle
+
+    async def _prefetch_schema(self, handle: PrefetchHandle, table_name: str, timeline: Optional[RequestTimeline]):
+        start = time.perf_counter()
+        block = self.schema_block(table_name)
+        if block:
+            handle.schema_blocks[table_name.lower()] = block
+            self.tables_prefetched += 1
+        if timeline is not None:
+            timeline.record_prefetch(f"schema:{table_name}", start, time.perf_counter())
+
+    async def _prefetch_name(self, handle: PrefetchHandle, first: str, last: str, timeline: Optional[RequestTimeline]):
+        start = time.perf_counter()
+        self.names_looked_up += 1
+        try:
+            success, data, error, _ = await self.db_connection.execute(
+                'SELECT "PATIENT_ID", "FIRST", "LAST", "BIRTHDATE" FROM patients '
+                'WHERE "FIRST" ILIKE :first AND "LAST" ILIKE :last LIMIT ' + str(self.name_limit),
+                {"first": f"{first.rstrip('0123456789')}%", "last": f"{last.rstrip('0123456789')}%"}
+            )
+        except asyncio.CancelledError:
+            self.prefetches_cancelled += 1
+            raise
+        if success:
+            handle.resolved_names[f"{first} {last}"] = data or []
+            if data:
+                self.names_resolved += 1
+        else:
+            logger.info(f"Name prefetch for {first} {last} failed: {error}")
+        if timeline is not None:
+            timeline.record_prefetch(f"name:{first} {last}", start, time.perf_counter())
+
+    def finish(self, handle: Optional[PrefetchHandle], timeline: Optional[RequestTimeline]) -> Optional[Dict[str, Any]]:
+        """Cancel leftover lookups and fold the request's overlap into the running stats"""
+        if handle is not None:
+            handle.cancel()
+            if handle.used:
+                self.prefetches_used += 1
+        if timeline is None:
+            return None
+        summary = timeline.summary()
+        self.concurrent_tool_calls += summary["concurrent_tool_calls"]
+        if summary["tool_calls"]:
+            self.tool_overlap.record(summary["tool_overlap_seconds"])
+        if summary["prefetches"]:
+            self.prefetch_hidden.record(summary["prefetch_hidden_seconds"])
+        return summary
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prefetch usage and tool/prefetch overlap statistics"""
+        return {
+            "enabled": self.enabled,
+            "requests_prefetched": self.requests,
+            "tables_prefetched": self.tables_prefetched,
+            "names_looked_up": self.names_looked_up,
+            "names_resolved": self.names_resolved,
+            "prefetches_used": self.prefetches_used,
+            "prefetches_cancelled": self.prefetches_cancelled,
+            "concurrent_tool_calls": self.concurrent_tool_calls,
+            "tool_overlap_seconds": self.tool_overlap.summary(),
+            "prefetch_hidden_seconds": self.prefetch_hidden.summary()
+        }
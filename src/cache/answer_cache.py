@@ -0,0 +1,216 @@
+"""
+Question-level answer cache for the database agents
+
+Clinicians ask the same handful of questions all day. Successful answers are
+cached under the normalized question, a hash of the conversation context the
+answer depended on and the schema version, so a repeat question is answered
+without another ReAct loop. Entries expire after a TTL, the least recently
+used ones are evicted past an entry or memory cap, and everything can be
+invalidated when the underlying data or schema change.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.utils.fast_json import dumps_bytes
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+# Words that make a question depend on what was said before it
+_CONTEXT_REFERENCES = re.compile(
+    r"\b(that|those|these|them|they|it|its|his|her|their|same|previous|above|also|"
+    r"else|another|again|instead)\b"
+)
+_PUNCTUATION = re.compile(r"[^\w\s%<>=.-]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivially different phrasings share a key"""
+    normalized = _PUNCTUATION.sub(" ", question.lower())
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return normalized.rstrip(".")
+
+
+def references_context(question: str) -> bool:
+    """True when a question refers back to the conversation, so its answer depends on the context"""
+    return bool(_CONTEXT_REFERENCES.search(question.lower()))
+
+
+class _CacheEntry:
+    __slots__ = ("response", "size", "created_at", "schema_version", "question", "hits")
+
+    def __init__(self, response: Any, size: int, schema_version: str, question: str):
+        self.response = response
+        self.size = size
+        self.created_at = time.time()
+        self.schema_version = schema_version
+        self.question = question
+        self.hits = 0
+
+
+class AnswerCache:
+    """LRU + TTL cache of successful agent answers with a memory cap"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None, enabled: Optional[bool] = None):
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("ANSWER_CACHE_TTL", "900"))
+        self.max_bytes = max_bytes or int(os.getenv("ANSWER_CACHE_MAX_MB", "64")) * 1024 * 1024
+        if enabled is None:
+            enabled = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.rejected_too_large = 0
+        self.evictions_lru = 0
+        self.evictions_ttl = 0
+        self.evictions_memory = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(question: str, conversation_context: Optional[str], schema_version: str) -> str:
+        """Build the cache key from the normalized question, context hash and schema version"""
+        context = ""
+        if conversation_context and references_context(question):
+            context = _WHITESPACE.sub(" ", conversation_context).strip()
+        context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+        raw_key = f"{schema_version}\x00{normalize_question(question)}\x00{context_hash}"
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached response for a key, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry.created_at > self.ttl_seconds:
+                self._remove(key)
+                self.evictions_ttl += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            return self._copy_for_caller(entry)
+
+    def put(self, key: str, response: Any, schema_version: str, question: str) -> bool:
+        """Cache a response; returns False when it is not cacheable or does not fit"""
+        if not self.enabled or not getattr(response, "success", False):
+            return False
+
+        try:
+            size = len(dumps_bytes(response))
+        except Exception as e:
+            logger.warning(f"Answer not cached, could not size response: {e}")
+            return False
+        if size > self.max_bytes:
+            self.rejected_too_large += 1
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(response, size, schema_version, question)
+            self.total_bytes += size
+            self.stores += 1
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions_lru += 1
+            while self.total_bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions_memory += 1
+        return True
+
+    def record_bypass(self):
+        """Count a request that asked to skip the cache"""
+        self.bypassed += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
+
+    def _copy_for_caller(self, entry: _CacheEntry) -> Any:
+        """Shallow copy so callers can annotate metadata without touching the cached entry"""
+        response = entry.response
+        metadata = dict(getattr(response, "metadata", None) or {})
+        metadata["answer_cache"] = {
+            "hit": True,
+            "age_seconds": round(time.time() - entry.created_at, 3),
+            "hits": entry.hits
+        }
+        if hasattr(response, "model_copy"):
+            return response.model_copy(update={"metadata": metadata})
+        return response
+
+    def invalidate(self, question: Optional[str] = None) -> int:
+        """Drop every entry, or only entries for one question; returns how many were removed"""
+        with self._lock:
+            if question is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self.total_bytes = 0
+            else:
+                target = normalize_question(question)
+                keys = [key for key, entry in self._entries.items() if normalize_question(entry.question) == target]
+                for key in keys:
+                    self._remove(key)
+                removed = len(keys)
+            self.invalidations += 1
+        logger.info(f"Answer cache invalidated: {removed} entries removed")
+        return removed
+
+    def invalidate_schema(self, current_version: str) -> int:
+        """Drop entries cached under any schema version other than the current one"""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry.schema_version != current_version]
+            for key in keys:
+                self._remove(key)
+            if keys:
+                self.invalidations += 1
+        return len(keys)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counts and memory usage"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "rejected_too_large": self.rejected_too_large,
+            "evictions_lru": self.evictions_lru,
+            "evictions_ttl": self.evictions_ttl,
+            "evictions_memory": self.evictions_memory,
+            "invalidations": self.invalidations
+        }
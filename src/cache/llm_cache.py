@@ -0,0 +1,236 @@
+"""
+Persistent SQLite cache for deterministic LLM calls
+
+Both AzureChatOpenAI instances run at temperature 0, so an identical prompt
+sent to the same model and deployment yields an interchangeable answer.
+This LangChain cache stores those answers in a SQLite file keyed by a hash
+of the serialized model settings (model, deployment, temperature, bound
+tools) and the prompt, so repeats are free even after a restart. The file
+is bounded by entry count and size with least-recently-used eviction, each
+call site can opt out, and a request that asked to bypass caches skips it.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import warnings
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, Generation
+
+from src.state.request_context import get_request_context
+from src.utils.metrics import LatencyTracker
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+# Only model outputs are revived from the file, never arbitrary serialized objects
+_ALLOWED_OBJECTS = [Generation, ChatGeneration, ChatGenerationChunk, AIMessage, AIMessageChunk]
+
+
+class SQLiteLLMCache(BaseCache):
+    """LangChain BaseCache backed by a size-bounded SQLite file"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.path = Path(path or os.getenv("LLM_CACHE_PATH", "llm_cache/llm_responses.sqlite"))
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+        self.max_bytes = max_bytes or int(os.getenv("LLM_CACHE_MAX_MB", "100")) * 1024 * 1024
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                llm_hash TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses(last_used)")
+        self._connection.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+        self.lookup_latency = LatencyTracker()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _bypassed() -> bool:
+        request_context = get_request_context()
+        return request_context is not None and request_context.bypass_cache
+
+    @staticmethod
+    def _loads(payload: str) -> List[Generation]:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return loads(payload, allowed_objects=_ALLOWED_OBJECTS)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        """Return the cached generations for a prompt and model configuration, or None"""
+        if self._bypassed():
+            self.bypassed += 1
+            return None
+
+        start = time.perf_counter()
+        key = self._key(prompt, llm_string)
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT response FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        "UPDATE llm_responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+                    )
+                    self._connection.commit()
+            generations = self._loads(row[0]) if row is not None else None
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache lookup failed: {e}")
+            generations = None
+
+        self.lookup_latency.record(time.perf_counter() - start)
+        if generations is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]):
+        """Store the generations for a prompt and evict the least recently used entries over the caps"""
+        if self._bypassed():
+            return
+        try:
+            payload = dumps(list(return_val))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM response not cacheable: {e}")
+            return
+
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        llm_hash = hashlib.sha256(llm_string.encode("utf-8")).hexdigest()[:16]
+        try:
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, llm_hash, response, size, created_at, last_used, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (self._key(prompt, llm_string), llm_hash, payload, size, now, now)
+                )
+                self.stores += 1
+                self._evict()
+                self._connection.commit()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache update failed: {e}")
+
+    def _evict(self):
+        count, total = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+        ).fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            # Drop the oldest tenth at a time so eviction is not paid on every insert
+            batch = max(1, count // 10)
+            rows = self._connection.execute(
+                "SELECT key, size FROM llm_responses ORDER BY last_used LIMIT ?", (batch,)
+            ).fetchall()
+            if not rows:
+                break
+            self._connection.executemany("DELETE FROM llm_responses WHERE key = ?", [(row[0],) for row in rows])
+            self.evictions += len(rows)
+            count -= len(rows)
+            total -= sum(row[1] for row in rows)
+
+    def clear(self, **kwargs: Any):
+        """Drop every cached response"""
+        with self._lock:
+            self._connection.execute("DELETE FROM llm_responses")
+            self._connection.commit()
+        logger.info("LLM response cache cleared")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate, size and eviction counters"""
+        with self._lock:
+            count, total = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": count,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "lookup_seconds": self.lookup_latency.summary(),
+            "call_sites": dict(_call_sites)
+        }
+
+
+_shared_cache: Optional[SQLiteLLMCache] = None
+_shared_lock = threading.Lock()
+_call_sites: Dict[str, bool] = {}
+
+
+def get_llm_cache(call_site: str) -> Optional[SQLiteLLMCache]:
+    """Shared cache for a call site, or None when caching is off globally or for that site.
+
+    LLM_CACHE_ENABLED=false turns the cache off everywhere;
+    LLM_CACHE_DISABLED_SITES lists call sites (e.g. ``react_agent,query_generator``)
+    that opt out.
+    """
+    global _shared_cache
+    disabled_sites = {site.strip() for site in os.getenv("LLM_CACHE_DISABLED_SITES", "").split(",") if site.strip()}
+    enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true" and call_site not in disabled_sites
+    _call_sites[call_site] = enabled
+    if not enabled:
+        return None
+
+    with _shared_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = SQLiteLLMCache()
+                logger.info(f"LLM response cache at {_shared_cache.path}")
+            except Exception as e:
+                logger.warning(f"LLM response cache unavailable: {e}")
+                return None
+    return _shared_cache
+
+
+def llm_cache_stats() -> Optional[Dict[str, Any]]:
+    """Stats of the shared cache, if one was created"""
+    return _shared_cache.get_stats() if _shared_cache is not None else None
@@ -0,0 +1,315 @@
+"""
+Semantic NL→SQL reuse cache for paraphrased questions
+
+Exact-match answer caching misses paraphrases such as "patients with
+diabetes" and "who has diabetes". This index keeps the SQL of previously
+successful questions as hashed character n-gram TF-IDF vectors and finds
+the closest earlier question with a NumPy cosine search, entirely
+in-process. A match must clear a similarity threshold and share the same
+key terms (conditions, literals, numbers, aggregations, negations), so "top 5" never
+reuses the SQL of "top 10". The caller then re-executes the stored SQL
+directly and skips the LLM.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import logging
+from typing import Any, Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?|[<>]=?|!=")
+
+# Case-preserving tokens for key terms; quoted strings are literals as a whole
+_KEY_TOKEN = re.compile(r"'([^']+)'|\"([^\"]+)\"|([A-Za-z0-9]+(?:\.[0-9]+)?|[<>]=?|!=)")
+
+# Filler and generic domain words that do not change which SQL answers a question
+_GENERIC_WORDS = frozenset("""
+a an the of in on for to by at from with within and or is are was were be been being do does did
+has have had having there their any all me my us our you your i we please can could would will
+show list find get give display tell return fetch see how much what which who whom whose where when
+patient patients people person persons record records data information info database table
+diagnosed diagnosis suffering living currently
+""".split())
+
+# Aggregation and comparison synonyms collapse to one canonical key term
+_SYNONYMS = {
+    "many": "count", "count": "count", "number": "count", "howmany": "count",
+    "average": "avg", "avg": "avg", "mean": "avg",
+    "total": "sum", "sum": "sum",
+    "top": "max", "most": "max", "highest": "max", "max": "max", "maximum": "max", "largest": "max",
+    "least": "min", "lowest": "min", "min": "min", "minimum": "min", "fewest": "min", "smallest": "min",
+    "not": "not", "without": "not", "no": "not", "never": "not", "excluding": "not", "except": "not",
+    "over": ">", "above": ">", "older": ">", "greater": ">", "more": ">", "after": ">", ">": ">", ">=": ">=",
+    "under": "<", "below": "<", "younger": "<", "less": "<", "fewer": "<", "before": "<", "<": "<", "<=": "<=",
+    "female": "female", "women": "female", "woman": "female",
+    "male": "male", "men": "male", "man": "male",
+}
+
+# Longest first; a suffix is only removed when at least MIN_STEM characters remain
+_SUFFIXES = ("ations", "ation", "ions", "ion", "ics", "ic", "ing", "es", "ed", "s")
+MIN_STEM = 4
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def stem(token: str) -> str:
+    """Strip one inflectional suffix so "diabetic"/"diabetes" and "medication"/"medications" agree"""
+    if token.endswith("ies") and len(token) - 3 >= MIN_STEM - 1:
+        return token[:-3] + "y"
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            if suffix == "s" and token.endswith("ss"):
+                return token
+            return token[:-len(suffix)]
+    return token
+
+
+def key_terms(question: str) -> FrozenSet[str]:
+    """Terms that must match exactly for two questions to share SQL
+
+    Literals (numbers, quoted strings, codes such as "NY" and capitalized
+    names) are kept whole; other words are stemmed.
+    """
+    terms = set()
+    for position, (quoted_single, quoted_double, word) in enumerate(_KEY_TOKEN.findall(question)):
+        if quoted_single or quoted_double:
+            terms.add("'" + (quoted_single or quoted_double).lower() + "'")
+            continue
+        token = word.lower()
+        if word.isupper() and word.isalpha() and 1 < len(word) <= 3:
+            # State and other codes, even where they spell a filler word ("IN", "OR", "ME")
+            terms.add(token)
+        elif token in _SYNONYMS:
+            terms.add(_SYNONYMS[token])
+        elif token in _GENERIC_WORDS:
+            continue
+        elif token[0].isdigit() or (position > 0 and not word.islower()):
+            terms.add(token)
+        else:
+            terms.add(stem(token))
+    return frozenset(terms)
+
+
+class HashedTfidfVectorizer:
+    """Character n-gram TF-IDF over a fixed number of hashed buckets"""
+
+    def __init__(self, dimensions: int = 2048, ngram_range: tuple = (3, 5)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def _bucket(self, gram: str) -> int:
+        digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.dimensions
+
+    def term_frequencies(self, text: str) -> np.ndarray:
+        """Sub-linear term frequencies of word-bounded character n-grams"""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        low, high = self.ngram_range
+        for token in _tokens(text):
+            padded = f" {token} "
+            for size in range(low, high + 1):
+                for start in range(0, max(1, len(padded) - size + 1)):
+                    vector[self._bucket(padded[start:start + size])] += 1.0
+        nonzero = vector > 0
+        vector[nonzero] = 1.0 + np.log(vector[nonzero])
+        return vector
+
+
+class _SQLEntry:
+    __slots__ = ("question", "sql", "terms", "schema_version", "llm_calls", "created_at", "last_used", "uses")
+
+    def __init__(self, question: str, sql: str, terms: FrozenSet[str], schema_version: str, llm_calls: int):
+        self.question = question
+        self.sql = sql
+        self.terms = terms
+        self.schema_version = schema_version
+        self.llm_calls = llm_calls
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+class SemanticSQLCache:
+    """Similarity index over successful (question, SQL) pairs with LRU and TTL eviction"""
+
+    def __init__(self, threshold: Optional[float] = None, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None, dimensions: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        self.threshold = threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.35"))
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+        if enabled is None:
+            enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+        self.vectorizer = HashedTfidfVectorizer(dimensions or int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "2048")))
+
+        self._lock = threading.Lock()
+        self._entries: List[_SQLEntry] = []
+        self._tf = np.zeros((0, self.vectorizer.dimensions), dtype=np.float32)
+        self._document_frequency = np.zeros(self.vectorizer.dimensions, dtype=np.float32)
+        self._weighted: Optional[np.ndarray] = None
+        self._idf: Optional[np.ndarray] = None
+
+        self.lookups = 0
+        self.matches = 0
+        self.reuses = 0
+        self.below_threshold = 0
+        self.rejected_by_key_terms = 0
+        self.stores = 0
+        self.evictions_lru = 0
+        self.evictions_ttl = 0
+        self.evictions_schema = 0
+        self.execution_failures = 0
+        self.llm_calls_avoided = 0
+
+    def _rebuild(self):
+        """Recompute IDF weights and the normalized TF-IDF matrix after the index changed"""
+        count = len(self._entries)
+        self._idf = (np.log((1.0 + count) / (1.0 + self._document_frequency)) + 1.0).astype(np.float32)
+        weighted = self._tf * self._idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._weighted = weighted / norms
+
+    def _delete(self, indexes: List[int]):
+        if not indexes:
+            return
+        keep = np.ones(len(self._entries), dtype=bool)
+        keep[indexes] = False
+        self._document_frequency -= (self._tf[~keep] > 0).sum(axis=0)
+        self._tf = self._tf[keep]
+        self._entries = [entry for position, entry in enumerate(self._entries) if keep[position]]
+        self._weighted = None
+
+    def lookup(self, question: str, schema_version: str) -> Optional[Dict[str, Any]]:
+        """Find stored SQL for a paraphrase of the question, or None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self.lookups += 1
+            now = time.time()
+            expired = [position for position, entry in enumerate(self._entries)
+                       if now - entry.created_at > self.ttl_seconds]
+            stale = [position for position, entry in enumerate(self._entries)
+                     if entry.schema_version != schema_version and position not in expired]
+            self.evictions_ttl += len(expired)
+            self.evictions_schema += len(stale)
+            self._delete(sorted(expired + stale))
+            if not self._entries:
+                return None
+            if self._weighted is None:
+                self._rebuild()
+
+            query = self.vectorizer.term_frequencies(question) * self._idf
+            norm = float(np.linalg.norm(query))
+            if norm == 0.0:
+                return None
+            scores = self._weighted @ (query / norm)
+
+            if float(scores.max()) < self.threshold:
+                self.below_threshold += 1
+                return None
+
+            terms = key_terms(question)
+            for position in np.argsort(scores)[::-1][:5]:
+                score = float(scores[position])
+                if score < self.threshold:
+                    break
+                entry = self._entries[position]
+                if entry.terms != terms:
+                    self.rejected_by_key_terms += 1
+                    continue
+
+                entry.last_used = now
+                entry.uses += 1
+                self.matches += 1
+                return {
+                    "sql": entry.sql,
+                    "matched_question": entry.question,
+                    "similarity": round(score, 4),
+                    "llm_calls_avoided": entry.llm_calls
+                }
+            return None
+
+    def store(self, question: str, sql: str, schema_version: str, llm_calls: int = 1) -> bool:
+        """Remember the SQL that successfully answered a question"""
+        if not self.enabled or not sql:
+            return False
+
+        terms = key_terms(question)
+        vector = self.vectorizer.term_frequencies(question)
+        if not vector.any():
+            return False
+
+        with self._lock:
+            normalized = " ".join(_tokens(question))
+            duplicates = [position for position, entry in enumerate(self._entries)
+                          if " ".join(_tokens(entry.question)) == normalized]
+            self._delete(duplicates)
+
+            if len(self._entries) >= self.max_entries:
+                oldest = min(range(len(self._entries)), key=lambda position: self._entries[position].last_used)
+                self._delete([oldest])
+                self.evictions_lru += 1
+
+            self._entries.append(_SQLEntry(question, sql, terms, schema_version, max(1, llm_calls)))
+            self._tf = np.vstack([self._tf, vector[np.newaxis, :]])
+            self._document_frequency += (vector > 0)
+            self._weighted = None
+            self.stores += 1
+        return True
+
+    def record_reuse(self, match: Dict[str, Any]):
+        """Count a match whose SQL was re-executed successfully in place of the agent"""
+        self.reuses += 1
+        self.llm_calls_avoided += match.get("llm_calls_avoided", 0)
+
+    def record_execution_failure(self, sql: str):
+        """Forget stored SQL that no longer executes"""
+        self.execution_failures += 1
+        with self._lock:
+            self._delete([position for position, entry in enumerate(self._entries) if entry.sql == sql])
+
+    def invalidate(self) -> int:
+        """Drop every stored question"""
+        with self._lock:
+            removed = len(self._entries)
+            self._delete(list(range(removed)))
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate, rejection reasons, evictions and LLM calls avoided"""
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "reuses": self.reuses,
+            "hit_rate": round(self.reuses / self.lookups, 4) if self.lookups else None,
+            "below_threshold": self.below_threshold,
+            "rejected_by_key_terms": self.rejected_by_key_terms,
+            "stores": self.stores,
+            "evictions_lru": self.evictions_lru,
+            "evictions_ttl": self.evictions_ttl,
+            "evictions_schema": self.evictions_schema,
+            "execution_failures": self.execution_failures,
+            "llm_calls_avoided": self.llm_calls_avoided
+        }
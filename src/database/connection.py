@@ -1,8 +1,10 @@
 import os
+import re
+import time
 import asyncio
 import json
 import logging
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Dict, Any, AsyncIterator, Optional, Tuple, List
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
@@ -10,6 +12,12 @@ from sqlalchemy import text
 from sqlalchemy.engine import URL
 from dotenv import load_dotenv
 
+from src.database.readiness import ReadinessMonitor, is_connection_error
+from src.database.profiles import ExecutionProfile, INTERACTIVE, load_profiles
+from src.database.prepared import PreparedStatementCache
+from src.database.result_set import ResultSet
+from src.database.schema_snapshot import CATALOG_FINGERPRINT_QUERY, SchemaSnapshotStore
+
 try:
     import structlog
     logger = structlog.get_logger(__name__)
@@ -36,6 +44,86 @@ except EnvironmentError as e:
     logger.error(f"Environment validation failed: {e}")
     raise
 
+# Leading comments are skipped so a commented query is still recognized and capped
+_READ_QUERY = re.compile(r"^\s*(?:(?:--[^\n]*(?:\n|$)|/\*.*?\*/)\s*)*(\(\s*)*(select|with|values|table)\b",
+                         re.IGNORECASE | re.DOTALL)
+_TRAILING_LIMIT = re.compile(r"\blimit\s+(\d+)(\s+offset\s+\d+)?\s*$", re.IGNORECASE)
+
+
+def apply_row_cap(sql_query: str, max_rows: int) -> Tuple[str, bool]:
+    """Push a row cap into a read query as ``LIMIT max_rows + 1``; returns the SQL and whether it was capped.
+
+    The extra row tells a truncated result apart from one that has exactly
+    ``max_rows`` rows. A trailing LIMIT at or under the cap is left alone;
+    anything else is wrapped so ORDER BY, UNION and existing LIMITs keep
+    their meaning.
+    """
+    query = sql_query.strip().rstrip(";").rstrip()
+    if not _READ_QUERY.match(query):
+        return query, False
+    existing = _TRAILING_LIMIT.search(query)
+    if existing and int(existing.group(1)) <= max_rows:
+        return query, False
+    # Newlines keep a trailing -- comment from swallowing the closing parenthesis
+    return f"SELECT * FROM (\n{query}\n) AS capped_result LIMIT {max_rows + 1}", True
+
+
+class QueryStream:
+    """Async iterator over the row batches of one query, read through a server-side cursor
+
+    Each batch is a ResultSet of row tuples. ``columns``, ``row_count``
+    and ``truncated`` are filled in as the batches are consumed; leaving
+    the loop early closes the cursor. The row cap and batch size default
+    to those of the execution profile.
+    """
+    
+    def __init__(self, db_connection: "DatabaseConnection", sql_query: str, params: Optional[Dict[str, Any]] = None,
+                 max_rows: Optional[int] = None, batch_size: Optional[int] = None, profile: str = INTERACTIVE):
+        self.db_connection = db_connection
+        self.sql_query = sql_query
+        self.params = params or {}
+        self.profile = db_connection.get_profile(profile)
+        self.max_rows = max_rows if max_rows is not None else self.profile.max_rows
+        self.batch_size = batch_size or self.profile.fetch_size
+        self.columns: List[str] = []
+        self.row_count = 0
+        self.truncated = False
+    
+    def __aiter__(self) -> AsyncIterator[ResultSet]:
+        return self._batches()
+    
+    async def _batches(self) -> AsyncIterator[ResultSet]:
+        db = self.db_connection
+        sanitized_query = db._sanitize_query(self.sql_query)
+        capped_query, pushed_down = apply_row_cap(sanitized_query, self.max_rows) if self.max_rows else (sanitized_query, False)
+        if pushed_down:
+            db.fetch_stats["limit_pushdowns"] += 1
+        
+        # Timeout, read-only and planner settings come with the profile's pooled connection
+        async with db.session_factory(self.profile.name)() as session:
+            result = await session.stream(text(capped_query), self.params)
+            try:
+                self.columns = list(result.keys())
+                async for partition in result.partitions(self.batch_size):
+                    db.fetch_stats["batches"] += 1
+                    rows = [tuple(row) for row in partition]
+                    if self.max_rows and self.row_count + len(rows) > self.max_rows:
+                        rows = rows[:self.max_rows - self.row_count]
+                        self.truncated = True
+                    self.row_count += len(rows)
+                    if rows:
+                        yield ResultSet(self.columns, rows)
+                    if self.truncated:
+                        break
+            finally:
+                await result.close()
+        
+        db.fetch_stats["streamed_queries"] += 1
+        db.fetch_stats["rows_fetched"] += self.row_count
+        if self.truncated:
+            db.fetch_stats["truncated_results"] += 1
+
+
 class DatabaseConnection:
     """Enhanced PostgreSQL connection optimized for ReAct agent with schema management"""
     
@@ -43,12 +131,22 @@ class DatabaseConnection:
         self.engine = None
         self.async_session = None
         self.schema_cache: Dict[str, Any] = {}
+        self.schema_fingerprint: Optional[str] = None
+        self.schema_snapshot = SchemaSnapshotStore()
+        self.profiles: Dict[str, ExecutionProfile] = load_profiles()
+        self.engines: Dict[str, Any] = {}
+        self._session_factories: Dict[str, Any] = {}
+        self.profile_queries: Dict[str, int] = {name: 0 for name in self.profiles}
+        self.prepared_statements = PreparedStatementCache()
+        self.fetch_stats = {"streamed_queries": 0, "batches": 0, "rows_fetched": 0,
+                            "limit_pushdowns": 0, "truncated_results": 0}
         self._setup_connection()
+        self.readiness = ReadinessMonitor(self)
     
     def _setup_connection(self):
         """Initialize database connection from .env - works with ANY database"""
    
-        db_url = URL.create(
+        self._db_url = URL.create(
             drivername="postgresql+asyncpg",
             username=os.getenv("DB_USER"),
             password=os.getenv("DB_PASSWORD"),
@@ -59,22 +157,51 @@ class DatabaseConnection:
         
         logger.info(
             f"Connecting to database: "
-            f"{db_url.host}:{db_url.port}/{db_url.database}"
+            f"{self._db_url.host}:{self._db_url.port}/{self._db_url.database}"
         )
         
-        self.engine = create_async_engine(
-            db_url,
-            pool_size=10,
-            max_overflow=20,
+        # The interactive pool is the main engine; the other profiles open theirs on first use
+        self.pool_size = self.profiles[INTERACTIVE].pool_size
+        self.async_session = self.session_factory(INTERACTIVE)
+        self.engine = self.engines[INTERACTIVE]
+    
+    def get_profile(self, name: str) -> ExecutionProfile:
+        """Look up an execution profile by name"""
+        profile = self.profiles.get(name)
+        if profile is None:
+            raise ValueError(f"Unknown execution profile {name!r}; expected one of {', '.join(self.profiles)}")
+        return profile
+    
+    def session_factory(self, profile_name: str = INTERACTIVE):
+        """Session factory bound to the pool of an execution profile"""
+        factory = self._session_factories.get(profile_name)
+        if factory is not None:
+            return factory
+        
+        profile = self.get_profile(profile_name)
+        engine = create_async_engine(
+            self._db_url,
+            pool_size=profile.pool_size,
+            max_overflow=profile.max_overflow,
             pool_pre_ping=True,
-            echo=False  
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            connect_args={"server_settings": profile.server_settings()},
+            echo=False
         )
-        
-        self.async_session = sessionmaker(
-            self.engine,
+        factory = sessionmaker(
+            engine,
             class_=AsyncSession,
             expire_on_commit=False
         )
+        self.engines[profile_name] = engine
+        self._session_factories[profile_name] = factory
+        logger.info(f"Opened {profile_name} connection pool: {profile.server_settings()}")
+        return factory
+    
+    async def dispose_pools(self):
+        """Close the pooled connections of every execution profile"""
+        for engine in list(self.engines.values()):
+            await engine.dispose()
     
     async def test_connection(self) -> Tuple[bool, Optional[str]]:
         """Test database connection"""
@@ -94,7 +221,75 @@ class DatabaseConnection:
             logger.error(error_msg)
             return False, error_msg
     
-    async def extract_complete_schema(self) -> Dict[str, Any]:
+    async def warm_pool(self, connections: Optional[int] = None) -> int:
+        """Open pooled connections up front so the first requests skip connect/auth"""
+        target = min(connections or self.pool_size, self.pool_size)
+        
+        async def _open_one():
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                await asyncio.sleep(0.05)
+        
+        results = await asyncio.gather(*[_open_one() for _ in range(target)], return_exceptions=True)
+        warmed = sum(1 for r in results if not isinstance(r, Exception))
+        logger.info(f"🔥 Database pool warmed: {warmed}/{target} connections")
+        return warmed
+    
+    def get_pool_status(self) -> Dict[str, Any]:
+        """Get current connection pool counters"""
+        pool = self.engine.pool if self.engine else None
+        if pool is None:
+            return {}
+        try:
+            return {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow()
+            }
+        except Exception:
+            return {"status": pool.status()}
+    
+    async def compute_schema_fingerprint(self) -> str:
+        """md5 over the pg_catalog rows the extracted schema is built from; one cheap aggregate query"""
+        async with self.async_session() as session:
+            result = await session.execute(text(CATALOG_FINGERPRINT_QUERY))
+            row = result.fetchone()
+        return row.fingerprint
+    
+    async def extract_complete_schema(self, force: bool = False) -> Dict[str, Any]:
+        """Load the schema snapshot when the catalog fingerprint still matches it, otherwise extract and save it"""
+        start = time.perf_counter()
+        fingerprint = None
+        fingerprint_seconds = None
+        if self.schema_snapshot.enabled:
+            try:
+                fingerprint = await self.compute_schema_fingerprint()
+                fingerprint_seconds = time.perf_counter() - start
+            except Exception as e:
+                logger.warning(f"Catalog fingerprint failed, extracting the full schema: {e}")
+                self.schema_snapshot.record("fingerprint_failed")
+        
+        if fingerprint and not force:
+            schema = self.schema_snapshot.load(fingerprint)
+            if schema is not None:
+                self.schema_cache = schema
+                self.schema_fingerprint = fingerprint
+                self.schema_snapshot.record("reused", fingerprint_seconds, time.perf_counter() - start)
+                logger.info(
+                    f"✅ Schema loaded from snapshot (fingerprint {fingerprint[:12]}): "
+                    f"{len(schema['tables'])} tables, {len(schema.get('relationships', []))} relationships"
+                )
+                return schema
+        
+        schema = await self._extract_schema_from_catalog()
+        self.schema_fingerprint = fingerprint
+        if fingerprint and schema.get("tables"):
+            self.schema_snapshot.save(fingerprint, schema)
+        self.schema_snapshot.record("extracted", fingerprint_seconds, time.perf_counter() - start)
+        return schema
+    
+    async def _extract_schema_from_catalog(self) -> Dict[str, Any]:
         """Extract complete database schema optimized for ReAct agent"""
         try:
             logger.info("🔍 Extracting schema for ReAct agent...")
@@ -203,32 +398,99 @@ class DatabaseConnection:
             logger.error(f"Schema extraction failed: {e}")
             raise
     
-    async def execute_query(self, sql_query: str) -> Tuple[bool, Any, Optional[str], int]:
-        """Execute SQL query optimized for ReAct agent responses"""
+    def iter_query(self, sql_query: str, params: Optional[Dict[str, Any]] = None, max_rows: Optional[int] = None,
+                   batch_size: Optional[int] = None, profile: str = INTERACTIVE) -> QueryStream:
+        """Stream a query's rows in batches; ``max_rows`` (profile default, 0 for none) is pushed into the SQL"""
+        self.profile_queries[self.get_profile(profile).name] += 1
+        return QueryStream(self, sql_query, params, max_rows=max_rows, batch_size=batch_size, profile=profile)
+    
+    async def execute_query(self, sql_query: str, params: Optional[Dict[str, Any]] = None,
+                            max_rows: Optional[int] = None, profile: str = INTERACTIVE) -> Tuple[bool, Any, Optional[str], int]:
+        """Execute SQL query optimized for ReAct agent responses; ``params`` binds :name placeholders
+
+        Rows come back as a ``ResultSet``, whose ``truncated`` flag is set when
+        the query had more than ``max_rows`` rows. ``profile`` picks the
+        execution profile (interactive, export or analytics).
+        """
         try:
-            sanitized_query = self._sanitize_query(sql_query)
-            logger.info(f"🔧 Executing ReAct agent query: {sanitized_query[:100]}...")
+            logger.info(f"🔧 Executing ReAct agent query ({profile}): {sql_query.strip()[:100]}...")
             
-            async with self.async_session() as session:
-                await session.execute(text("SET statement_timeout = '30s'"))
-                result = await session.execute(text(sanitized_query))
-                rows = result.fetchall()
-                cols = result.keys()
-                
-                data = [dict(zip(cols, row)) for row in rows] if rows else []
-                
-                if len(data) > 1000:
-                    data = data[:1000]
-                    logger.warning("⚠️ Result truncated to 1000 rows for ReAct agent")
-                
-                logger.info(f"✅ ReAct agent query executed, {len(data)} rows returned")
-                return True, data, None, 200
+            stream = self.iter_query(sql_query, params, max_rows=max_rows, profile=profile)
+            data = ResultSet(row_cap=stream.max_rows or None)
+            async for batch in stream:
+                data.extend(batch.rows)
+            data.columns = stream.columns
+            data.truncated = stream.truncated
+            
+            if data.truncated:
+                logger.warning(f"⚠️ Result truncated to {stream.max_rows} rows for ReAct agent")
+            
+            logger.info(f"✅ ReAct agent query executed, {len(data)} rows returned")
+            self.readiness.report_success()
+            return True, data, None, 200
                 
         except Exception as e:
-            error = str(e)
-            status = self._map_db_error_to_status(e)
-            logger.error(f"❌ ReAct agent query failed ({status}): {error}")
-            return False, None, error, status
+            return self._query_failed(e)
+    
+    async def execute(self, sql_query: str, params: Optional[Dict[str, Any]] = None,
+                      max_rows: Optional[int] = None, profile: str = INTERACTIVE) -> Tuple[bool, Any, Optional[str], int]:
+        """Execute a parameterized query through a cached asyncpg prepared statement
+
+        ``:name`` placeholders are bound from ``params`` as real parameters,
+        so repeated template and fast-path queries reuse the statement and
+        plan prepared on each pooled connection. Returns the same tuple as
+        ``execute_query``.
+        """
+        try:
+            execution_profile = self.get_profile(profile)
+            row_cap = max_rows if max_rows is not None else execution_profile.max_rows
+            sanitized_query = self._sanitize_query(sql_query)
+            capped_query, pushed_down = apply_row_cap(sanitized_query, row_cap) if row_cap else (sanitized_query, False)
+            if pushed_down:
+                self.fetch_stats["limit_pushdowns"] += 1
+            positional_query, args = self.prepared_statements.bind(capped_query, params)
+            # Unrecognized or uncapped statements are read through a cursor so at most row_cap + 1 rows load
+            fetch_limit = row_cap + 1 if row_cap and not pushed_down and not _TRAILING_LIMIT.search(capped_query) else None
+            
+            self.session_factory(profile)
+            self.profile_queries[profile] += 1
+            async with self.engines[profile].connect() as conn:
+                raw_connection = await conn.get_raw_connection()
+                columns, records = await self.prepared_statements.fetch(
+                    raw_connection.driver_connection, positional_query, args, limit=fetch_limit
+                )
+            
+            truncated = bool(row_cap) and len(records) > row_cap
+            data = ResultSet(columns, [tuple(record) for record in (records[:row_cap] if truncated else records)],
+                             truncated=truncated, row_cap=row_cap or None)
+            self.fetch_stats["rows_fetched"] += len(data)
+            if truncated:
+                self.fetch_stats["truncated_results"] += 1
+                logger.warning(f"⚠️ Result truncated to {row_cap} rows")
+            
+            self.readiness.report_success()
+            return True, data, None, 200
+        
+        except Exception as e:
+            return self._query_failed(e)
+    
+    def _query_failed(self, exception: Exception) -> Tuple[bool, Any, Optional[str], int]:
+        error = str(exception)
+        status = self._map_db_error_to_status(exception)
+        if is_connection_error(exception):
+            self.readiness.report_failure(error)
+        logger.error(f"❌ ReAct agent query failed ({status}): {error}")
+        return False, None, error, status
+    
+    def get_fetch_stats(self) -> Dict[str, Any]:
+        """Get streamed fetch, LIMIT pushdown and truncation counters, with per-profile settings"""
+        return {
+            **self.fetch_stats,
+            "profiles": {
+                name: {**profile.to_dict(), "queries": self.profile_queries[name], "pool_open": name in self.engines}
+                for name, profile in self.profiles.items()
+            }
+        }
     
     def _sanitize_query(self, query: str) -> str:
         """Basic SQL query sanitization"""
@@ -275,6 +537,7 @@ class DatabaseConnection:
     
     async def close(self):
         """Clean up connections"""
-        if self.engine:
-            await self.engine.dispose()
+        await self.readiness.stop()
+        if self.engines:
+            await self.dispose_pools()
             logger.info("🔌 Database connections closed")
\ No newline at end of file
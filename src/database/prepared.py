@@ -0,0 +1,165 @@
+"""
+Parameter binding and prepared-statement reuse for asyncpg
+
+Template and fast-path queries run the same SQL text with different values
+many times. Converting their ``:name`` placeholders to asyncpg's ``$n``
+form and keeping the prepared statement per pooled connection lets
+Postgres parse and plan each statement once per connection instead of once
+per call, with the values always sent as bind parameters.
+"""
+
+import os
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from src.utils.metrics import LatencyTracker
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+try:
+    from asyncpg.exceptions import InvalidCachedStatementError
+except ImportError:
+    InvalidCachedStatementError = None
+
+
+_PLACEHOLDER_PATTERN = re.compile(r"""
+    (?P<string>[Ee]'(?:[^'\\]|\\.|'')*'?|[BbXxNn]?'(?:[^']|'')*'?)
+  | (?P<dollar>\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?(?:\$(?P=tag)\$|\Z))
+  | (?P<line_comment>--[^\n]*)
+  | (?P<block_comment>/\*.*?(?:\*/|\Z))
+  | (?P<quoted>"(?:[^"]|"")*"?)
+  | (?P<cast>::)
+  | (?P<param>:(?P<name>[A-Za-z_]\w*))
+""", re.VERBOSE | re.DOTALL)
+
+
+def to_positional(sql_query: str) -> Tuple[str, List[str]]:
+    """Rewrite ``:name`` placeholders to ``$n``, skipping literals, comments and ``::`` casts.
+
+    Returns the rewritten SQL and the parameter names in ``$n`` order; a
+    name used twice maps to the same position.
+    """
+    names: List[str] = []
+
+    def _replace(match: "re.Match") -> str:
+        if match.lastgroup != "param":
+            return match.group()
+        name = match.group("name")
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _PLACEHOLDER_PATTERN.sub(_replace, sql_query), names
+
+
+class PreparedStatementCache:
+    """Bounded LRU of asyncpg prepared statements for each pooled connection"""
+
+    def __init__(self, max_statements: Optional[int] = None, max_conversions: int = 512):
+        self.max_statements = max_statements or int(os.getenv("DB_PREPARED_CACHE_SIZE", "64"))
+        self._statements: "WeakKeyDictionary[Any, OrderedDict]" = WeakKeyDictionary()
+        self._conversions: "OrderedDict[str, Tuple[str, List[str]]]" = OrderedDict()
+        self._max_conversions = max_conversions
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.prepare_time = LatencyTracker()
+
+    def bind(self, sql_query: str, params: Optional[Dict[str, Any]] = None) -> Tuple[str, List[Any]]:
+        """Positional SQL and argument list for a query with ``:name`` parameters"""
+        with self._lock:
+            converted = self._conversions.get(sql_query)
+            if converted is not None:
+                self._conversions.move_to_end(sql_query)
+        if converted is None:
+            converted = to_positional(sql_query)
+            with self._lock:
+                self._conversions[sql_query] = converted
+                while len(self._conversions) > self._max_conversions:
+                    self._conversions.popitem(last=False)
+
+        positional_sql, names = converted
+        params = params or {}
+        missing = [name for name in names if name not in params]
+        if missing:
+            raise ValueError(f"Missing query parameters: {', '.join(missing)}")
+        return positional_sql, [params[name] for name in names]
+
+    async def _prepare(self, connection: Any, sql_query: str) -> Any:
+        statements = self._statements.get(connection)
+        if statements is None:
+            statements = self._statements[connection] = OrderedDict()
+
+        statement = statements.get(sql_query)
+        if statement is not None:
+            statements.move_to_end(sql_query)
+            self.hits += 1
+            return statement
+
+        self.misses += 1
+        start = time.perf_counter()
+        statement = await connection.prepare(sql_query)
+        self.prepare_time.record(time.perf_counter() - start)
+        statements[sql_query] = statement
+        while len(statements) > self.max_statements:
+            # asyncpg deallocates the server-side statement once it is unreferenced
+            statements.popitem(last=False)
+            self.evictions += 1
+        return statement
+
+    @staticmethod
+    async def _fetch_rows(connection: Any, statement: Any, args: List[Any], limit: Optional[int]) -> List[Any]:
+        if limit is None:
+            return await statement.fetch(*args)
+        # A portal with a row limit stops after ``limit`` rows; asyncpg cursors need a transaction
+        async with connection.transaction():
+            cursor = await statement.cursor(*args)
+            return await cursor.fetch(limit)
+
+    async def fetch(self, connection: Any, sql_query: str, args: List[Any],
+                    limit: Optional[int] = None) -> Tuple[List[str], List[Any]]:
+        """Run a positional query on an asyncpg connection through its cached prepared statement
+
+        With ``limit``, at most that many rows are read from the server.
+        Returns the result column names, known even when no rows come back, and the records.
+        """
+        statement = await self._prepare(connection, sql_query)
+        try:
+            records = await self._fetch_rows(connection, statement, args, limit)
+        except Exception as e:
+            if InvalidCachedStatementError is None or not isinstance(e, InvalidCachedStatementError):
+                raise
+            # The schema changed under the cached plan: prepare again once
+            self.invalidations += 1
+            self._statements.get(connection, {}).pop(sql_query, None)
+            statement = await self._prepare(connection, sql_query)
+            records = await self._fetch_rows(connection, statement, args, limit)
+        return [attribute.name for attribute in statement.get_attributes()], records
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prepared-statement hit rate, evictions and prepare latency"""
+        lookups = self.hits + self.misses
+        return {
+            "max_statements_per_connection": self.max_statements,
+            "connections": len(self._statements),
+            "cached_statements": sum(len(statements) for statements in list(self._statements.values())),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "prepare_seconds": self.prepare_time.summary()
+        }
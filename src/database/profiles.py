@@ -0,0 +1,94 @@
+"""
+Named execution profiles for database queries
+
+Issuing ``SET statement_timeout`` before every query costs a round trip and
+the setting sticks to the pooled connection. Each profile instead carries
+its settings as asyncpg ``server_settings``, so they are applied once when
+a connection of that profile's pool is opened and every query on it starts
+with them already in place.
+"""
+
+import os
+from typing import Dict, Optional
+
+
+INTERACTIVE = "interactive"
+EXPORT = "export"
+ANALYTICS = "analytics"
+
+
+class ExecutionProfile:
+    """Connection-level settings, fetch size and row cap for one kind of workload"""
+
+    def __init__(self, name: str, statement_timeout: str, read_only: bool = True, jit: Optional[bool] = None,
+                 work_mem: Optional[str] = None, fetch_size: int = 500, max_rows: int = 1000,
+                 pool_size: int = 2, max_overflow: int = 3):
+        self.name = name
+        self.statement_timeout = statement_timeout
+        self.read_only = read_only
+        self.jit = jit
+        self.work_mem = work_mem
+        self.fetch_size = fetch_size
+        self.max_rows = max_rows
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+
+    def server_settings(self) -> Dict[str, str]:
+        """PostgreSQL run-time parameters sent in the connection startup packet"""
+        settings = {
+            "statement_timeout": self.statement_timeout,
+            "default_transaction_read_only": "on" if self.read_only else "off",
+            "application_name": f"agentic_ai:{self.name}"
+        }
+        if self.jit is not None:
+            settings["jit"] = "on" if self.jit else "off"
+        if self.work_mem:
+            settings["work_mem"] = self.work_mem
+        return settings
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "server_settings": self.server_settings(),
+            "fetch_size": self.fetch_size,
+            "max_rows": self.max_rows,
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow
+        }
+
+
+def load_profiles() -> Dict[str, ExecutionProfile]:
+    """Build the interactive, export and analytics profiles from the environment"""
+    return {
+        # Agent tools, templates and lookups: fail fast, never write, skip JIT on small plans
+        INTERACTIVE: ExecutionProfile(
+            INTERACTIVE,
+            statement_timeout=os.getenv("DB_STATEMENT_TIMEOUT", "30s"),
+            read_only=True,
+            jit=False,
+            fetch_size=int(os.getenv("DB_FETCH_BATCH_SIZE", "500")),
+            max_rows=int(os.getenv("DB_MAX_RESULT_ROWS", "1000")),
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        ),
+        # Bulk reads streamed out through iter_query
+        EXPORT: ExecutionProfile(
+            EXPORT,
+            statement_timeout=os.getenv("DB_EXPORT_STATEMENT_TIMEOUT", "10min"),
+            read_only=True,
+            fetch_size=int(os.getenv("DB_EXPORT_FETCH_SIZE", "5000")),
+            max_rows=int(os.getenv("DB_EXPORT_MAX_ROWS", "0")),
+            pool_size=int(os.getenv("DB_EXPORT_POOL_SIZE", "2")),
+            max_overflow=1
+        ),
+        # Large sorts, hashes and aggregates
+        ANALYTICS: ExecutionProfile(
+            ANALYTICS,
+            statement_timeout=os.getenv("DB_ANALYTICS_STATEMENT_TIMEOUT", "2min"),
+            read_only=True,
+            work_mem=os.getenv("DB_ANALYTICS_WORK_MEM", "64MB"),
+            fetch_size=int(os.getenv("DB_FETCH_BATCH_SIZE", "500")),
+            max_rows=int(os.getenv("DB_MAX_RESULT_ROWS", "1000")),
+            pool_size=int(os.getenv("DB_ANALYTICS_POOL_SIZE", "2")),
+            max_overflow=2
+        )
+    }
@@ -0,0 +1,237 @@
+"""
+Cached database readiness for the request path
+
+Checking the database with a SELECT 1 round trip before every question
+doubles the connection work of simple requests. The ReadinessMonitor keeps
+the connection and schema state as a small state machine instead: a
+background heartbeat (or any successful query) keeps it fresh, requests only
+look at the cached state, and a connection failure seen by a real query
+flips it to unavailable and starts a reconnect with backoff.
+"""
+
+import asyncio
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+STARTING = "starting"
+CONNECTING = "connecting"
+LOADING_SCHEMA = "loading_schema"
+READY = "ready"
+UNAVAILABLE = "unavailable"
+
+# Fragments of driver errors that mean the connection itself is gone
+_CONNECTION_ERRORS = (
+    "connection refused", "connection reset", "connection was closed", "connection is closed",
+    "server closed the connection", "connection does not exist", "cannot connect", "could not connect",
+    "terminating connection", "connection timed out", "connect call failed", "broken pipe",
+    "name or service not known", "too many connections"
+)
+
+
+def is_connection_error(exception: Exception) -> bool:
+    """True when an exception from a query means the database connection failed"""
+    if isinstance(exception, (ConnectionError, OSError)):
+        return True
+    if getattr(exception, "connection_invalidated", False):
+        return True
+    message = str(exception).lower()
+    return any(fragment in message for fragment in _CONNECTION_ERRORS)
+
+
+class DatabaseNotReadyError(Exception):
+    """Raised on the request path while the database is unavailable"""
+
+
+class ReadinessMonitor:
+    """Connection and schema readiness state machine for a DatabaseConnection"""
+
+    def __init__(self, db_connection: Any, heartbeat_interval: Optional[float] = None,
+                 retry_interval: Optional[float] = None, max_backoff: Optional[float] = None):
+        self.db_connection = db_connection
+        self.heartbeat_interval = heartbeat_interval or float(os.getenv("RESOURCE_HEALTH_INTERVAL", "30"))
+        self.retry_interval = retry_interval or float(os.getenv("DB_RETRY_INTERVAL", "1"))
+        self.max_backoff = max_backoff or float(os.getenv("DB_RECONNECT_MAX_BACKOFF", "30"))
+
+        self.state = STARTING
+        self.state_since = datetime.now().isoformat()
+        self.database_connected = False
+        self.schema_loaded = False
+        self.last_check: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+
+        self._lock: Optional[asyncio.Lock] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._last_attempt = 0.0
+        self._last_success = 0.0
+
+        self.checks = 0
+        self.heartbeats_skipped = 0
+        self.failures_reported = 0
+        self.reconnects = 0
+        self.transitions: Dict[str, int] = {}
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == READY
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+        logger.info(f"Database readiness: {self.state} -> {state}")
+        self.state = state
+        self.state_since = datetime.now().isoformat()
+        self.transitions[state] = self.transitions.get(state, 0) + 1
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Created lazily so the monitor can be built outside a running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def ensure_ready(self):
+        """Return at once when ready; otherwise connect and load the schema, or raise DatabaseNotReadyError"""
+        if self.state == READY:
+            return
+
+        async with self._get_lock():
+            if self.state == READY:
+                return
+            if self.state == UNAVAILABLE and time.monotonic() - self._last_attempt < self.retry_interval:
+                raise DatabaseNotReadyError(f"Database unavailable: {self.last_error}")
+            if not await self._bring_up():
+                raise DatabaseNotReadyError(f"Database unavailable: {self.last_error}")
+
+    async def _bring_up(self) -> bool:
+        """Test the connection and load the schema cache if it is missing"""
+        self._last_attempt = time.monotonic()
+        self._set_state(CONNECTING)
+        if not await self._check_connection():
+            self._set_state(UNAVAILABLE)
+            return False
+
+        if not self.db_connection.schema_cache:
+            self._set_state(LOADING_SCHEMA)
+            try:
+                await self.db_connection.extract_complete_schema()
+            except Exception as e:
+                self.last_error = f"Schema load failed: {e}"
+                logger.error(self.last_error)
+                self._set_state(UNAVAILABLE)
+                return False
+        self.schema_loaded = bool(self.db_connection.schema_cache)
+        self._set_state(READY)
+        return True
+
+    async def _check_connection(self) -> bool:
+        self.checks += 1
+        self.last_check = datetime.now().isoformat()
+        try:
+            connected, error = await self.db_connection.test_connection()
+        except Exception as e:
+            connected, error = False, str(e)
+
+        self.database_connected = connected
+        if connected:
+            self.consecutive_failures = 0
+            self._last_success = time.monotonic()
+        else:
+            self.consecutive_failures += 1
+            self.last_error = error
+        return connected
+
+    async def heartbeat(self) -> str:
+        """One background check; skipped when a real query succeeded within the interval"""
+        if self.state == READY and time.monotonic() - self._last_success < self.heartbeat_interval:
+            self.heartbeats_skipped += 1
+            return self.state
+
+        async with self._get_lock():
+            if self.state == READY:
+                if not await self._check_connection():
+                    logger.warning(f"Database heartbeat failed: {self.last_error}")
+                    self._set_state(UNAVAILABLE)
+                    self._schedule_reconnect()
+            elif self._reconnect_task is None or self._reconnect_task.done():
+                await self._bring_up()
+        return self.state
+
+    def report_success(self):
+        """Record a successful query; it counts as a heartbeat"""
+        self._last_success = time.monotonic()
+
+    def report_failure(self, error: Any):
+        """Flip to unavailable after a connection failure seen by a real query and start reconnecting"""
+        self.failures_reported += 1
+        self.database_connected = False
+        self.last_error = str(error)
+        self._set_state(UNAVAILABLE)
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            return
+        try:
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+        except RuntimeError:
+            # No running loop: the next ensure_ready call reconnects instead
+            self._reconnect_task = None
+
+    async def _reconnect(self):
+        """Drop pooled connections and retry with exponential backoff until the database is back"""
+        self.reconnects += 1
+        delay = self.retry_interval
+        dispose_pools = getattr(self.db_connection, "dispose_pools", None)
+        if dispose_pools is not None:
+            try:
+                await dispose_pools()
+            except Exception as e:
+                logger.warning(f"Error disposing connection pools before reconnect: {e}")
+
+        while self.state != READY:
+            async with self._get_lock():
+                if self.state == READY or await self._bring_up():
+                    logger.info("Database connection re-established")
+                    return
+            logger.warning(f"Reconnect failed, retrying in {delay:.1f}s: {self.last_error}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
+
+    async def stop(self):
+        """Cancel a pending reconnect"""
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            self._reconnect_task.cancel()
+            try:
+                await self._reconnect_task
+            except asyncio.CancelledError:
+                pass
+        self._reconnect_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the cached readiness state and check counters"""
+        return {
+            "state": self.state,
+            "state_since": self.state_since,
+            "database_connected": self.database_connected,
+            "schema_loaded": self.schema_loaded,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "checks": self.checks,
+            "heartbeats_skipped": self.heartbeats_skipped,
+            "failures_reported": self.failures_reported,
+            "reconnects": self.reconnects,
+            "reconnecting": self._reconnect_task is not None and not self._reconnect_task.done(),
+            "transitions": dict(self.transitions)
+        }
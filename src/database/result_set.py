@@ -0,0 +1,87 @@
+"""
+Columnar, tuple-backed query results
+
+Building a dict per row repeats every column name in every row, and each
+layer that validates or re-shapes those dicts copies them again. A
+ResultSet keeps the column names once and the rows as the tuples the
+driver produced. It still reads like a list of row dicts (indexing,
+slicing and iteration build the dicts on demand), so existing consumers
+keep working, while the wire encoders and pydantic models take the tuples
+as they are.
+"""
+
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic_core import core_schema
+
+
+class ResultSet(Sequence):
+    """Column names once plus one tuple per row; rows read as dicts lazily"""
+
+    __slots__ = ("columns", "rows", "truncated", "row_cap")
+
+    def __init__(self, columns: Iterable[str] = (), rows: Optional[List[Tuple[Any, ...]]] = None,
+                 truncated: bool = False, row_cap: Optional[int] = None):
+        self.columns = list(columns)
+        self.rows = rows if rows is not None else []
+        self.truncated = truncated
+        self.row_cap = row_cap
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __bool__(self) -> bool:
+        return bool(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            columns = self.columns
+            return [dict(zip(columns, row)) for row in self.rows[index]]
+        return dict(zip(self.columns, self.rows[index]))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, ResultSet):
+            return self.columns == other.columns and self.rows == other.rows
+        if isinstance(other, list):
+            return self.to_dicts() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ResultSet(columns={self.columns!r}, rows={len(self.rows)}, truncated={self.truncated})"
+
+    def extend(self, rows: Iterable[Tuple[Any, ...]]):
+        self.rows.extend(rows)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Row dicts, built once at the edge for consumers that need them"""
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def column_values(self) -> List[Tuple[Any, ...]]:
+        """Per-column value tuples"""
+        if not self.rows:
+            return [() for _ in self.columns]
+        return list(zip(*self.rows))
+
+    @classmethod
+    def from_dicts(cls, rows: List[Dict[str, Any]]) -> "ResultSet":
+        """Tuple-backed copy of a list of row dicts"""
+        columns = list(rows[0].keys()) if rows else []
+        return cls(columns, [tuple(row.get(column) for column in columns) for row in rows])
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any) -> core_schema.CoreSchema:
+        # Accepted as-is (no copy) and serialized as row dicts
+        return core_schema.is_instance_schema(
+            cls, serialization=core_schema.plain_serializer_function_ser_schema(lambda result_set: result_set.to_dicts())
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema: Any, handler: Any) -> Dict[str, Any]:
+        return {"type": "array", "items": {"type": "object"}}
@@ -0,0 +1,139 @@
+"""
+Persisted schema snapshot with a catalog fingerprint
+
+The information_schema views behind extract_complete_schema are slow on
+large catalogs, and a cold start paid for them on the first request. The
+extracted schema is saved to a local JSON file together with an md5 over
+the pg_catalog rows it was built from (relations, columns, types,
+defaults and foreign keys). At startup a single aggregate query recomputes
+that fingerprint; when it matches the snapshot, the snapshot is used and
+the full extraction only runs after the schema actually changed.
+"""
+
+import json
+import os
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_FORMAT = 1
+
+# Mirrors what extract_complete_schema reads: base tables and their columns
+# outside the system schemas, plus foreign keys
+CATALOG_FINGERPRINT_QUERY = """
+SELECT md5(current_database() || ':' || coalesce(string_agg(entry, ',' ORDER BY entry), '')) AS fingerprint,
+       count(*) AS entries
+FROM (
+    SELECT n.nspname || '.' || c.relname || ':' || a.attnum || ':' || a.attname || ':'
+           || format_type(a.atttypid, a.atttypmod) || ':' || a.attnotnull::text || ':'
+           || coalesce(pg_get_expr(d.adbin, d.adrelid), '') AS entry
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_catalog.pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+    WHERE c.relkind IN ('r', 'p')
+      AND n.nspname NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
+      AND n.nspname NOT LIKE 'pg_temp%'
+    UNION ALL
+    SELECT 'fk:' || n.nspname || '.' || con.conname || ':' || pg_get_constraintdef(con.oid)
+    FROM pg_catalog.pg_constraint con
+    JOIN pg_catalog.pg_namespace n ON n.oid = con.connamespace
+    WHERE con.contype = 'f'
+      AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+) catalog_entries
+"""
+
+
+class SchemaSnapshotStore:
+    """Reads and atomically writes the schema snapshot file"""
+
+    def __init__(self, path: Optional[str] = None, enabled: Optional[bool] = None):
+        self.path = Path(path or os.getenv("SCHEMA_SNAPSHOT_PATH", "schema_cache/schema_snapshot.json"))
+        if enabled is None:
+            enabled = os.getenv("SCHEMA_SNAPSHOT_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+
+        self.reused = 0
+        self.extracted = 0
+        self.fingerprint_failures = 0
+        self.last_outcome: Optional[str] = None
+        self.last_fingerprint_seconds: Optional[float] = None
+        self.last_load_seconds: Optional[float] = None
+
+    def load(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """The snapshot's schema when it was saved for this catalog fingerprint, else None"""
+        if not self.enabled or not self.path.exists():
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable schema snapshot {self.path}: {e}")
+            return None
+
+        if snapshot.get("format") != SNAPSHOT_FORMAT or snapshot.get("fingerprint") != fingerprint:
+            return None
+        schema = snapshot.get("schema")
+        if not isinstance(schema, dict) or "tables" not in schema:
+            return None
+        return schema
+
+    def save(self, fingerprint: str, schema: Dict[str, Any]):
+        """Write the snapshot through a temporary file so readers never see half of it"""
+        if not self.enabled:
+            return
+        snapshot = {
+            "format": SNAPSHOT_FORMAT,
+            "fingerprint": fingerprint,
+            "saved_at": datetime.now().isoformat(),
+            "schema": schema
+        }
+        # Per-process name: several workers may save at once, each renames its own complete file
+        temporary = self.path.with_suffix(f"{self.path.suffix}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, default=str)
+            os.replace(temporary, self.path)
+            logger.info(f"Schema snapshot saved to {self.path}")
+        except OSError as e:
+            logger.warning(f"Could not save schema snapshot {self.path}: {e}")
+            try:
+                temporary.unlink()
+            except OSError:
+                pass
+
+    def record(self, outcome: str, fingerprint_seconds: Optional[float] = None, load_seconds: Optional[float] = None):
+        """Count a startup outcome: reused, extracted or fingerprint_failed"""
+        if outcome == "reused":
+            self.reused += 1
+        elif outcome == "extracted":
+            self.extracted += 1
+        elif outcome == "fingerprint_failed":
+            self.fingerprint_failures += 1
+        self.last_outcome = outcome
+        self.last_fingerprint_seconds = round(fingerprint_seconds, 4) if fingerprint_seconds is not None else None
+        self.last_load_seconds = round(load_seconds, 4) if load_seconds is not None else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get snapshot reuse counters and the timings of the last schema load"""
+        return {
+            "enabled": self.enabled,
+            "path": str(self.path),
+            "exists": self.path.exists(),
+            "reused": self.reused,
+            "extracted": self.extracted,
+            "fingerprint_failures": self.fingerprint_failures,
+            "last_outcome": self.last_outcome,
+            "last_fingerprint_seconds": self.last_fingerprint_seconds,
+            "last_load_seconds": self.last_load_seconds
+        }
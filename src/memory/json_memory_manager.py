@@ -1,14 +1,24 @@
 
 import json
 import os
+import re
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 import uuid
 import structlog
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 logger = structlog.get_logger(__name__)
 
+# Session ids can come from API clients, so keep them to safe file names
+_UNSAFE_SESSION_CHARS = re.compile(r'[^A-Za-z0-9_.-]')
+
 class JSONMemoryManager:
     """Enhanced JSON-based memory manager for conversation history"""
     
@@ -25,17 +35,75 @@ class JSONMemoryManager:
             dir_path.mkdir(exist_ok=True)
         
 
-        self.current_session_id = self._find_or_create_session()
-        self.session_file = self.sessions_dir / f"{self.current_session_id}.json"
+        # Shared by every worker process using this directory
+        self.lock_file = self.base_dir / ".memory.lock"
+        self.pointer_file = self.base_dir / "current_session"
         
+        with self._file_lock():
+            self.current_session_id = self._find_or_create_session()
+            self.session_file = self.sessions_dir / f"{self.current_session_id}.json"
+            
 
-        if not self.session_file.exists():
-            self._initialize_session()
-        else:
-            logger.info(f"Recovered existing session: {self.current_session_id}")
+            if not self.session_file.exists():
+                self._initialize_session()
+            else:
+                logger.info(f"Recovered existing session: {self.current_session_id}")
+            self._write_session_pointer()
         
         logger.info(f"JSON Memory Manager initialized with session: {self.current_session_id}")
     
+    @contextmanager
+    def _file_lock(self):
+        """Serialize read-modify-write cycles across worker processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_file, 'a') as lock_handle:
+            fcntl.flock(lock_handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_handle, fcntl.LOCK_UN)
+    
+    def _atomic_write_json(self, path: Path, data: Dict[str, Any]):
+        """Write JSON to a temp file and rename it over the target so readers never see partial files"""
+        tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+    
+    def _write_session_pointer(self):
+        """Publish the current session so other workers follow it"""
+        try:
+            tmp_path = self.pointer_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(self.current_session_id, encoding='utf-8')
+            os.replace(tmp_path, self.pointer_file)
+        except Exception as e:
+            logger.warning(f"Could not write session pointer: {e}")
+    
+    def _refresh_current_session(self):
+        """Switch to the session another worker started, if any"""
+        try:
+            if not self.pointer_file.exists():
+                return
+            session_id = self.pointer_file.read_text(encoding='utf-8').strip()
+            if session_id and session_id != self.current_session_id:
+                session_file = self.sessions_dir / f"{session_id}.json"
+                if session_file.exists():
+                    self.current_session_id = session_id
+                    self.session_file = session_file
+                    logger.info(f"Following session started by another worker: {session_id}")
+        except Exception as e:
+            logger.warning(f"Could not read session pointer: {e}")
+    
+    def _resolve_session(self, session_id: Optional[str] = None):
+        """Return the session id and file to use, following the shared pointer only when no id is given"""
+        if session_id is None:
+            self._refresh_current_session()
+            return self.current_session_id, self.session_file
+        safe_id = _UNSAFE_SESSION_CHARS.sub('_', session_id)
+        return session_id, self.sessions_dir / f"{safe_id}.json"
+    
     def _generate_session_id(self) -> str:
         """Generate unique session ID"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -98,74 +166,56 @@ class JSONMemoryManager:
         
         self._save_session_data(session_data)
     
-    def _save_session_data(self, session_data: Dict[str, Any]):
-        """Save session data to JSON file with backup and retry"""
+    def _save_session_data(self, session_data: Dict[str, Any], session_id: Optional[str] = None):
+        """Save session data to JSON file atomically with retry"""
         session_data["last_updated"] = datetime.now().isoformat()
-        
-
-        backup_file = None
-        if self.session_file.exists():
-            backup_file = self.session_file.with_suffix('.json.bak')
-            try:
-                backup_file.write_text(self.session_file.read_text())
-            except Exception as e:
-                logger.warning(f"Could not create backup: {e}")
+        session_file = self.session_file if session_id is None else self._resolve_session(session_id)[1]
         
 
         for attempt in range(3):
             try:
-                with open(self.session_file, 'w', encoding='utf-8') as f:
-                    json.dump(session_data, f, indent=2, ensure_ascii=False, default=str)
-                logger.debug(f"Session data saved to {self.session_file} (attempt {attempt + 1})")
-                
-
-                if backup_file and backup_file.exists():
-                    backup_file.unlink()
+                self._atomic_write_json(session_file, session_data)
+                logger.debug(f"Session data saved to {session_file} (attempt {attempt + 1})")
                 return
                 
             except Exception as e:
                 logger.error(f"Error saving session data (attempt {attempt + 1}): {e}")
                 if attempt == 2:
-                    if backup_file and backup_file.exists():
-                        try:
-                            self.session_file.write_text(backup_file.read_text())
-                            logger.warning("Restored session from backup after save failure")
-                        except Exception as restore_e:
-                            logger.error(f"Could not restore backup: {restore_e}")
                     raise e
     
-    def _load_session_data(self) -> Dict[str, Any]:
+    def _load_session_data(self, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Load session data from JSON file with retry mechanism"""
+        session_id, session_file = self._resolve_session(session_id)
         for attempt in range(3):
             try:
-                if self.session_file.exists():
-                    with open(self.session_file, 'r', encoding='utf-8') as f:
+                if session_file.exists():
+                    with open(session_file, 'r', encoding='utf-8') as f:
                         data = json.load(f)
                         if data and 'conversation_history' in data:
                             logger.debug(f"Successfully loaded session data with {len(data['conversation_history'])} interactions")
                             return data
                         else:
-                            logger.warning(f"Session file exists but has invalid structure: {self.session_file}")
-                            return self._create_empty_session()
+                            logger.warning(f"Session file exists but has invalid structure: {session_file}")
+                            return self._create_empty_session(session_id)
                 else:
-                    logger.warning(f"Session file not found: {self.session_file}")
-                    return self._create_empty_session()
+                    logger.warning(f"Session file not found: {session_file}")
+                    return self._create_empty_session(session_id)
             except (json.JSONDecodeError, KeyError) as e:
                 logger.error(f"JSON decode error on attempt {attempt + 1}: {e}")
                 if attempt == 2:
                     logger.error("Failed to load session data after 3 attempts, creating new session")
-                    return self._create_empty_session()
+                    return self._create_empty_session(session_id)
             except Exception as e:
                 logger.error(f"Error loading session data on attempt {attempt + 1}: {e}")
                 if attempt == 2:
-                    return self._create_empty_session()
+                    return self._create_empty_session(session_id)
         
-        return self._create_empty_session()
+        return self._create_empty_session(session_id)
     
-    def _create_empty_session(self) -> Dict[str, Any]:
+    def _create_empty_session(self, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Create empty session structure"""
         return {
-            "session_id": self.current_session_id,
+            "session_id": session_id or self.current_session_id,
             "created_at": datetime.now().isoformat(),
             "last_updated": datetime.now().isoformat(),
             "total_interactions": 0,
@@ -176,11 +226,21 @@ class JSONMemoryManager:
             "current_context": {}
         }
     
-    def add_interaction(self, user_query: str, agent_response: Dict[str, Any]) -> str:
-        """Add a new interaction to memory and return interaction ID"""
-        session_data = self._load_session_data()
+    def add_interaction(self, user_query: str, agent_response: Dict[str, Any], session_id: Optional[str] = None) -> str:
+        """Add a new interaction to memory and return interaction ID
+        
+        With a session_id the interaction goes to that session's own file,
+        so concurrent API sessions never append to each other's history.
+        """
+        with self._file_lock():
+            return self._add_interaction_locked(user_query, agent_response, session_id)
+    
+    def _add_interaction_locked(self, user_query: str, agent_response: Dict[str, Any], session_id: Optional[str] = None) -> str:
+        """Load, append and save the session while holding the cross-process lock"""
+        session_data = self._load_session_data(session_id)
         
-        interaction_id = f"interaction_{len(session_data['conversation_history']) + 1}_{datetime.now().strftime('%H%M%S')}"
+        # Sessions number their interactions independently, so a short suffix keeps response files apart
+        interaction_id = f"interaction_{len(session_data['conversation_history']) + 1}_{datetime.now().strftime('%H%M%S')}_{uuid.uuid4().hex[:6]}"
         
 
         success = agent_response.get('success', False)
@@ -225,22 +285,23 @@ class JSONMemoryManager:
         session_data['current_context']['last_query_type'] = interaction['query_type']
         
 
-        self._save_session_data(session_data)
+        self._save_session_data(session_data, session_id)
         
 
-        self._save_individual_response(interaction_id, user_query, agent_response)
+        self._save_individual_response(interaction_id, user_query, agent_response, session_data['session_id'])
         
         logger.info(f"Interaction {interaction_id} added to memory")
         return interaction_id
     
-    def _save_individual_response(self, interaction_id: str, user_query: str, agent_response: Dict[str, Any]):
+    def _save_individual_response(self, interaction_id: str, user_query: str, agent_response: Dict[str, Any],
+                                  session_id: Optional[str] = None):
         """Save individual response to separate JSON file"""
         try:
             response_file = self.responses_dir / f"{interaction_id}.json"
             response_data = {
                 "interaction_id": interaction_id,
                 "timestamp": datetime.now().isoformat(),
-                "session_id": self.current_session_id,
+                "session_id": session_id or self.current_session_id,
                 "user_query": user_query,
                 "agent_response": agent_response,
                 "metadata": {
@@ -249,17 +310,16 @@ class JSONMemoryManager:
                 }
             }
             
-            with open(response_file, 'w', encoding='utf-8') as f:
-                json.dump(response_data, f, indent=2, ensure_ascii=False, default=str)
+            self._atomic_write_json(response_file, response_data)
             
             logger.debug(f"Individual response saved to {response_file}")
         except Exception as e:
             logger.error(f"Error saving individual response: {e}")
     
-    def get_conversation_context(self, last_n_interactions: int = 3) -> str:
+    def get_conversation_context(self, last_n_interactions: int = 3, session_id: Optional[str] = None) -> str:
         """Get conversation context for the agent with enhanced error handling"""
         try:
-            session_data = self._load_session_data()
+            session_data = self._load_session_data(session_id)
             
             if not session_data or not session_data.get('conversation_history'):
                 logger.info("No conversation history found, returning empty context")
@@ -274,7 +334,7 @@ class JSONMemoryManager:
             recent_interactions = conversation_history[-last_n_interactions:]
             
 
-            context = f"Previous conversation context (Session: {self.current_session_id}):\n"
+            context = f"Previous conversation context (Session: {session_data.get('session_id') or self.current_session_id}):\n"
             
 
             current_context = session_data.get('current_context', {})
@@ -371,13 +431,14 @@ class JSONMemoryManager:
         
         return None
     
-    def get_session_summary(self) -> Dict[str, Any]:
-        """Get summary of current session"""
-        session_data = self._load_session_data()
+    def get_session_summary(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Get summary of the given session, or the current one"""
+        session_id, session_file = self._resolve_session(session_id)
+        session_data = self._load_session_data(session_id)
         
         return {
-            "session_id": self.current_session_id,
-            "session_file": str(self.session_file),
+            "session_id": session_id,
+            "session_file": str(session_file),
             "created_at": session_data.get('created_at'),
             "last_updated": session_data.get('last_updated'),
             "total_interactions": session_data.get('total_interactions', 0),
@@ -439,17 +500,18 @@ class JSONMemoryManager:
     
     def clear_session_memory(self):
         """Clear current session and start new one"""
+        with self._file_lock():
+            if self.session_file.exists():
+                archive_name = f"archived_{self.current_session_id}.json"
+                archive_path = self.sessions_dir / archive_name
+                self.session_file.rename(archive_path)
+                logger.info(f"Session archived to {archive_path}")
+            
 
-        if self.session_file.exists():
-            archive_name = f"archived_{self.current_session_id}.json"
-            archive_path = self.sessions_dir / archive_name
-            self.session_file.rename(archive_path)
-            logger.info(f"Session archived to {archive_path}")
-        
-
-        self.current_session_id = self._generate_session_id()
-        self.session_file = self.sessions_dir / f"{self.current_session_id}.json"
-        self._initialize_session()
+            self.current_session_id = self._generate_session_id()
+            self.session_file = self.sessions_dir / f"{self.current_session_id}.json"
+            self._initialize_session()
+            self._write_session_pointer()
         
         logger.info(f"New session started: {self.current_session_id}")
     
@@ -0,0 +1,520 @@
+"""
+Bounded stores for API chat sessions
+
+Sessions are kept in least-recently-used order. They are evicted when idle
+for longer than the TTL, when the session count exceeds its limit, or when
+the approximate memory footprint exceeds the configured cap. Evicted sessions
+are spilled to disk as JSON and transparently reloaded on the next access;
+spilled files expire after their own idle TTL and are capped by count and
+total size.
+When several worker processes serve the API, SQLiteSessionStore keeps the
+sessions in a shared SQLite database in WAL mode instead.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+def _approximate_size(value: Any) -> int:
+    """Approximate in-memory footprint of a JSON-serializable value in bytes"""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class SessionStore:
+    """LRU + idle-TTL session store with a memory cap and spill-to-disk"""
+
+    def __init__(self, max_sessions: Optional[int] = None, idle_ttl_seconds: Optional[float] = None,
+                 max_memory_bytes: Optional[int] = None, max_messages: Optional[int] = None,
+                 spill_dir: Optional[str] = None, spill_ttl_seconds: Optional[float] = None,
+                 max_spill_files: Optional[int] = None, max_spill_bytes: Optional[int] = None,
+                 spill_sweep_interval: float = 60.0):
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX_COUNT", "1000"))
+        self.idle_ttl_seconds = idle_ttl_seconds or float(os.getenv("SESSION_IDLE_TTL", "3600"))
+        self.max_memory_bytes = max_memory_bytes or int(float(os.getenv("SESSION_MEMORY_MB", "64")) * 1024 * 1024)
+        self.max_messages = max_messages or int(os.getenv("SESSION_MAX_MESSAGES", "50"))
+
+        if spill_dir is None:
+            spill_dir = os.getenv("SESSION_SPILL_DIR", os.path.join("conversation_memory", "spilled_sessions"))
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        if self.spill_dir is not None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.spill_ttl_seconds = spill_ttl_seconds or float(os.getenv("SESSION_SPILL_TTL", str(self.idle_ttl_seconds)))
+        self.max_spill_files = max_spill_files or int(os.getenv("SESSION_SPILL_MAX_FILES", "10000"))
+        self.max_spill_bytes = max_spill_bytes or int(float(os.getenv("SESSION_SPILL_MB", "256")) * 1024 * 1024)
+        self.spill_sweep_interval = spill_sweep_interval
+
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._last_access: Dict[str, float] = {}
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_reloads = 0
+        self.evictions = {"idle": 0, "count": 0, "memory": 0}
+        self.spilled = 0
+        self.spill_expired = 0
+        self.spill_dropped = 0
+        self.truncated_messages = 0
+
+        # Spill file name -> (mtime, bytes), oldest first; counts without listing the directory
+        self._spill_index: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._spill_bytes = 0
+        self._last_spill_sweep = time.monotonic()
+        self._scan_spill_dir()
+
+    def _scan_spill_dir(self):
+        """Index files left by an earlier run once at startup, then expire and cap them"""
+        if self.spill_dir is None:
+            return
+        files = []
+        for path in self.spill_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.name, stat.st_size))
+        for mtime, name, size in sorted(files):
+            self._spill_index[name] = (mtime, size)
+            self._spill_bytes += size
+        self._prune_spilled()
+
+    def _forget_spilled(self, name: str):
+        entry = self._spill_index.pop(name, None)
+        if entry is not None:
+            self._spill_bytes -= entry[1]
+
+    def _prune_spilled(self):
+        """Delete spill files idle past the spill TTL, then the oldest ones over the file and byte caps"""
+        if self.spill_dir is None:
+            return
+        cutoff = time.time() - self.spill_ttl_seconds
+        while self._spill_index:
+            name, (mtime, _) = next(iter(self._spill_index.items()))
+            if mtime < cutoff:
+                self.spill_expired += 1
+            elif len(self._spill_index) > self.max_spill_files or self._spill_bytes > self.max_spill_bytes:
+                self.spill_dropped += 1
+            else:
+                break
+            self._forget_spilled(name)
+            try:
+                (self.spill_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete spilled session file {name}: {e}")
+
+    def _spill_path(self, session_id: str) -> Optional[Path]:
+        if self.spill_dir is None:
+            return None
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', session_id)
+        return self.spill_dir / f"{safe_id}.json"
+
+    def _touch(self, session_id: str):
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+
+    def _insert(self, session_id: str, session: Dict[str, Any]):
+        size = _approximate_size(session)
+        self._sessions[session_id] = session
+        self._sizes[session_id] = size
+        self._memory_bytes += size
+        self._touch(session_id)
+
+    def _remove(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self._sessions.pop(session_id, None)
+        self._memory_bytes -= self._sizes.pop(session_id, 0)
+        self._last_access.pop(session_id, None)
+        return session
+
+    def _spill(self, session_id: str, session: Dict[str, Any]):
+        path = self._spill_path(session_id)
+        if path is None:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(session, f, default=str)
+            self.spilled += 1
+        except Exception as e:
+            logger.warning(f"Could not spill session {session_id} to disk: {e}")
+            return
+        self._forget_spilled(path.name)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            size = 0
+        self._spill_index[path.name] = (time.time(), size)
+        self._spill_bytes += size
+        self._prune_spilled()
+
+    def _load_spilled(self, session_id: str) -> Optional[Dict[str, Any]]:
+        path = self._spill_path(session_id)
+        if path is None or not path.exists():
+            return None
+        entry = self._spill_index.get(path.name)
+        if entry is not None and entry[0] < time.time() - self.spill_ttl_seconds:
+            self._prune_spilled()
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                session = json.load(f)
+            path.unlink()
+            self._forget_spilled(path.name)
+            self.disk_reloads += 1
+            return session
+        except Exception as e:
+            logger.warning(f"Could not reload spilled session {session_id}: {e}")
+            return None
+
+    def _evict(self, session_id: str, reason: str):
+        session = self._remove(session_id)
+        if session is not None:
+            self.evictions[reason] += 1
+            self._spill(session_id, session)
+
+    def _enforce_limits(self, protect: Optional[str] = None):
+        """Evict idle sessions first, then least-recently-used ones over the limits"""
+        now = time.monotonic()
+        if now - self._last_spill_sweep >= self.spill_sweep_interval:
+            self._last_spill_sweep = now
+            self._prune_spilled()
+        for session_id in list(self._sessions.keys()):
+            if now - self._last_access[session_id] <= self.idle_ttl_seconds:
+                break
+            if session_id != protect:
+                self._evict(session_id, "idle")
+
+        while len(self._sessions) > self.max_sessions:
+            oldest = next(iter(self._sessions))
+            if oldest == protect:
+                break
+            self._evict(oldest, "count")
+
+        while self._memory_bytes > self.max_memory_bytes and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions))
+            if oldest == protect:
+                break
+            self._evict(oldest, "memory")
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session, reloading it from disk if it was evicted"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self.hits += 1
+                self._touch(session_id)
+                return session
+
+            self.misses += 1
+            session = self._load_spilled(session_id)
+            if session is not None:
+                self._insert(session_id, session)
+                self._enforce_limits(protect=session_id)
+            return session
+
+    def get_or_create(self, session_id: str) -> Dict[str, Any]:
+        """Get a session, creating an empty one if it does not exist"""
+        with self._lock:
+            session = self.get(session_id)
+            if session is None:
+                session = {
+                    "created_at": datetime.now().isoformat(),
+                    "messages": []
+                }
+                self._insert(session_id, session)
+                self._enforce_limits(protect=session_id)
+            return session
+
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a message to a session, truncating the oldest messages over the limit"""
+        with self._lock:
+            session = self.get_or_create(session_id)
+            messages = session["messages"]
+            messages.append(message)
+            added = _approximate_size(message)
+
+            if len(messages) > self.max_messages:
+                overflow = len(messages) - self.max_messages
+                added -= sum(_approximate_size(m) for m in messages[:overflow])
+                del messages[:overflow]
+                self.truncated_messages += overflow
+
+            self._sizes[session_id] = self._sizes.get(session_id, 0) + added
+            self._memory_bytes += added
+            self._enforce_limits(protect=session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session from memory and disk"""
+        with self._lock:
+            removed = self._remove(session_id) is not None
+            path = self._spill_path(session_id)
+            if path is not None and path.exists():
+                try:
+                    path.unlink()
+                    self._forget_spilled(path.name)
+                    removed = True
+                except OSError as e:
+                    logger.warning(f"Could not delete spilled session {session_id}: {e}")
+            return removed
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id in self._sessions:
+                return True
+            path = self._spill_path(session_id)
+            return bool(path is not None and path.exists())
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def keys(self) -> List[str]:
+        """IDs of the sessions currently held in memory"""
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get size, eviction and hit-rate statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "size": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "max_messages_per_session": self.max_messages,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": dict(self.evictions),
+                "total_evictions": sum(self.evictions.values()),
+                "spilled_sessions_on_disk": len(self._spill_index),
+                "spilled_bytes_on_disk": self._spill_bytes,
+                "spill_ttl_seconds": self.spill_ttl_seconds,
+                "spill_expired": self.spill_expired,
+                "spill_dropped": self.spill_dropped,
+                "disk_reloads": self.disk_reloads,
+                "truncated_messages": self.truncated_messages
+            }
+
+
+class SQLiteSessionStore:
+    """Process-shared session store on SQLite in WAL mode, for multi-worker serving
+
+    Offers the same interface as SessionStore. Idle-TTL eviction, a session
+    count limit and per-session message truncation are enforced in SQL, so
+    every worker process sees and maintains the same sessions.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_sessions: Optional[int] = None,
+                 idle_ttl_seconds: Optional[float] = None, max_messages: Optional[int] = None,
+                 sweep_interval: float = 60.0):
+        self.db_path = Path(db_path or os.getenv("SESSION_DB_PATH", os.path.join("conversation_memory", "api_sessions.sqlite")))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX_COUNT", "1000"))
+        self.idle_ttl_seconds = idle_ttl_seconds or float(os.getenv("SESSION_IDLE_TTL", "3600"))
+        self.max_messages = max_messages or int(os.getenv("SESSION_MAX_MESSAGES", "50"))
+        self.sweep_interval = sweep_interval
+
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_pid = None
+        self._last_sweep = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"idle": 0, "count": 0}
+        self.truncated_messages = 0
+
+        self._init_schema()
+
+    def _connection(self):
+        """Per-process connection; a forked child never reuses its parent's handle"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA busy_timeout = 30000")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _init_schema(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS session_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    message TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_session_messages_session ON session_messages(session_id, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions(last_access)')
+
+    def _load(self, conn, session_id: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute('SELECT created_at FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        messages = conn.execute('''
+            SELECT message FROM session_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?
+        ''', (session_id, self.max_messages)).fetchall()
+        return {
+            "created_at": row[0],
+            "messages": [json.loads(m[0]) for m in reversed(messages)]
+        }
+
+    def _sweep(self, conn, protect: Optional[str] = None):
+        """Evict idle sessions and enforce the session count limit"""
+        now = time.time()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+
+        cutoff = now - self.idle_ttl_seconds
+        expired = [r[0] for r in conn.execute(
+            'SELECT session_id FROM sessions WHERE last_access < ? AND session_id != ?', (cutoff, protect or '')
+        ).fetchall()]
+
+        overflow = conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] - len(expired) - self.max_sessions
+        over_limit = []
+        if overflow > 0:
+            over_limit = [r[0] for r in conn.execute('''
+                SELECT session_id FROM sessions WHERE last_access >= ? AND session_id != ?
+                ORDER BY last_access ASC LIMIT ?
+            ''', (cutoff, protect or '', overflow)).fetchall()]
+
+        for session_id in expired + over_limit:
+            conn.execute('DELETE FROM session_messages WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+        self.evictions["idle"] += len(expired)
+        self.evictions["count"] += len(over_limit)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session shared by all worker processes"""
+        with self._lock:
+            conn = self._connection()
+            session = self._load(conn, session_id)
+            if session is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            conn.execute('UPDATE sessions SET last_access = ? WHERE session_id = ?', (time.time(), session_id))
+            return session
+
+    def get_or_create(self, session_id: str) -> Dict[str, Any]:
+        """Get a session, creating an empty one if it does not exist"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('''
+                INSERT OR IGNORE INTO sessions (session_id, created_at, last_access) VALUES (?, ?, ?)
+            ''', (session_id, datetime.now().isoformat(), time.time()))
+            return self.get(session_id)
+
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a message in one transaction, truncating the oldest messages over the limit"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                conn.execute('''
+                    INSERT INTO sessions (session_id, created_at, last_access) VALUES (?, ?, ?)
+                    ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access
+                ''', (session_id, datetime.now().isoformat(), now))
+                conn.execute('INSERT INTO session_messages (session_id, message) VALUES (?, ?)',
+                             (session_id, json.dumps(message, default=str)))
+                cursor = conn.execute('''
+                    DELETE FROM session_messages WHERE session_id = ? AND id NOT IN (
+                        SELECT id FROM session_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?
+                    )
+                ''', (session_id, session_id, self.max_messages))
+                self.truncated_messages += max(cursor.rowcount, 0)
+                self._sweep(conn, protect=session_id)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            self.hits += 1
+            return self._load(conn, session_id)
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session for every worker"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM session_messages WHERE session_id = ?', (session_id,))
+            return conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,)).rowcount > 0
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._connection().execute(
+                'SELECT 1 FROM sessions WHERE session_id = ?', (session_id,)
+            ).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def keys(self) -> List[str]:
+        """IDs of all live sessions, most recently used last"""
+        with self._lock:
+            return [r[0] for r in self._connection().execute(
+                'SELECT session_id FROM sessions ORDER BY last_access ASC'
+            ).fetchall()]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get size, eviction and hit-rate statistics (counters are per worker process)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "sqlite",
+                "db_path": str(self.db_path),
+                "worker_pid": os.getpid(),
+                "size": len(self),
+                "max_sessions": self.max_sessions,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "max_messages_per_session": self.max_messages,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": dict(self.evictions),
+                "total_evictions": sum(self.evictions.values()),
+                "truncated_messages": self.truncated_messages
+            }
+
+
+def create_session_store():
+    """Create the session store selected by SESSION_STORE_BACKEND (memory or sqlite)"""
+    backend = os.getenv("SESSION_STORE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    return SessionStore()
@@ -3,6 +3,8 @@ from typing import List, Dict, Any, Optional, Union
 from datetime import datetime
 import json
 
+from src.database.result_set import ResultSet
+
 class QueryResult(BaseModel):
     data: Dict[str, Any] = Field(..., description="Individual record data")
     
@@ -17,8 +19,19 @@ class QueryResult(BaseModel):
 
 class TableData(BaseModel):
     headers: List[str] = Field(default_factory=list, description="Table column headers")
-    data: List[Dict[str, Any]] = Field(default_factory=list, description="Table data as JSON objects")
+    data: Union[ResultSet, List[Dict[str, Any]]] = Field(default_factory=list, description="Table data as JSON objects; a ResultSet is kept as-is and serialized as row dicts")
     row_count: int = Field(0, description="Number of rows in the table")
+    truncated: bool = Field(False, description="True when the query had more rows than the row cap and only the first ones are shown")
+    
+    @classmethod
+    def from_rows(cls, rows: Any) -> Optional["TableData"]:
+        """Table over a ResultSet (shared, not copied) or a list of row dicts; None when the rows are not tabular"""
+        if isinstance(rows, ResultSet):
+            return cls(headers=rows.columns, data=rows, row_count=len(rows), truncated=rows.truncated)
+        if rows and isinstance(rows, list) and isinstance(rows[0], dict):
+            return cls(headers=list(rows[0].keys()), data=rows, row_count=len(rows),
+                       truncated=getattr(rows, "truncated", False))
+        return None
     
 class DatabaseResponse(BaseModel):
     success: bool = Field(..., description="Whether the query was successful")
@@ -65,3 +78,8 @@ class ReActResponse(BaseModel):
         json_encoders = {
             datetime: lambda v: v.isoformat()
         }
+
+class FinalAnswer(BaseModel):
+    message: str = Field(..., description="One or two sentences introducing the answer; never repeat table rows")
+    sql: Optional[str] = Field(None, description="The SQL query whose results answer the question, if any")
+    result_ref: str = Field("last", description="'last' to show the rows of the last sql_db_query call, 'none' to show no table")
@@ -6,6 +6,8 @@ from langchain_core.messages import SystemMessage, HumanMessage
 import structlog
 from dotenv import load_dotenv
 
+from src.cache.llm_cache import get_llm_cache
+
 load_dotenv()
 
 logger = structlog.get_logger(__name__)
@@ -20,7 +22,8 @@ class AzureIntelligentQueryGenerator:
             api_version=os.getenv('AZURE_OPENAI_API_VERSION'),
             deployment_name=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME'),
             model=os.getenv('AZURE_OPENAI_MODEL_NAME'),
-            temperature=0
+            temperature=0,
+            cache=get_llm_cache("query_generator")
         )
         self._schema_description = None
     
@@ -0,0 +1,281 @@
+"""
+Per-question schema retrieval for the ReAct system prompt
+
+Embedding all of description.json in the system prompt costs thousands of
+tokens on every LLM call of every ReAct step. The retriever scores each
+table against the question with a small lexical index (table and column
+names, domain hints and the distinctive words of the descriptions), adds
+the tables needed to join the matches back to patients, and renders only
+those tables, the descriptions of the columns the question mentions and the
+relationships between them. Other tables are still listed by name so the
+agent can fetch them with sql_db_schema when the retrieval misses, or with
+their bare column names when the agent runs without discovery tools.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Set
+
+from src.utils.metrics import LatencyTracker
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+_STOP_WORDS = frozenset("""
+a an the of in on for to by at from with and or is are was were be been has have had do does did
+what which who whom how many much show list find get give me all any their there this that these
+those each per patient patients id ids unique code codes description date dates name names
+""".split())
+
+# Everyday words for each table that its column names and descriptions do not contain
+_TABLE_HINTS = {
+    "patients": "person people born birth age old young name gender male female women men race address city state county zip alive dead died death income married marital",
+    "encounters": "visit visits encounter admission admitted hospitalization emergency inpatient outpatient ambulatory wellness appointment claim cost",
+    "conditions": "condition conditions diagnosis diagnosed disease illness disorder diabetes diabetic hypertension asthma cancer suffering chronic",
+    "medications": "medication medications medicine drug drugs prescription prescribed dose pill dispenses",
+    "procedures": "procedure procedures surgery operation performed treatment",
+    "observations": "observation observations lab labs test result value vital vitals bmi weight height blood pressure glucose cholesterol measurement",
+    "allergies": "allergy allergies allergic reaction",
+    "immunizations": "immunization immunizations vaccine vaccines vaccination vaccinated shot flu",
+    "careplans": "careplan careplans care plan plans",
+    "devices": "device devices implant equipment",
+    "imaging_studies": "imaging image scan xray x ray mri ct ultrasound radiology modality",
+    "providers": "provider providers doctor doctors physician clinician practitioner speciality specialty",
+    "organizations": "organization organizations hospital hospitals clinic facility facilities",
+    "payers": "payer payers insurance insurer insured coverage covered medicare medicaid",
+    "payer_transitions": "transition transitions switched changed insurance history ownership",
+}
+
+MAX_TABLES = int(os.getenv("SCHEMA_SUBSET_MAX_TABLES", "4"))
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower().replace("_", " "))
+
+
+def _stem(word: str) -> str:
+    """Crude stem so "medication"/"medications" and "diagnosed"/"diagnosis" agree"""
+    return word[:6] if len(word) > 6 else word.rstrip("s") or word
+
+
+def _terms(text: str) -> Set[str]:
+    return {_stem(word) for word in _words(text) if word not in _STOP_WORDS and len(word) > 1}
+
+
+class TokenCounter:
+    """tiktoken token counts with a characters/4 estimate when no encoding is available"""
+
+    def __init__(self, encoding_name: Optional[str] = None):
+        self.encoding_name = encoding_name or os.getenv("PROMPT_TOKEN_ENCODING", "cl100k_base")
+        self._encoding = None
+        self.exact = False
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+                self.exact = True
+            except Exception as e:
+                logger.warning(f"tiktoken encoding {self.encoding_name} unavailable, estimating tokens: {e}")
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return (len(text) + 3) // 4
+
+
+class SchemaRetriever:
+    """Selects the tables, columns and relationships of description.json relevant to a question"""
+
+    def __init__(self, description: str, max_tables: Optional[int] = None, cache_size: int = 256,
+                 token_counter: Optional[TokenCounter] = None, list_other_columns: bool = False):
+        self.max_tables = max_tables or MAX_TABLES
+        self.list_other_columns = list_other_columns
+        self.full_description = description
+        self.token_counter = token_counter or TokenCounter()
+        self.available = False
+
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        self._relationships: List[Dict[str, str]] = []
+        self._graph: Dict[str, Set[str]] = {}
+        self._table_terms: Dict[str, Dict[str, int]] = {}
+        self._column_terms: Dict[str, List[tuple]] = {}
+
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+        self.retrievals = 0
+        self.cache_hits = 0
+        self.fallbacks = 0
+        self.tables_selected = 0
+        self.subset_tokens = 0
+        self.retrieval_time = LatencyTracker()
+
+        self._index(description)
+        self.full_tokens = self.token_counter.count(description) if description else 0
+
+    def _index(self, description: str):
+        try:
+            schema = json.loads(description) if description else None
+        except json.JSONDecodeError as e:
+            logger.warning(f"description.json is not valid JSON, schema subsetting disabled: {e}")
+            return
+        if not schema or not schema.get("tables"):
+            return
+
+        self._tables = {table["name"]: table for table in schema["tables"]}
+        self._relationships = schema.get("relationships", [])
+        self._graph = {name: set() for name in self._tables}
+        for relationship in self._relationships:
+            source, target = relationship.get("from_table"), relationship.get("to_table")
+            if source in self._graph and target in self._graph:
+                self._graph[source].add(target)
+                self._graph[target].add(source)
+
+        # Words found in many table descriptions ("record", "patient") do not discriminate
+        description_terms = {name: _terms(table.get("description", "") + " " + " ".join(
+            column.get("description", "") for column in table.get("columns", [])))
+            for name, table in self._tables.items()}
+        document_frequency: Dict[str, int] = {}
+        for terms in description_terms.values():
+            for term in terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        common = {term for term, count in document_frequency.items() if count > max(2, len(self._tables) * 0.3)}
+
+        for name, table in self._tables.items():
+            weights: Dict[str, int] = {}
+            for term in description_terms[name] - common:
+                weights[term] = 1
+            for column in table.get("columns", []):
+                for term in _terms(column["name"]) - common:
+                    weights[term] = max(weights.get(term, 0), 2)
+            for term in _terms(name + " " + _TABLE_HINTS.get(name, "")):
+                weights[term] = 3
+            self._table_terms[name] = weights
+            self._column_terms[name] = [(column, _terms(column["name"] + " " + column.get("description", "")) - common)
+                                        for column in table.get("columns", [])]
+        self.available = True
+        logger.info(f"Schema retriever indexed {len(self._tables)} tables and {len(self._relationships)} relationships")
+
+    def _select_tables(self, question_terms: Set[str]) -> List[str]:
+        scores = {name: sum(weights.get(term, 0) for term in question_terms)
+                  for name, weights in self._table_terms.items()}
+        ranked = [name for name, score in sorted(scores.items(), key=lambda item: -item[1]) if score >= 2]
+        selected = ranked[:self.max_tables]
+        if "patients" in self._tables and "patients" not in selected:
+            selected.insert(0, "patients")
+        return self._connect(selected)
+
+    def _connect(self, selected: List[str]) -> List[str]:
+        """Add the tables on the shortest join path from each selected table to the first one"""
+        if not selected:
+            return selected
+        connected = list(selected)
+        root = selected[0]
+        for target in selected[1:]:
+            previous = {root: None}
+            queue = deque([root])
+            while queue and target not in previous:
+                current = queue.popleft()
+                for neighbour in self._graph.get(current, ()):
+                    if neighbour not in previous:
+                        previous[neighbour] = current
+                        queue.append(neighbour)
+            step = previous.get(target)
+            while step is not None and step != root:
+                if step not in connected:
+                    connected.append(step)
+                step = previous[step]
+        return connected
+
+    def _render(self, tables: List[str], question_terms: Set[str]) -> str:
+        lines = ["Tables relevant to this question (PostgreSQL, quote upper-case columns):"]
+        for name in tables:
+            table = self._tables[name]
+            columns = ", ".join(f"\"{column['name']}\" {column.get('type', '')}".rstrip()
+                                for column in table.get("columns", []))
+            lines.append(f"- {name}: {table.get('description', '').strip()}")
+            lines.append(f"  columns: {columns}")
+            for column, terms in self._column_terms[name]:
+                if terms & question_terms and column.get("description"):
+                    lines.append(f"  \"{column['name']}\": {column['description']}")
+
+        chosen = set(tables)
+        joins = [f"{relationship['from_table']}.\"{relationship['from_column']}\" = "
+                 f"{relationship['to_table']}.\"{relationship['to_column']}\""
+                 for relationship in self._relationships
+                 if relationship.get("from_table") in chosen and relationship.get("to_table") in chosen]
+        if joins:
+            lines.append("Joins: " + "; ".join(joins))
+
+        others = [name for name in self._tables if name not in chosen]
+        if others and self.list_other_columns:
+            lines.append("Other tables:")
+            lines.extend(f"- {name}(" + ", ".join(column["name"] for column in self._tables[name].get("columns", [])) + ")"
+                         for name in others)
+        elif others:
+            lines.append("Other tables (use sql_db_schema if needed): " + ", ".join(others))
+        return "\n".join(lines)
+
+    def retrieve(self, question: str) -> str:
+        """Compact schema context for a question, or the full description when the schema is not indexed"""
+        if not self.available:
+            self.fallbacks += 1
+            return self.full_description
+
+        start = time.perf_counter()
+        with self._lock:
+            self.retrievals += 1
+            cached = self._cache.get(question)
+            if cached is not None:
+                self._cache.move_to_end(question)
+                self.cache_hits += 1
+                return cached
+
+        question_terms = _terms(question)
+        tables = self._select_tables(question_terms)
+        context = self._render(tables, question_terms)
+        tokens = self.token_counter.count(context)
+
+        with self._lock:
+            self._cache[question] = context
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            self.tables_selected += len(tables)
+            self.subset_tokens += tokens
+        self.retrieval_time.record(time.perf_counter() - start)
+        return context
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get retrieval counts and schema token savings against the full description"""
+        computed = self.retrievals - self.cache_hits
+        mean_tokens = round(self.subset_tokens / computed, 1) if computed else None
+        return {
+            "available": self.available,
+            "tables_indexed": len(self._tables),
+            "retrievals": self.retrievals,
+            "cache_hits": self.cache_hits,
+            "fallbacks": self.fallbacks,
+            "mean_tables_selected": round(self.tables_selected / computed, 2) if computed else None,
+            "full_schema_tokens": self.full_tokens,
+            "mean_subset_tokens": mean_tokens,
+            "token_reduction": round(1 - mean_tokens / self.full_tokens, 4) if mean_tokens and self.full_tokens else None,
+            "tokens_exact": self.token_counter.exact,
+            "retrieval_seconds": self.retrieval_time.summary()
+        }
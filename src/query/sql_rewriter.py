@@ -0,0 +1,158 @@
+"""
+Identifier-aware SQL column rewriter
+
+The LLM tends to write ``first_name`` or ``patient_id`` where the Synthea
+schema has upper-case, quoted columns such as ``"FIRST"`` and
+``"PATIENT_ID"``. This rewriter tokenizes the SQL in a single pass with one
+compiled pattern, leaves string literals, comments and dollar-quoted bodies
+alone, and replaces only identifiers in column position with the exact
+column names from the schema, for every table in ``schema_cache``.
+"""
+
+import re
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from src.utils.metrics import LatencyTracker
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<string>[Ee]'(?:[^'\\]|\\.|'')*'?|[BbXxNn]?'(?:[^']|'')*'?)
+  | (?P<dollar>\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?(?:\$(?P=tag)\$|\Z))
+  | (?P<line_comment>--[^\n]*)
+  | (?P<block_comment>/\*.*?(?:\*/|\Z))
+  | (?P<quoted>"(?:[^"]|"")*"?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<space>\s+)
+  | (?P<cast>::)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+# A word directly after one of these is a table name, alias or type, never a column
+_NON_COLUMN_PREDECESSORS = frozenset({"from", "join", "into", "update", "table", "as", "nulls", "fetch", "::"})
+
+# ``FETCH FIRST|NEXT n ROW|ROWS ONLY``: the word after FIRST/NEXT is a keyword too
+_FETCH_DIRECTIONS = frozenset({"first", "next"})
+
+
+def _unquote(identifier: str) -> str:
+    return identifier.strip('"').replace('""', '"')
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class SQLColumnRewriter:
+    """Single-pass tokenizer that maps column spellings onto the schema's exact column names"""
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None):
+        # Alias spellings (``first_name`` → ``FIRST``) that are not real column names
+        self._aliases = {name.lower(): _unquote(actual) for name, actual in (aliases or {}).items()}
+        self._columns: Dict[str, str] = {}
+        self._mapping: Dict[str, str] = dict(self._aliases)
+        self._schema_identity: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.tables_indexed = 0
+        self.rewrites = 0
+        self.identifiers_rewritten = 0
+        self.rewrite_time = LatencyTracker()
+
+    def load_schema(self, schema_cache: Optional[Dict[str, Any]]):
+        """Index every column of every table in ``DatabaseConnection.schema_cache``; cheap when unchanged"""
+        if not schema_cache or id(schema_cache) == self._schema_identity:
+            return
+
+        columns: Dict[str, str] = {}
+        tables = schema_cache.get("tables", {})
+        for table_info in tables.values():
+            for column in table_info.get("columns", []):
+                name = column.get("name")
+                if not name or name == name.lower():
+                    # Lower-case columns resolve without quoting
+                    continue
+                existing = columns.setdefault(name.lower(), name)
+                if existing != name:
+                    logger.warning(f"Ambiguous column spelling {name!r} vs {existing!r} - keeping {existing!r}")
+
+        with self._lock:
+            self._columns = columns
+            self._mapping = {**columns, **self._aliases}
+            self._schema_identity = id(schema_cache)
+            self.tables_indexed = len(tables)
+        logger.info(f"SQL rewriter indexed {len(columns)} columns across {len(tables)} tables")
+
+    def rewrite(self, sql_query: str) -> str:
+        """Rewrite column identifiers to their exact schema spelling, skipping literals and comments"""
+        start = time.perf_counter()
+        mapping = self._mapping
+        tokens = [(match.lastgroup, match.group()) for match in _TOKEN_PATTERN.finditer(sql_query)]
+
+        output: List[str] = []
+        rewritten = 0
+        previous = None  # last significant token, lower-cased
+        earlier = None  # the significant token before that
+        for position, (kind, value) in enumerate(tokens):
+            in_fetch = earlier == "fetch" and previous in _FETCH_DIRECTIONS
+            if kind not in ("space", "line_comment", "block_comment"):
+                earlier = previous
+            if kind == "word":
+                actual = mapping.get(value.lower())
+                if actual is not None and previous not in _NON_COLUMN_PREDECESSORS and not in_fetch \
+                        and not self._is_call_or_typed_literal(tokens, position):
+                    output.append(_quote(actual))
+                    rewritten += 1
+                else:
+                    output.append(value)
+                previous = value.lower()
+            elif kind == "quoted":
+                # A quoted identifier in the wrong case ("patient_id") is fixed up too
+                content = _unquote(value)
+                actual = mapping.get(content.lower())
+                if actual is not None and actual != content and previous not in _NON_COLUMN_PREDECESSORS and not in_fetch:
+                    output.append(_quote(actual))
+                    rewritten += 1
+                else:
+                    output.append(value)
+                previous = '"'
+            elif kind in ("space", "line_comment", "block_comment"):
+                output.append(value)
+            else:
+                output.append(value)
+                previous = value.lower() if kind == "cast" else (value if kind == "other" else kind)
+
+        self.rewrites += 1
+        self.identifiers_rewritten += rewritten
+        self.rewrite_time.record(time.perf_counter() - start)
+        return "".join(output)
+
+    @staticmethod
+    def _is_call_or_typed_literal(tokens: List[tuple], position: int) -> bool:
+        """True for ``date(...)``-style calls and ``DATE '2020-01-01'``-style typed literals"""
+        for following in range(position + 1, len(tokens)):
+            kind, value = tokens[following]
+            if kind in ("space", "line_comment", "block_comment"):
+                continue
+            return value == "(" or kind == "string"
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size and rewrite counts/latency"""
+        return {
+            "tables_indexed": self.tables_indexed,
+            "columns_indexed": len(self._columns),
+            "aliases": len(self._aliases),
+            "rewrites": self.rewrites,
+            "identifiers_rewritten": self.identifiers_rewritten,
+            "rewrite_seconds": self.rewrite_time.summary()
+        }
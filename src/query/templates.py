@@ -0,0 +1,384 @@
+"""
+Intent templates for common healthcare questions
+
+Recognizes the handful of question shapes that make up most traffic against
+the Synthea-style schema, extracts their slots locally and emits
+parameterized SQL, so these questions are answered with one database round
+trip and no LLM call. Anything that does not match cleanly falls through to
+the ReAct agent.
+"""
+
+import calendar
+import re
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.utils.metrics import LatencyTracker
+
+
+# Adjectives users put in front of "patients" mapped to the noun stored in descriptions
+_ADJECTIVE_TERMS = {
+    "diabetic": "diabetes",
+    "prediabetic": "prediabetes",
+    "hypertensive": "hypertension",
+    "asthmatic": "asthma",
+    "obese": "obesity",
+    "anemic": "anemia",
+    "epileptic": "epilepsy",
+    "arthritic": "arthritis",
+    "depressed": "depression",
+}
+
+_MONTHS = {name.lower(): index for index, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): index for index, name in enumerate(calendar.month_abbr) if name})
+
+_ENCOUNTER_CLASSES = {
+    "emergency": "emergency",
+    "er": "emergency",
+    "inpatient": "inpatient",
+    "outpatient": "outpatient",
+    "ambulatory": "ambulatory",
+    "wellness": "wellness",
+    "urgent care": "urgentcare",
+    "urgentcare": "urgentcare",
+}
+
+# Words that can never be a patient's first or last name in a template match
+_NOT_NAMES = frozenset("""
+he she they them him her his their this that these those the a an patient patients person
+people someone everyone all each every my our your it its who whom
+""".split())
+
+# A concept slot containing any of these is really a compound question for the agent
+_COMPOUND_TERM = re.compile(
+    r"\b(and|or|but|not|without|are|is|were|was|who|that|which|in|from|by|per|during|between|since|"
+    r"female|male|women|men|living|alive|dead|died|deceased|state|city|county|age|aged|born|"
+    r"older|younger|over|under|above|below|more|less|than|last|this|year|years|month|months)\b"
+)
+
+# Negations and the other tables' entities: "have no allergies", "have encounters", "are on medicaid"
+# are not description matches and go to the agent
+_NON_CONCEPT_TERM = re.compile(
+    r"\b(no|none|never|nothing|any|been|seen|"
+    r"allerg(?:y|ies)|encounters?|visits?|appointments?|admissions?|immuni[sz]ations?|vaccines?|vaccinations?|"
+    r"observations?|insurance|insured|payers?|coverage|medicaid|medicare|procedures?|surgery|surgeries|"
+    r"operations?|care ?plans?|devices?|imaging|stud(?:y|ies)|providers?|doctors?|organizations?|hospitals?|"
+    r"records?|conditions?|diagnos[ie]s|medications?|prescriptions?)\b"
+)
+
+_MEDICATION_VERBS = r"(?:taking|prescribed|using|receiving)"
+_PROCEDURE_VERBS = r"(?:underwent|undergone|received|had)"
+_CONDITION_VERBS = r"(?:have|has|with|diagnosed with|suffering from|had)"
+
+_CONCEPT_TABLES = {
+    "condition": ("conditions", '"CONDITION_DESCRIPTION"'),
+    "medication": ("medications", '"MEDICATION_DESCRIPTION"'),
+    "procedure": ("procedures", '"PROCEDURE_DESCRIPTION"'),
+}
+
+
+class TemplateMatch:
+    """A recognized intent with its SQL, bound parameters and response wording"""
+
+    __slots__ = ("name", "sql", "params", "slots", "summarize")
+
+    def __init__(self, name: str, sql: str, params: Dict[str, Any], slots: Dict[str, Any],
+                 summarize: Callable[[List[Dict[str, Any]]], str]):
+        self.name = name
+        self.sql = sql
+        self.params = params
+        self.slots = slots
+        self.summarize = summarize
+
+
+def _clean_term(term: str) -> str:
+    term = re.sub(r"[?.!]+$", "", term.strip())
+    term = re.sub(r"^(?:a|an|the)\s+", "", term, flags=re.IGNORECASE)
+    return term.strip()
+
+
+def _like(term: str) -> str:
+    """ILIKE pattern for a free-text description slot with wildcards escaped"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _name_pattern(name_part: str) -> str:
+    # Synthea appends digits to names ("John123"), so match on the prefix
+    return name_part.replace("%", "").replace("_", "") + "%"
+
+
+def _first_value(rows: List[Dict[str, Any]]) -> Any:
+    if not rows:
+        return 0
+    return next(iter(rows[0].values()))
+
+
+def _parse_date(text: str, end: bool = False) -> Optional[date]:
+    """Parse an ISO date, "Month YYYY" or a bare year; ``end`` picks the last day of a month or year"""
+    text = text.strip().lower().rstrip("?.")
+    match = re.fullmatch(r"(\d{4})-(\d{1,2})-(\d{1,2})", text)
+    if match:
+        try:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return None
+    match = re.fullmatch(r"([a-z]+)\.?\s+(\d{4})", text)
+    if match and match.group(1) in _MONTHS:
+        year, month = int(match.group(2)), _MONTHS[match.group(1)]
+        day = calendar.monthrange(year, month)[1] if end else 1
+        return date(year, month, day)
+    match = re.fullmatch(r"(\d{4})", text)
+    if match:
+        year = int(match.group(1))
+        return date(year, 12, 31) if end else date(year, 1, 1)
+    return None
+
+
+def _date_range(text: str) -> Optional[Tuple[date, date]]:
+    """Resolve "in 2020", "in March 2020", "between X and Y", "from X to Y" or "since X" to [start, end]"""
+    text = text.strip().lower().rstrip("?.")
+    match = re.fullmatch(r"(?:between|from)\s+(.+?)\s+(?:and|to|until|through)\s+(.+)", text)
+    if match:
+        start, end = _parse_date(match.group(1)), _parse_date(match.group(2), end=True)
+        return (start, end) if start and end and start <= end else None
+    match = re.fullmatch(r"since\s+(.+)", text)
+    if match:
+        start = _parse_date(match.group(1))
+        return (start, date.today()) if start else None
+    match = re.fullmatch(r"(?:in|during)\s+(.+)", text)
+    if match:
+        start, end = _parse_date(match.group(1)), _parse_date(match.group(1), end=True)
+        return (start, end) if start and end else None
+    return None
+
+
+class QueryTemplateEngine:
+    """Matches questions to SQL templates and keeps coverage statistics"""
+
+    def __init__(self, row_limit: int = 100):
+        self.row_limit = row_limit
+        self._matchers = [
+            self._match_count_by_concept,
+            self._match_patient_concepts,
+            self._match_cost_by_payer,
+            self._match_encounters_in_range,
+        ]
+
+        self._lock = threading.Lock()
+        self.questions_seen = 0
+        self.matched: Dict[str, int] = {}
+        self.failed_executions = 0
+        self.template_latency = LatencyTracker()
+
+    def match(self, question: str) -> Optional[TemplateMatch]:
+        """Return the first template that fully matches the question, or None"""
+        with self._lock:
+            self.questions_seen += 1
+        text = " ".join(question.strip().split())
+        for matcher in self._matchers:
+            template = matcher(text)
+            if template is not None:
+                with self._lock:
+                    self.matched[template.name] = self.matched.get(template.name, 0) + 1
+                return template
+        return None
+
+    def record_execution(self, seconds: float, success: bool):
+        """Record how long a matched template took end to end"""
+        if success:
+            self.template_latency.record(seconds)
+        else:
+            with self._lock:
+                self.failed_executions += 1
+
+    # -- intents -----------------------------------------------------------
+
+    def _match_count_by_concept(self, text: str) -> Optional[TemplateMatch]:
+        """Patient counts: 'how many patients have diabetes', 'count patients taking metformin'"""
+        lower = text.lower()
+        prefix = r"^(?:how many|count(?: of)?|number of|total number of)\s+(?:patients|people|persons)"
+
+        if re.match(r"^(?:how many|count(?: all)?|count of|number of|total number of)\s+(?:patients|people)"
+                    r"(?:\s+(?:are there|are in the database|do we have|in total|in the database))?\s*\??$", lower):
+            return TemplateMatch(
+                "count_patients", 'SELECT COUNT(*) AS patient_count FROM patients', {}, {},
+                lambda rows: f"There are {_first_value(rows)} patients in the database."
+            )
+
+        match = re.match(r"^(?:how many|count(?: of)?|number of|total number of)\s+([a-z]+)\s+(?:patients|people)\s*\??$", lower)
+        if match and match.group(1) in _ADJECTIVE_TERMS:
+            return self._count_template("condition", _ADJECTIVE_TERMS[match.group(1)])
+
+        patterns = (
+            ("medication", rf"{prefix}\s+(?:are\s+|who\s+are\s+|that\s+are\s+)?{_MEDICATION_VERBS}\s+(.+)$"),
+            ("procedure", rf"{prefix}\s+(?:who\s+|that\s+)?{_PROCEDURE_VERBS}\s+(?:a\s+|an\s+|the\s+)?(?:procedure\s+)?(.+?)\s+(?:procedure|procedures|surgery)\s*\??$"),
+            ("procedure", rf"{prefix}\s+(?:who\s+|that\s+)?(?:underwent|undergone)\s+(.+)$"),
+            ("condition", rf"{prefix}\s+(?:who\s+|that\s+)?(?:do\s+|does\s+)?{_CONDITION_VERBS}\s+(.+)$"),
+        )
+        for concept, pattern in patterns:
+            match = re.match(pattern, lower)
+            if match:
+                term = _clean_term(match.group(1))
+                if (term and len(term.split()) <= 6 and re.fullmatch(r"[a-z0-9' -]+", term)
+                        and not _COMPOUND_TERM.search(term) and not _NON_CONCEPT_TERM.search(term)):
+                    return self._count_template(concept, term)
+                return None
+        return None
+
+    def _count_template(self, concept: str, term: str) -> TemplateMatch:
+        table, column = _CONCEPT_TABLES[concept]
+        sql = (
+            f'SELECT COUNT(DISTINCT "PATIENT_ID") AS patient_count FROM {table} '
+            f"WHERE {column} ILIKE :term"
+        )
+
+        def summarize(rows: List[Dict[str, Any]]) -> str:
+            return f"{_first_value(rows)} patients have a {concept} record matching '{term}'."
+
+        return TemplateMatch(f"count_by_{concept}", sql, {"term": _like(term)},
+                             {"concept": concept, "term": term}, summarize)
+
+    def _match_patient_concepts(self, text: str) -> Optional[TemplateMatch]:
+        """A named patient's records: 'what conditions does John Smith have', 'medications for Jane Doe'"""
+        patterns = (
+            r"^(?:what|which)\s+(conditions|diagnoses|medications|medicines|drugs|procedures)\s+(?:does|did|has|have)\s+(?:patient\s+)?(\w+)\s+(\w+)\s+(?:have|had|take|taken|taking|undergo|undergone|got)\s*\??$",
+            r"^(?:list|show|show me|get|give me|display)?\s*(?:all\s+)?(?:the\s+)?(conditions|diagnoses|medications|medicines|drugs|procedures)\s+(?:for|of)\s+(?:patient\s+)?(\w+)\s+(\w+)\s*\??$",
+            r"^(?:list|show|show me|get|give me|display)?\s*(?:patient\s+)?(\w+)\s+(\w+)'s\s+(conditions|diagnoses|medications|medicines|drugs|procedures)\s*\??$",
+        )
+        for position, pattern in enumerate(patterns):
+            match = re.match(pattern, text, flags=re.IGNORECASE)
+            if not match:
+                continue
+            if position == 2:
+                first, last, kind = match.group(1), match.group(2), match.group(3)
+            else:
+                kind, first, last = match.group(1), match.group(2), match.group(3)
+            if first.lower() in _NOT_NAMES or last.lower() in _NOT_NAMES:
+                return None
+            kind = kind.lower()
+            if kind in ("conditions", "diagnoses"):
+                concept = "condition"
+            elif kind in ("medications", "medicines", "drugs"):
+                concept = "medication"
+            else:
+                concept = "procedure"
+            return self._patient_concepts_template(concept, first, last)
+        return None
+
+    def _patient_concepts_template(self, concept: str, first: str, last: str) -> TemplateMatch:
+        table, column = _CONCEPT_TABLES[concept]
+        date_column = '"DATE"' if concept == "procedure" else '"START"'
+        sql = (
+            f'SELECT p."FIRST", p."LAST", t.{column} AS description, t.{date_column} AS date '
+            f'FROM {table} t JOIN patients p ON p."PATIENT_ID" = t."PATIENT_ID" '
+            f'WHERE p."FIRST" ILIKE :first AND p."LAST" ILIKE :last '
+            f'ORDER BY t.{date_column} DESC LIMIT :limit'
+        )
+
+        def summarize(rows: List[Dict[str, Any]]) -> str:
+            if not rows:
+                return f"No {concept} records found for {first} {last}."
+            return f"Found {len(rows)} {concept} records for {first} {last}."
+
+        return TemplateMatch(
+            f"patient_{concept}s", sql,
+            {"first": _name_pattern(first), "last": _name_pattern(last), "limit": self.row_limit},
+            {"concept": concept, "first": first, "last": last}, summarize
+        )
+
+    def _match_cost_by_payer(self, text: str) -> Optional[TemplateMatch]:
+        """Cost totals: 'total cost by payer', 'medication costs per insurance'"""
+        lower = text.lower()
+        match = re.match(
+            r"^(?:show\s+(?:me\s+)?|what\s+(?:is|are)\s+(?:the\s+)?|list\s+)?(?:the\s+)?(?:total\s+)?"
+            r"(medication\s+|drug\s+|encounter\s+|claim\s+)?(?:costs?|spend(?:ing)?|expenses?)\s+"
+            r"(?:by|per|for each|grouped by)\s+(?:payer|payers|insurer|insurance|insurance company)\s*\??$",
+            lower
+        )
+        if not match:
+            return None
+        medication = (match.group(1) or "").strip() in ("medication", "drug")
+        if medication:
+            sql = (
+                'SELECT py."NAME" AS payer, COUNT(*) AS medications, '
+                'SUM(m."TOTALCOST") AS total_cost, SUM(m."PAYER_COVERAGE") AS payer_coverage '
+                'FROM medications m JOIN payers py ON py."PAYER_ID" = m."PAYER_ID" '
+                'GROUP BY py."NAME" ORDER BY total_cost DESC NULLS LAST LIMIT :limit'
+            )
+        else:
+            sql = (
+                'SELECT py."NAME" AS payer, COUNT(*) AS encounters, '
+                'SUM(e."TOTAL_CLAIM_COST") AS total_cost, SUM(e."PAYER_COVERAGE") AS payer_coverage '
+                'FROM encounters e JOIN payers py ON py."PAYER_ID" = e."PAYER_ID" '
+                'GROUP BY py."NAME" ORDER BY total_cost DESC NULLS LAST LIMIT :limit'
+            )
+        source = "medication" if medication else "encounter"
+
+        def summarize(rows: List[Dict[str, Any]]) -> str:
+            return f"Total {source} costs for {len(rows)} payers, highest first."
+
+        return TemplateMatch(f"{source}_cost_by_payer", sql, {"limit": self.row_limit}, {"source": source}, summarize)
+
+    def _match_encounters_in_range(self, text: str) -> Optional[TemplateMatch]:
+        """Encounter counts: 'how many encounters in 2020', 'emergency encounters between X and Y'"""
+        lower = text.lower()
+        match = re.match(
+            r"^(?:how many|count(?: of)?|number of|total number of)\s+(?:the\s+)?([a-z ]+?\s+)?"
+            r"(?:encounters|visits)\s+(?:were\s+there\s+|occurred\s+|happened\s+|took place\s+)?"
+            r"((?:in|during|between|from|since)\s+.+?)\s*\??$",
+            lower
+        )
+        if not match:
+            return None
+
+        encounter_class = None
+        qualifier = (match.group(1) or "").strip()
+        if qualifier:
+            encounter_class = _ENCOUNTER_CLASSES.get(qualifier)
+            if encounter_class is None:
+                return None
+
+        date_range = _date_range(match.group(2))
+        if date_range is None:
+            return None
+        start, end = date_range
+
+        sql = 'SELECT COUNT(*) AS encounter_count FROM encounters WHERE "START" >= :start AND "START" <= :end'
+        params: Dict[str, Any] = {"start": start, "end": end}
+        if encounter_class:
+            sql += ' AND "ENCOUNTERCLASS" = :encounter_class'
+            params["encounter_class"] = encounter_class
+
+        def summarize(rows: List[Dict[str, Any]]) -> str:
+            kind = f"{encounter_class} " if encounter_class else ""
+            return f"There were {_first_value(rows)} {kind}encounters between {start.isoformat()} and {end.isoformat()}."
+
+        return TemplateMatch(
+            "encounters_in_range", sql, params,
+            {"start": start.isoformat(), "end": end.isoformat(), "encounter_class": encounter_class}, summarize
+        )
+
+    # -- stats -------------------------------------------------------------
+
+    def get_stats(self, agent_mean_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Coverage of incoming questions and the latency saved versus the agent"""
+        with self._lock:
+            matched_total = sum(self.matched.values())
+            stats = {
+                "questions_seen": self.questions_seen,
+                "matched": matched_total,
+                "coverage": round(matched_total / self.questions_seen, 4) if self.questions_seen else None,
+                "matched_by_template": dict(self.matched),
+                "failed_executions": self.failed_executions,
+                "template_seconds": self.template_latency.summary(),
+                "agent_mean_seconds": round(agent_mean_seconds, 4) if agent_mean_seconds is not None else None,
+            }
+        template_mean = stats["template_seconds"]["mean"]
+        answered = stats["template_seconds"]["total_count"]
+        if agent_mean_seconds is not None and template_mean is not None:
+            stats["estimated_seconds_saved"] = round(max(0.0, agent_mean_seconds - template_mean) * answered, 3)
+        else:
+            stats["estimated_seconds_saved"] = None
+        return stats
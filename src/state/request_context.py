@@ -0,0 +1,85 @@
+"""
+Request-scoped execution context for the database agents
+
+A shared agent instance serves many concurrent requests, so per-request
+results (last SQL, last rows, table data) live in a RequestContext that is
+carried through tools and parsers by a ContextVar instead of on the agent.
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, List, Optional
+
+
+class RequestContext:
+    """Mutable state belonging to a single chat request"""
+
+    def __init__(self, session_id: Optional[str] = None, request_id: Optional[str] = None,
+                 bypass_cache: bool = False):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.session_id = session_id
+        self.bypass_cache = bypass_cache
+        self.started_at = time.perf_counter()
+
+        self.last_query_data: Optional[List[Dict[str, Any]]] = None
+        self.last_query_sql: Optional[str] = None
+        self.last_query_truncated = False
+        self.last_table_data: Optional[Any] = None
+
+        self.queries_executed = 0
+        self.metadata: Dict[str, Any] = {}
+
+    def record_query(self, sql_query: str, data: Optional[List[Dict[str, Any]]]):
+        """Store the result of a successful query for table display"""
+        self.last_query_sql = sql_query
+        self.last_query_data = data
+        self.last_query_truncated = bool(getattr(data, "truncated", False))
+        self.queries_executed += 1
+
+    def clear_query_data(self):
+        """Forget query results once they have been consumed"""
+        self.last_query_data = None
+        self.last_query_sql = None
+        self.last_query_truncated = False
+        self.last_table_data = None
+
+    def elapsed(self) -> float:
+        """Seconds since the request context was created"""
+        return time.perf_counter() - self.started_at
+
+
+_current_request_context: ContextVar[Optional[RequestContext]] = ContextVar(
+    "current_request_context", default=None
+)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    """Get the RequestContext of the running request, if any"""
+    return _current_request_context.get()
+
+
+@contextmanager
+def request_scope(session_id: Optional[str] = None, request_id: Optional[str] = None,
+                  reuse_existing: bool = True, bypass_cache: bool = False) -> Iterator[RequestContext]:
+    """Bind a RequestContext for the duration of a block.
+
+    Nested scopes reuse the outer context by default so that the API layer,
+    the enhanced agent and the ReAct agent all see the same request state.
+    """
+    existing = _current_request_context.get()
+    if existing is not None and reuse_existing:
+        if session_id and not existing.session_id:
+            existing.session_id = session_id
+        if bypass_cache:
+            existing.bypass_cache = True
+        yield existing
+        return
+
+    context = RequestContext(session_id=session_id, request_id=request_id, bypass_cache=bypass_cache)
+    token = _current_request_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_request_context.reset(token)
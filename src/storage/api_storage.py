@@ -17,6 +17,8 @@ from contextlib import asynccontextmanager
 import hashlib
 import time
 
+from src.storage.write_behind import WriteBehindQueue
+
 # Try to import structlog, fallback to standard logging
 try:
     import structlog
@@ -45,16 +47,32 @@ class APIStorageManager:
         
 
         self.db_file = self.base_dir / db_file
+        self.busy_timeout = float(os.getenv("STORAGE_BUSY_TIMEOUT", "30"))
         self._init_database()
         
+        self.write_behind = None
+        if os.getenv("STORAGE_WRITE_BEHIND", "true").lower() != "false":
+            self.write_behind = WriteBehindQueue(self._apply_batch, name="api-storage-writer")
+            self.write_behind.start()
+        
         logger.info(f"API Storage Manager initialized at {self.base_dir}")
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that waits on locks held by other workers instead of failing"""
+        conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        return conn
+    
     def _init_database(self):
         """Initialize SQLite database with required tables"""
         try:
-            conn = sqlite3.connect(self.db_file)
+            conn = self._connect()
             cursor = conn.cursor()
             
+            # WAL lets readers in other worker processes proceed while one writes
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            
 
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS api_requests (
@@ -162,22 +180,112 @@ class APIStorageManager:
             logger.error(f"Error initializing database: {e}")
             raise
     
-    async def log_api_request(self, request_data: Dict[str, Any]) -> str:
-        """Log API request to database and file storage"""
-        request_id = str(uuid.uuid4())
-        timestamp = datetime.now().isoformat()
+    def _submit(self, operation: Tuple) -> bool:
+        """Queue a write for the background writer, or apply it inline if write-behind is off"""
+        if self.write_behind is not None:
+            return self.write_behind.submit(operation)
+        self._apply_batch([operation])
+        return True
+    
+    def _apply_batch(self, operations: List[Tuple]):
+        """Apply a batch of queued writes in a single SQLite transaction, then write JSON files"""
+        request_rows, response_rows, session_rows, result_rows = [], [], [], []
+        analytics_hours = []
+        files = []
+        
+        for operation in operations:
+            kind = operation[0]
+            if kind == "request":
+                request_rows.append(operation[1])
+                files.append((self.requests_dir / f"request_{operation[1][0]}.json", operation[2]))
+            elif kind == "response":
+                response_rows.append(operation[1])
+                files.append((self.responses_dir / f"response_{operation[1][0]}.json", operation[2]))
+            elif kind == "session":
+                session_rows.append(operation[1])
+                session_file = self.sessions_dir / f"session_{operation[1][0]}.json"
+                if not session_file.exists():
+                    files.append((session_file, operation[2]))
+            elif kind == "session_result":
+                result_rows.append(operation[1])
+            elif kind == "analytics":
+                if operation[1] not in analytics_hours:
+                    analytics_hours.append(operation[1])
         
+        conn = self._connect()
         try:
-
-            conn = sqlite3.connect(self.db_file)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                INSERT INTO api_requests 
-                (request_id, session_id, timestamp, endpoint, method, user_query, 
-                 request_size, ip_address, user_agent, headers)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            if request_rows:
+                cursor.executemany('''
+                    INSERT INTO api_requests 
+                    (request_id, session_id, timestamp, endpoint, method, user_query, 
+                     request_size, ip_address, user_agent, headers)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', request_rows)
+            
+            if session_rows:
+                cursor.executemany('''
+                    INSERT INTO api_sessions 
+                    (session_id, created_at, last_activity, ip_address, user_agent)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(session_id) DO UPDATE
+                    SET last_activity = excluded.last_activity, total_requests = total_requests + 1
+                ''', session_rows)
+            
+            if response_rows:
+                cursor.executemany('''
+                    INSERT INTO api_responses 
+                    (response_id, request_id, session_id, timestamp, status_code, success,
+                     response_size, processing_time, sql_generated, result_count, 
+                     agent_type, error_message)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', response_rows)
+            
+            if result_rows:
+                cursor.executemany('''
+                    UPDATE api_sessions 
+                    SET successful_requests = successful_requests + ?,
+                        failed_requests = failed_requests + ?,
+                        total_response_time = total_response_time + ?
+                    WHERE session_id = ?
+                ''', result_rows)
+            
+            for date_str, hour in analytics_hours:
+                self._refresh_hourly_analytics(cursor, date_str, hour)
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        for file_path, record in files:
+            try:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(record, f, indent=2, ensure_ascii=False, default=str)
+            except Exception as e:
+                logger.error(f"Error writing storage file {file_path}: {e}")
+    
+    async def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until all queued writes are visible in storage"""
+        if self.write_behind is None:
+            return True
+        return await self.write_behind.flush(timeout)
+    
+    def close(self):
+        """Durably flush queued writes and stop the background writer"""
+        if self.write_behind is not None:
+            self.write_behind.close()
+    
+    async def log_api_request(self, request_data: Dict[str, Any], request_id: str = None) -> str:
+        """Log API request to database and file storage"""
+        request_id = request_id or str(uuid.uuid4())
+        timestamp = datetime.now().isoformat()
+        
+        try:
+            row = (
                 request_id,
                 request_data.get('session_id'),
                 timestamp,
@@ -188,13 +296,7 @@ class APIStorageManager:
                 request_data.get('ip_address', ''),
                 request_data.get('user_agent', ''),
                 json.dumps(request_data.get('headers', {}))
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-
-            request_file = self.requests_dir / f"request_{request_id}.json"
+            )
             request_record = {
                 "request_id": request_id,
                 "timestamp": timestamp,
@@ -205,9 +307,7 @@ class APIStorageManager:
                 }
             }
             
-            with open(request_file, 'w', encoding='utf-8') as f:
-                json.dump(request_record, f, indent=2, ensure_ascii=False, default=str)
-            
+            self._submit(("request", row, request_record))
             logger.debug(f"API request logged: {request_id}")
             return request_id
             
@@ -222,17 +322,7 @@ class APIStorageManager:
         timestamp = datetime.now().isoformat()
         
         try:
-
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO api_responses 
-                (response_id, request_id, session_id, timestamp, status_code, success,
-                 response_size, processing_time, sql_generated, result_count, 
-                 agent_type, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            row = (
                 response_id,
                 request_id,
                 response_data.get('session_id'),
@@ -245,13 +335,7 @@ class APIStorageManager:
                 response_data.get('result_count', 0),
                 response_data.get('metadata', {}).get('agent_type', ''),
                 response_data.get('metadata', {}).get('error', '') if not response_data.get('success') else None
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-
-            response_file = self.responses_dir / f"response_{response_id}.json"
+            )
             response_record = {
                 "response_id": response_id,
                 "request_id": request_id,
@@ -264,9 +348,7 @@ class APIStorageManager:
                 }
             }
             
-            with open(response_file, 'w', encoding='utf-8') as f:
-                json.dump(response_record, f, indent=2, ensure_ascii=False, default=str)
-            
+            self._submit(("response", row, response_record))
             logger.debug(f"API response logged: {response_id}")
             return response_id
             
@@ -278,54 +360,25 @@ class APIStorageManager:
         """Create or update API session"""
         try:
             timestamp = datetime.now().isoformat()
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-
-            cursor.execute('SELECT id FROM api_sessions WHERE session_id = ?', (session_id,))
-            exists = cursor.fetchone()
-            
-            if exists:
-
-                cursor.execute('''
-                    UPDATE api_sessions 
-                    SET last_activity = ?, total_requests = total_requests + 1
-                    WHERE session_id = ?
-                ''', (timestamp, session_id))
-            else:
-
-                cursor.execute('''
-                    INSERT INTO api_sessions 
-                    (session_id, created_at, last_activity, ip_address, user_agent)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    session_id,
-                    timestamp,
-                    timestamp,
-                    request_data.get('ip_address', ''),
-                    request_data.get('user_agent', '')
-                ))
-                
-
-                session_file = self.sessions_dir / f"session_{session_id}.json"
-                session_record = {
-                    "session_id": session_id,
-                    "created_at": timestamp,
-                    "requests": [],
-                    "metadata": {
-                        "storage_version": "1.0",
-                        "ip_address": request_data.get('ip_address', ''),
-                        "user_agent": request_data.get('user_agent', '')
-                    }
+            row = (
+                session_id,
+                timestamp,
+                timestamp,
+                request_data.get('ip_address', ''),
+                request_data.get('user_agent', '')
+            )
+            session_record = {
+                "session_id": session_id,
+                "created_at": timestamp,
+                "requests": [],
+                "metadata": {
+                    "storage_version": "1.0",
+                    "ip_address": request_data.get('ip_address', ''),
+                    "user_agent": request_data.get('user_agent', '')
                 }
-                
-                with open(session_file, 'w', encoding='utf-8') as f:
-                    json.dump(session_record, f, indent=2, ensure_ascii=False, default=str)
-            
-            conn.commit()
-            conn.close()
+            }
             
-            return True
+            return self._submit(("session", row, session_record))
             
         except Exception as e:
             logger.error(f"Error creating/updating session: {e}")
@@ -334,35 +387,16 @@ class APIStorageManager:
     async def update_session_result(self, session_id: str, success: bool, processing_time: float):
         """Update session with request result"""
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-            if success:
-                cursor.execute('''
-                    UPDATE api_sessions 
-                    SET successful_requests = successful_requests + 1,
-                        total_response_time = total_response_time + ?
-                    WHERE session_id = ?
-                ''', (processing_time, session_id))
-            else:
-                cursor.execute('''
-                    UPDATE api_sessions 
-                    SET failed_requests = failed_requests + 1,
-                        total_response_time = total_response_time + ?
-                    WHERE session_id = ?
-                ''', (processing_time, session_id))
-            
-            conn.commit()
-            conn.close()
-            
+            self._submit(("session_result", (1 if success else 0, 0 if success else 1, processing_time, session_id)))
         except Exception as e:
             logger.error(f"Error updating session result: {e}")
     
     async def end_session(self, session_id: str) -> bool:
         """End an API session"""
         try:
+            await self.flush()
             timestamp = datetime.now().isoformat()
-            conn = sqlite3.connect(self.db_file)
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -400,57 +434,51 @@ class APIStorageManager:
                 timestamp = datetime.now().isoformat()
             
             dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            date_str = dt.strftime('%Y-%m-%d')
-            hour = dt.hour
-            
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-
-            cursor.execute('''
-                SELECT COUNT(*) as total_requests,
-                       SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful_requests,
-                       SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed_requests,
-                       AVG(processing_time) as avg_response_time,
-                       SUM(response_size) as total_data_transferred
-                FROM api_responses 
-                WHERE date(timestamp) = ? AND strftime('%H', timestamp) = ?
-            ''', (date_str, f"{hour:02d}"))
-            
-            stats = cursor.fetchone()
-            
-
-            cursor.execute('''
-                SELECT COUNT(DISTINCT session_id) as unique_sessions
-                FROM api_requests 
-                WHERE date(timestamp) = ? AND strftime('%H', timestamp) = ?
-            ''', (date_str, f"{hour:02d}"))
-            
-            unique_sessions = cursor.fetchone()[0]
-            
-
-            cursor.execute('''
-                INSERT OR REPLACE INTO api_analytics 
-                (date, hour, total_requests, successful_requests, failed_requests,
-                 unique_sessions, avg_response_time, total_data_transferred)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                date_str,
-                hour,
-                stats[0] or 0,
-                stats[1] or 0,
-                stats[2] or 0,
-                unique_sessions or 0,
-                stats[3] or 0.0,
-                stats[4] or 0
-            ))
-            
-            conn.commit()
-            conn.close()
+            self._submit(("analytics", (dt.strftime('%Y-%m-%d'), dt.hour)))
             
         except Exception as e:
             logger.error(f"Error updating analytics: {e}")
     
+    def _refresh_hourly_analytics(self, cursor: sqlite3.Cursor, date_str: str, hour: int):
+        """Recompute one hour of analytics from the request and response tables"""
+        cursor.execute('''
+            SELECT COUNT(*) as total_requests,
+                   SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful_requests,
+                   SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed_requests,
+                   AVG(processing_time) as avg_response_time,
+                   SUM(response_size) as total_data_transferred
+            FROM api_responses 
+            WHERE date(timestamp) = ? AND strftime('%H', timestamp) = ?
+        ''', (date_str, f"{hour:02d}"))
+        
+        stats = cursor.fetchone()
+        
+
+        cursor.execute('''
+            SELECT COUNT(DISTINCT session_id) as unique_sessions
+            FROM api_requests 
+            WHERE date(timestamp) = ? AND strftime('%H', timestamp) = ?
+        ''', (date_str, f"{hour:02d}"))
+        
+        unique_sessions = cursor.fetchone()[0]
+        
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO api_analytics 
+            (date, hour, total_requests, successful_requests, failed_requests,
+             unique_sessions, avg_response_time, total_data_transferred)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            date_str,
+            hour,
+            stats[0] or 0,
+            stats[1] or 0,
+            stats[2] or 0,
+            unique_sessions or 0,
+            stats[3] or 0.0,
+            stats[4] or 0
+        ))
+    
     async def check_rate_limit(self, ip_address: str, endpoint: str, 
                               requests_per_minute: int = 60) -> Tuple[bool, Dict[str, Any]]:
         """Check if IP address has exceeded rate limit"""
@@ -458,7 +486,7 @@ class APIStorageManager:
             now = datetime.now()
             window_start = now - timedelta(minutes=1)
             
-            conn = sqlite3.connect(self.db_file)
+            conn = self._connect()
             cursor = conn.cursor()
             
 
@@ -569,10 +597,11 @@ class APIStorageManager:
     async def get_api_analytics(self, days: int = 7) -> Dict[str, Any]:
         """Get API analytics for the specified number of days"""
         try:
+            await self.flush()
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
-            conn = sqlite3.connect(self.db_file)
+            conn = self._connect()
             cursor = conn.cursor()
             
 
@@ -671,10 +700,11 @@ class APIStorageManager:
     async def cleanup_old_data(self, days_to_keep: int = 30) -> Dict[str, int]:
         """Clean up old API data"""
         try:
+            await self.flush()
             cutoff_date = datetime.now() - timedelta(days=days_to_keep)
             cleanup_stats = {"deleted_records": 0, "deleted_files": 0, "errors": 0}
             
-            conn = sqlite3.connect(self.db_file)
+            conn = self._connect()
             cursor = conn.cursor()
             
 
@@ -718,7 +748,8 @@ class APIStorageManager:
     async def get_storage_stats(self) -> Dict[str, Any]:
         """Get comprehensive storage statistics"""
         try:
-            conn = sqlite3.connect(self.db_file)
+            await self.flush()
+            conn = self._connect()
             cursor = conn.cursor()
             
 
@@ -769,6 +800,7 @@ class APIStorageManager:
                     "db_size_mb": round(db_size / (1024 * 1024), 2)
                 },
                 "file_stats": file_stats,
+                "write_behind": self.write_behind.get_stats() if self.write_behind is not None else None,
                 "total_storage": {
                     "size_bytes": total_size,
                     "size_mb": round(total_size / (1024 * 1024), 2),
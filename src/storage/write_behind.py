@@ -0,0 +1,212 @@
+"""
+Write-behind queue for storage writes
+
+Callers enqueue write operations and return immediately. A dedicated writer
+thread drains the bounded queue in batches and hands each batch to an
+``apply_batch`` callable, so slow disk and SQLite work never runs on the
+event loop. ``apply_batch`` must be all-or-nothing; when a batch fails it
+is retried one operation at a time so only the bad operations are lost.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.metrics import LatencyTracker
+
+try:
+    import structlog
+    logger = structlog.get_logger(__name__)
+except ImportError:
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Bounded queue drained in batches by a dedicated writer thread"""
+
+    def __init__(self, apply_batch: Callable[[List[Any]], None], batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, max_queue_size: Optional[int] = None,
+                 name: str = "storage-writer"):
+        self.apply_batch = apply_batch
+        self.batch_size = batch_size or int(os.getenv("STORAGE_BATCH_SIZE", "100"))
+        self.flush_interval = flush_interval or float(os.getenv("STORAGE_FLUSH_INTERVAL", "0.5"))
+        self.max_queue_size = max_queue_size or int(os.getenv("STORAGE_QUEUE_SIZE", "10000"))
+        self.name = name
+
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.failed_writes = 0
+        self.batch_latency = LatencyTracker()
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, operation: Any) -> bool:
+        """Enqueue an operation without blocking; returns False if it was dropped"""
+        if self._closed:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(operation)
+            self.enqueued += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"{self.name} queue full - dropping write ({self.dropped} dropped so far)")
+            return False
+
+    def _write(self, batch: List[Any]):
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            self.apply_batch(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"{self.name} failed to write batch of {len(batch)}: {e}")
+            if len(batch) > 1:
+                self._write_one_by_one(batch)
+            else:
+                self._lose(1)
+        finally:
+            self.batches += 1
+            self.batch_latency.record(time.perf_counter() - start)
+
+    def _write_one_by_one(self, batch: List[Any]):
+        """Retry a failed batch per operation, in order, so one bad row does not take the rest with it"""
+        failed = 0
+        for operation in batch:
+            try:
+                self.apply_batch([operation])
+                self.written += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"{self.name} dropped a write that failed on its own: {e}")
+        self._lose(failed)
+
+    def _lose(self, count: int):
+        if count:
+            self.failed_writes += count
+            self.dropped += count
+
+    def _run(self):
+        """Collect operations until the batch is full or the flush interval passes"""
+        while True:
+            item = self._queue.get()
+            batch: List[Any] = []
+            waiters: List[threading.Event] = []
+            stop = False
+
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                self._drain()
+                return
+
+    def _drain(self):
+        """Write everything still queued; used once on shutdown"""
+        batch: List[Any] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._write(batch)
+                    batch = []
+        self._write(batch)
+
+    def flush_sync(self, timeout: float = 10.0) -> bool:
+        """Block until everything enqueued so far has been written"""
+        if not self.is_running:
+            return self._queue.empty()
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    async def flush(self, timeout: float = 10.0) -> bool:
+        """Wait for pending writes without blocking the event loop"""
+        return await asyncio.to_thread(self.flush_sync, timeout)
+
+    def close(self, timeout: float = 30.0):
+        """Durably flush all pending writes and stop the writer thread"""
+        self._closed = True
+        if not self.is_running:
+            self._drain()
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"{self.name} did not finish flushing within {timeout}s")
+        else:
+            logger.info(f"✅ {self.name} flushed {self.written} writes in {self.batches} batches")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, throughput and drop statistics"""
+        return {
+            "running": self.is_running,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_writes": self.failed_writes,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+            "batch_write_seconds": self.batch_latency.summary()
+        }
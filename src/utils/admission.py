@@ -0,0 +1,125 @@
+"""
+Admission control for LLM-bound requests
+
+Caps how many requests run the agent at once, lets a bounded number wait
+for a slot until their queue deadline, and rejects the rest immediately so
+callers can back off instead of piling onto a throttled provider.
+"""
+
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+from src.utils.metrics import LatencyTracker
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Request not admitted: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, deadline-aware wait queue"""
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_queue: Optional[int] = None,
+                 queue_timeout: Optional[float] = None):
+        self.max_concurrent = max_concurrent or int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("LLM_MAX_QUEUE", "32"))
+        self.queue_timeout = queue_timeout or float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait_time = LatencyTracker()
+        self.service_time = LatencyTracker()
+
+    def _retry_after(self) -> int:
+        """Estimate seconds until a slot frees up from recent service times"""
+        mean_service = self.service_time.summary()["mean"] or self.queue_timeout
+        backlog = (self.waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(mean_service * backlog))
+
+    def is_saturated(self) -> bool:
+        """True when every slot is busy and the wait queue is full"""
+        return self._semaphore.locked() and self.waiting >= self.max_queue
+
+    def check(self):
+        """Reject immediately if a new request could not even be queued"""
+        if self.is_saturated():
+            self.rejected_queue_full += 1
+            raise AdmissionRejected("queue_full", self._retry_after())
+
+    async def acquire(self, timeout: Optional[float] = None) -> float:
+        """Wait for a slot; returns the queueing delay in seconds or raises AdmissionRejected"""
+        self.check()
+
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending, so bursts see an
+            # accurate queue depth before deciding to wait or reject.
+            await self._semaphore.acquire()
+            self.wait_time.record(0.0)
+            self.admitted += 1
+            self.active += 1
+            return 0.0
+
+        start = time.perf_counter()
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout or self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise AdmissionRejected("queue_timeout", self._retry_after())
+        finally:
+            self.waiting -= 1
+
+        waited = time.perf_counter() - start
+        self.wait_time.record(waited)
+        self.admitted += 1
+        self.active += 1
+        return waited
+
+    def release(self, service_seconds: Optional[float] = None):
+        """Give the slot back after the agent call finished"""
+        self.active -= 1
+        if service_seconds is not None:
+            self.service_time.record(service_seconds)
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def admit(self, timeout: Optional[float] = None):
+        """Hold a slot for the duration of the block"""
+        waited = await self.acquire(timeout)
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get concurrency, queue depth, rejection and wait-time statistics"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "peak_queue_depth": self.peak_waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_seconds": self.wait_time.summary(),
+            "service_seconds": self.service_time.summary()
+        }
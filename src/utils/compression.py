@@ -0,0 +1,177 @@
+"""
+Negotiated gzip/deflate compression for API responses
+
+Single-body responses at or above a size threshold are compressed with the
+best encoding the client accepts. Streaming bodies (Server-Sent Events and
+anything else sent in several chunks) pass through untouched so events are
+never held back by a compressor buffer.
+"""
+
+import asyncio
+import gzip
+import os
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.metrics import LatencyTracker
+
+SUPPORTED_ENCODINGS = ("gzip", "deflate")
+EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick gzip or deflate from an Accept-Encoding header, honouring q-values"""
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[coding] = quality
+
+    best = None
+    best_quality = 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionStats:
+    """Counters shared between the middleware and the /metrics endpoint"""
+
+    def __init__(self):
+        self.compressed = 0
+        self.skipped_small = 0
+        self.skipped_streaming = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_time = LatencyTracker()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get compression counts, byte totals and time spent compressing"""
+        return {
+            "compressed_responses": self.compressed,
+            "skipped_small": self.skipped_small,
+            "skipped_streaming": self.skipped_streaming,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "compression_ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+            "compress_seconds": self.compress_time.summary()
+        }
+
+
+def compress_body(body: bytes, encoding: str, level: int) -> bytes:
+    """Compress a complete body with the negotiated encoding"""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    return zlib.compress(body, level)
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses large, single-chunk responses"""
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None, level: Optional[int] = None,
+                 thread_minimum_size: Optional[int] = None, enabled: Optional[bool] = None,
+                 stats: Optional[CompressionStats] = None):
+        self.app = app
+        self.minimum_size = minimum_size or int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        self.level = level or int(os.getenv("COMPRESSION_LEVEL", "6"))
+        # Very large bodies are compressed off the event loop
+        self.thread_minimum_size = thread_minimum_size or int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", "262144"))
+        if enabled is None:
+            enabled = os.getenv("RESPONSE_COMPRESSION", "true").lower() == "true"
+        self.enabled = enabled
+        self.stats = stats or CompressionStats()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if headers.get("content-encoding") or content_type.startswith(EXCLUDED_CONTENT_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the start message until the body shows whether it is worth compressing
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            if start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            held_start, start_message = start_message, None
+
+            if message.get("more_body", False):
+                self.stats.skipped_streaming += 1
+                passthrough = True
+                await send(held_start)
+                await send(message)
+                return
+
+            if len(body) < self.minimum_size:
+                self.stats.skipped_small += 1
+                await send(held_start)
+                await send(message)
+                return
+
+            compress_start = time.perf_counter()
+            if len(body) >= self.thread_minimum_size:
+                compressed = await asyncio.to_thread(compress_body, body, encoding, self.level)
+            else:
+                compressed = compress_body(body, encoding, self.level)
+            self.stats.compress_time.record(time.perf_counter() - compress_start)
+
+            if len(compressed) >= len(body):
+                await send(held_start)
+                await send(message)
+                return
+
+            self.stats.compressed += 1
+            self.stats.bytes_in += len(body)
+            self.stats.bytes_out += len(compressed)
+
+            headers = MutableHeaders(raw=held_start["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(held_start)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,88 @@
+"""
+Fast JSON serialization for API responses
+
+Pydantic models that were already validated when they were built are dumped
+straight to bytes by pydantic-core, and plain dicts go through orjson when it
+is installed. This skips FastAPI's jsonable_encoder pass and the re-validation
+against ``response_model``. Serialization time is measured per response and
+reported in a Server-Timing header.
+"""
+
+import json
+import time
+from typing import Any, Mapping, Optional
+
+from pydantic import BaseModel
+from pydantic_core import PydanticSerializationError
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse
+
+from src.utils.metrics import LatencyTracker
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SERVER_TIMING_HEADER = "Server-Timing"
+SERIALIZE_TIMING_NAME = "serialize"
+
+serialization_latency = LatencyTracker()
+
+
+def _dumps_plain(content: Any) -> bytes:
+    """Dump dicts and lists, stringifying anything JSON has no type for"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+
+
+def dumps_bytes(content: Any) -> bytes:
+    """Serialize a pydantic model or plain JSON-like content to compact UTF-8 bytes"""
+    if isinstance(content, BaseModel):
+        try:
+            return content.model_dump_json().encode("utf-8")
+        except PydanticSerializationError:
+            # Free-form Dict[str, Any] fields can hold values pydantic-core
+            # cannot serialize; fall back to stringifying them.
+            return _dumps_plain(content.model_dump())
+    return _dumps_plain(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that serializes with pydantic-core/orjson and reports the time taken"""
+
+    def __init__(self, content: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None,
+                 media_type: Optional[str] = None, background: Optional[BackgroundTask] = None):
+        self.serialize_seconds = 0.0
+        super().__init__(content, status_code, headers, media_type, background)
+        self.headers.append(
+            SERVER_TIMING_HEADER,
+            f"{SERIALIZE_TIMING_NAME};dur={self.serialize_seconds * 1000:.3f}"
+        )
+
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        body = dumps_bytes(content)
+        self.serialize_seconds = time.perf_counter() - start
+        serialization_latency.record(self.serialize_seconds)
+        return body
+
+
+def serialize_ms_from_headers(headers: Mapping[str, str]) -> Optional[float]:
+    """Read the serialization time in milliseconds back out of a Server-Timing header"""
+    timing = headers.get(SERVER_TIMING_HEADER)
+    if not timing:
+        return None
+    for metric in timing.split(','):
+        name, _, params = metric.strip().partition(';')
+        if name != SERIALIZE_TIMING_NAME:
+            continue
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == "dur":
+                try:
+                    return float(value)
+                except ValueError:
+                    return None
+    return None
@@ -0,0 +1,69 @@
+"""
+Lightweight in-process metrics helpers for the Healthcare Database Assistant
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile over an already sorted list"""
+    if not sorted_samples:
+        return None
+    rank = math.ceil(pct / 100.0 * len(sorted_samples))
+    index = min(len(sorted_samples) - 1, max(0, rank - 1))
+    return sorted_samples[index]
+
+
+class LatencyTracker:
+    """Rolling window of latency samples with percentile summaries"""
+
+    def __init__(self, window_size: int = 1000):
+        self._samples = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self.total_count = 0
+        self.total_time = 0.0
+
+    def record(self, seconds: float):
+        """Record a single latency sample in seconds"""
+        with self._lock:
+            self._samples.append(seconds)
+            self.total_count += 1
+            self.total_time += seconds
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Get the given percentile (0-100) of the current window"""
+        with self._lock:
+            samples = sorted(self._samples)
+        return _percentile(samples, pct)
+
+    def summary(self) -> Dict[str, Any]:
+        """Get a summary of the current window"""
+        with self._lock:
+            samples = sorted(self._samples)
+            total_count = self.total_count
+            total_time = self.total_time
+
+        def _pct(pct: float) -> Optional[float]:
+            value = _percentile(samples, pct)
+            return round(value, 4) if value is not None else None
+
+        return {
+            "window_count": len(samples),
+            "total_count": total_count,
+            "mean": round(sum(samples) / len(samples), 4) if samples else None,
+            "p50": _pct(50),
+            "p95": _pct(95),
+            "p99": _pct(99),
+            "max": round(samples[-1], 4) if samples else None,
+            "lifetime_mean": round(total_time / total_count, 4) if total_count else None
+        }
+
+    def reset(self):
+        """Clear all samples"""
+        with self._lock:
+            self._samples.clear()
+            self.total_count = 0
+            self.total_time = 0.0
@@ -0,0 +1,149 @@
+"""
+Wire formats for tabular query results
+
+``legacy`` is the original shape: headers plus one dict per row, repeating
+every column name in every row. ``columnar`` sends headers once, rows as
+arrays, and replaces repeated strings with indexes into per-column
+dictionaries. ``dictionaries`` is a list aligned with ``headers`` (null for
+columns sent as plain values), so duplicate column names from joins keep
+their own dictionaries. Clients opt in with the X-Table-Format request header.
+Tuple-backed ResultSet rows are handed to the columnar encoder as they are
+and only turned into dicts for legacy clients.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.database.result_set import ResultSet
+from src.utils.fast_json import dumps_bytes
+
+TABLE_FORMAT_HEADER = "X-Table-Format"
+LEGACY_FORMAT = "legacy"
+COLUMNAR_FORMAT = "columnar"
+SUPPORTED_FORMATS = (LEGACY_FORMAT, COLUMNAR_FORMAT)
+
+# Dictionary-encode a string column only when it is long enough and
+# repetitive enough for the indexes to pay for the dictionary.
+DICTIONARY_MIN_ROWS = 8
+DICTIONARY_MAX_DISTINCT_RATIO = 0.5
+
+
+def negotiate_table_format(header_value: Optional[str]) -> str:
+    """Pick the table format requested by the client, defaulting to legacy"""
+    if not header_value:
+        return LEGACY_FORMAT
+    for candidate in header_value.split(','):
+        candidate = candidate.strip().lower()
+        if candidate in SUPPORTED_FORMATS:
+            return candidate
+    return LEGACY_FORMAT
+
+
+def _table_parts(table: Any) -> Tuple[List[str], Any]:
+    """Read headers and rows (row dicts or a ResultSet) from a TableData model or a plain dict without copying rows"""
+    if isinstance(table, dict):
+        rows = table.get("data") or []
+        headers = table.get("headers")
+    else:
+        rows = getattr(table, "data", None) or []
+        headers = getattr(table, "headers", None)
+    if not headers:
+        headers = rows.columns if isinstance(rows, ResultSet) else (list(rows[0].keys()) if rows else [])
+    return list(headers), rows
+
+
+def _is_truncated(table: Any, rows: Any) -> bool:
+    if isinstance(table, dict):
+        flagged = table.get("truncated", False)
+    else:
+        flagged = getattr(table, "truncated", False)
+    return bool(flagged or getattr(rows, "truncated", False))
+
+
+def to_legacy_table(table: Any) -> Dict[str, Any]:
+    """Headers plus row dicts; a list of dicts is shared, a ResultSet is converted once here"""
+    headers, rows = _table_parts(table)
+    data = rows.to_dicts() if isinstance(rows, ResultSet) else rows
+    return {"headers": headers, "data": data, "row_count": len(rows), "truncated": _is_truncated(table, rows)}
+
+
+def to_columnar_table(table: Any, dictionary_encode: bool = True) -> Dict[str, Any]:
+    """Headers once, rows as arrays, repeated strings dictionary-encoded"""
+    headers, rows = _table_parts(table)
+    # ResultSet tuples already are the row arrays; they are reused unless a column gets dictionary-encoded
+    row_arrays = rows.rows if isinstance(rows, ResultSet) and rows.columns == headers else None
+    if row_arrays is not None:
+        columns = rows.column_values() if dictionary_encode and len(rows) >= DICTIONARY_MIN_ROWS else []
+    else:
+        columns = [[row.get(header) for row in rows] for header in headers]
+
+    dictionaries: List[Optional[List[str]]] = [None] * len(headers)
+    if dictionary_encode and len(rows) >= DICTIONARY_MIN_ROWS:
+        max_distinct = len(rows) * DICTIONARY_MAX_DISTINCT_RATIO
+        for position in range(len(headers)):
+            column = columns[position]
+            if not all(value is None or isinstance(value, str) for value in column):
+                continue
+            codes: Dict[str, int] = {}
+            for value in column:
+                if value is not None and value not in codes:
+                    codes[value] = len(codes)
+                    if len(codes) > max_distinct:
+                        break
+            if not codes or len(codes) > max_distinct:
+                continue
+            dictionaries[position] = list(codes)
+            columns[position] = [codes[value] if value is not None else None for value in column]
+
+    encoded = any(dictionary is not None for dictionary in dictionaries)
+    if row_arrays is None or encoded:
+        row_arrays = [list(row) for row in zip(*columns)] if headers else []
+    payload = {
+        "format": COLUMNAR_FORMAT,
+        "headers": headers,
+        "rows": row_arrays,
+        "row_count": len(rows),
+        "truncated": _is_truncated(table, rows)
+    }
+    if encoded:
+        payload["dictionaries"] = dictionaries
+    return payload
+
+
+def from_columnar_table(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode a columnar payload back into the legacy shape"""
+    headers = payload.get("headers", [])
+    lookups = payload.get("dictionaries") or [None] * len(headers)
+    data = []
+    for row in payload.get("rows", []):
+        data.append({
+            header: (lookup[value] if lookup is not None and value is not None else value)
+            for header, lookup, value in zip(headers, lookups, row)
+        })
+    return {"headers": headers, "data": data, "row_count": payload.get("row_count", len(data)),
+            "truncated": payload.get("truncated", False)}
+
+
+def encode_table(table: Any, table_format: str = LEGACY_FORMAT,
+                 measure_bytes: bool = False) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """Encode a table for the wire and report how long the encoding took"""
+    if table is None:
+        return None, {}
+
+    start = time.perf_counter()
+    if table_format == COLUMNAR_FORMAT:
+        payload = to_columnar_table(table)
+    else:
+        payload = to_legacy_table(table)
+
+    dictionaries = payload.get("dictionaries") or []
+    stats = {
+        "format": table_format,
+        "rows": payload["row_count"],
+        "columns": len(payload["headers"]),
+        "dictionary_columns": [header for header, dictionary in zip(payload["headers"], dictionaries) if dictionary is not None],
+        "encode_seconds": round(time.perf_counter() - start, 6)
+    }
+    if measure_bytes:
+        stats["payload_bytes"] = len(dumps_bytes(payload))
+    return payload, stats
@@ -0,0 +1,6 @@
+import os
+
+# src.database.connection validates its settings at import time; no database is contacted in the tests
+for name, value in {"DB_HOST": "localhost", "DB_PORT": "5432", "DB_NAME": "test",
+                    "DB_USER": "test", "DB_PASSWORD": "test"}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+from src.memory.session_store import SessionStore
+from src.utils.admission import AdmissionController, AdmissionRejected
+
+
+class FakeStreamingAgent:
+    """Streams one status event and a final answer"""
+
+    async def stream_question(self, user_question, session_id=None, conversation_context=None):
+        yield {"event": "status", "data": {"message": "thinking"}}
+        await asyncio.sleep(0)
+        yield {"event": "final", "data": {"success": True, "message": f"Answered {user_question}"}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api_server, "agent", FakeStreamingAgent())
+    monkeypatch.setattr(api_server, "api_storage", None)
+    monkeypatch.setattr(api_server, "agent_sessions", SessionStore())
+    return TestClient(api_server.app)
+
+
+def _use_controller(monkeypatch, **limits):
+    controller = AdmissionController(**limits)
+    monkeypatch.setattr(api_server, "chat_admission", controller)
+    return controller
+
+
+def test_full_queue_is_rejected_without_waiting():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=5)
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        return controller, rejected.value
+
+    controller, rejection = asyncio.run(run())
+
+    assert rejection.reason == "queue_full"
+    assert rejection.retry_after >= 1
+    assert controller.rejected_queue_full == 1
+    assert controller.active == 1
+
+
+def test_queue_timeout_is_rejected_and_leaves_the_queue():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.02)
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        return controller, rejected.value
+
+    controller, rejection = asyncio.run(run())
+
+    assert rejection.reason == "queue_timeout"
+    assert controller.rejected_timeout == 1
+    assert controller.waiting == 0
+
+
+def test_release_hands_the_slot_to_the_next_waiter():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=1)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+        assert controller.waiting == 1
+        controller.release(0.5)
+        waited = await waiter
+        controller.release(0.1)
+        return controller, waited
+
+    controller, waited = asyncio.run(run())
+
+    assert waited > 0
+    assert controller.active == 0
+    assert controller.admitted == 2
+    assert controller.service_time.summary()["total_count"] == 2
+
+
+def test_admit_releases_when_the_block_raises():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=0)
+        with pytest.raises(RuntimeError):
+            async with controller.admit():
+                raise RuntimeError("agent failed")
+        await controller.acquire()
+        return controller
+
+    assert asyncio.run(run()).active == 1
+
+
+def test_chat_returns_429_with_retry_after_when_saturated(client, monkeypatch):
+    controller = _use_controller(monkeypatch, max_concurrent=1, max_queue=0)
+    asyncio.run(controller.acquire())
+
+    response = client.post("/chat", json={"message": "list patients in Boston"})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.parametrize("max_queue, reason", [(0, "queue_full"), (1, "queue_timeout")])
+def test_stream_rejection_is_a_429_before_streaming(client, monkeypatch, max_queue, reason):
+    controller = _use_controller(monkeypatch, max_concurrent=1, max_queue=max_queue, queue_timeout=0.02)
+    asyncio.run(controller.acquire())
+
+    response = client.post("/chat/stream", json={"message": "list patients in Boston"})
+
+    assert response.status_code == 429
+    assert reason in response.json()["detail"]
+    assert int(response.headers["Retry-After"]) >= 1
+    assert controller.active == 1
+
+
+def test_stream_releases_its_slot_when_done(client, monkeypatch):
+    controller = _use_controller(monkeypatch, max_concurrent=1, max_queue=0)
+
+    for _ in range(2):
+        response = client.post("/chat/stream", json={"message": "list patients in Boston"})
+        assert response.status_code == 200
+        assert "event: final" in response.text
+
+    assert controller.active == 0
+    assert controller.admitted == 2
@@ -0,0 +1,106 @@
+import asyncio
+import types
+
+import pytest
+
+from src.cache.answer_cache import AnswerCache
+from src.state.request_context import request_scope
+from tests.test_request_isolation import agent  # noqa: F401 - shared agent fixture
+
+QUESTION = "list patients in Boston"
+
+
+def _response(message="42 patients"):
+    return types.SimpleNamespace(success=True, message=message, metadata={})
+
+
+def test_trivially_different_phrasings_share_a_key():
+    assert AnswerCache.make_key("How many patients?", None, "v1") == AnswerCache.make_key("  how many   PATIENTS ", None, "v1")
+    assert AnswerCache.make_key("How many patients?", None, "v1") != AnswerCache.make_key("How many providers?", None, "v1")
+
+
+def test_schema_version_is_part_of_the_key():
+    assert AnswerCache.make_key("How many patients?", None, "v1") != AnswerCache.make_key("How many patients?", None, "v2")
+
+
+def test_context_only_keys_questions_that_refer_back():
+    standalone = "How many patients live in Boston?"
+    follow_up = "How many of them are over 60?"
+
+    assert AnswerCache.make_key(standalone, "user: list providers", "v1") == AnswerCache.make_key(standalone, None, "v1")
+    assert AnswerCache.make_key(follow_up, "user: list patients", "v1") != AnswerCache.make_key(follow_up, "user: list providers", "v1")
+    assert AnswerCache.make_key(follow_up, "user:  list\npatients", "v1") == AnswerCache.make_key(follow_up, "user: list patients", "v1")
+
+
+def test_only_successful_answers_are_cached():
+    cache = AnswerCache(enabled=True)
+    key = AnswerCache.make_key("How many patients?", None, "v1")
+
+    assert not cache.put(key, types.SimpleNamespace(success=False, message="failed"), "v1", "How many patients?")
+    assert cache.get(key) is None
+    assert cache.put(key, _response(), "v1", "How many patients?")
+    assert cache.get(key).message == "42 patients"
+
+
+def test_invalidate_schema_drops_entries_for_other_versions():
+    cache = AnswerCache(enabled=True)
+    old_key = AnswerCache.make_key("How many patients?", None, "v1")
+    new_key = AnswerCache.make_key("How many providers?", None, "v2")
+    cache.put(old_key, _response(), "v1", "How many patients?")
+    cache.put(new_key, _response("7 providers"), "v2", "How many providers?")
+
+    assert cache.invalidate_schema("v2") == 1
+    assert cache.get(old_key) is None
+    assert cache.get(new_key).message == "7 providers"
+
+
+def test_invalidate_one_question_matches_any_phrasing():
+    cache = AnswerCache(enabled=True)
+    cache.put(AnswerCache.make_key("How many patients?", None, "v1"), _response(), "v1", "How many patients?")
+
+    assert cache.invalidate("how many PATIENTS") == 1
+    assert cache.get_stats()["entries"] == 0
+
+
+@pytest.fixture
+def graph_calls(agent):  # noqa: F811
+    calls = []
+    ainvoke = agent.agent.ainvoke
+
+    async def counting_ainvoke(state, config=None):
+        calls.append(state)
+        return await ainvoke(state, config)
+
+    agent.agent.ainvoke = counting_ainvoke
+    agent.answer_cache.enabled = True
+    return calls
+
+
+def test_agent_serves_repeat_questions_from_the_cache(agent, graph_calls):  # noqa: F811
+    first = asyncio.run(agent.process_query(QUESTION))
+    repeat = asyncio.run(agent.process_query("List patients in Boston!"))
+
+    assert first.success
+    assert len(graph_calls) == 1
+    assert repeat.message == first.message
+    assert repeat.metadata["answer_cache"]["hit"] is True
+
+
+def test_agent_cache_follows_schema_changes_and_bypass(agent, graph_calls):  # noqa: F811
+    asyncio.run(agent.process_query(QUESTION))
+    old_version = agent.schema_version
+
+    agent.db_connection.schema_fingerprint = "catalog-v2"
+    asyncio.run(agent.process_query(QUESTION))
+
+    assert agent.schema_version != old_version
+    assert len(graph_calls) == 2
+    assert agent.answer_cache.get_stats()["entries"] == 1
+
+    async def bypassed():
+        with request_scope(bypass_cache=True):
+            return await agent.process_query(QUESTION)
+
+    asyncio.run(bypassed())
+    assert len(graph_calls) == 3
+    assert agent.answer_cache.bypassed == 1
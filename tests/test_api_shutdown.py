@@ -0,0 +1,43 @@
+import asyncio
+import sqlite3
+
+import api_server
+from src.storage.api_storage import APIStorageManager
+
+
+async def _noop():
+    return None
+
+
+def test_shutdown_drains_queued_storage_writes(monkeypatch, tmp_path):
+    # A long flush interval keeps the writes queued until shutdown
+    monkeypatch.setenv("STORAGE_FLUSH_INTERVAL", "60")
+    monkeypatch.setenv("STORAGE_BATCH_SIZE", "1000")
+    storage = APIStorageManager(base_dir=str(tmp_path / "api_storage"))
+
+    async def initialize_storage():
+        api_server.api_storage = storage
+
+    monkeypatch.setattr(api_server, "initialize_agent", _noop)
+    monkeypatch.setattr(api_server, "start_agent_resources", _noop)
+    monkeypatch.setattr(api_server, "cleanup_agent", _noop)
+    monkeypatch.setattr(api_server, "initialize_storage", initialize_storage)
+    monkeypatch.setattr(api_server, "api_storage", None)
+
+    async def run():
+        async with api_server.lifespan(api_server.app):
+            for index in range(5):
+                await storage.log_api_request({"session_id": "s1", "user_query": f"question {index}"})
+            assert storage.write_behind.written == 0
+
+    asyncio.run(run())
+
+    assert not storage.write_behind.is_running
+    with sqlite3.connect(storage.db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM api_requests").fetchone()[0] == 5
+    assert len(list(storage.requests_dir.glob("*.json"))) == 5
+
+
+def test_storage_cleanup_route_does_not_shadow_the_flush_helper():
+    assert api_server.flush_storage is not api_server.cleanup_storage
+    assert "days_to_keep" not in api_server.flush_storage.__code__.co_varnames
@@ -0,0 +1,79 @@
+import asyncio
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+from src.agents import db_agent
+from src.memory.session_store import SessionStore
+
+# Boston questions answer slowly, so the Salem session overtakes it mid-batch
+QUESTIONS = [
+    {"session_id": "boston", "message": "list patients in Boston"},
+    {"session_id": "salem", "message": "list providers in Salem"},
+    {"session_id": "boston", "message": "now show their medications"},
+    {"session_id": "salem", "message": "now show their specialties"},
+    {"session_id": "boston", "message": "how many of them are over 60"},
+]
+
+
+class FakeCoreAgent:
+    """Records every question with the context it was answered in"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def process_query(self, user_question, conversation_context=None):
+        self.calls.append((user_question, conversation_context))
+        await asyncio.sleep(0.03 if "Boston" in user_question or "medications" in user_question else 0.01)
+        return types.SimpleNamespace(success=True, message=f"Answered {user_question}", result_count=1)
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    def fake_core(self):
+        self.agent = FakeCoreAgent()
+
+    monkeypatch.setattr(db_agent.AzureReActDatabaseAgent, "_initialize_react_agent", fake_core)
+    agent = db_agent.AzureReActDatabaseAgent(memory_dir=str(tmp_path / "memory"),
+                                             responses_dir=str(tmp_path / "responses"))
+    monkeypatch.setattr(api_server, "agent", agent)
+    monkeypatch.setattr(api_server, "api_storage", None)
+    monkeypatch.setattr(api_server, "agent_sessions", SessionStore())
+    return TestClient(api_server.app)
+
+
+def test_batch_keeps_session_order_and_isolation(client):
+    response = client.post("/chat/batch", json={"questions": QUESTIONS, "max_parallel": 2})
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert [result["index"] for result in results] == list(range(len(QUESTIONS)))
+    assert [result["session_id"] for result in results] == [question["session_id"] for question in QUESTIONS]
+    assert all(result["status"] == "ok" for result in results)
+
+    agent = api_server.agent
+    boston = [question for question, _ in agent.agent.calls if "Salem" not in question and "specialties" not in question]
+    salem = [question for question, _ in agent.agent.calls if "Salem" in question or "specialties" in question]
+    assert boston[0] == "list patients in Boston"
+    assert "now show their medications" in boston[1]
+    assert "how many of them are over 60" in boston[2]
+    assert salem[0] == "list providers in Salem"
+    assert "now show their specialties" in salem[1]
+
+    for question, context in agent.agent.calls:
+        if "medications" in question or "over 60" in question:
+            assert "Boston" in context and "Salem" not in context
+        if "specialties" in question:
+            assert "Salem" in context and "Boston" not in context
+
+    assert agent.memory_manager.get_session_summary("boston")["total_interactions"] == 3
+    assert agent.memory_manager.get_session_summary("salem")["total_interactions"] == 2
+
+
+def test_ungrouped_questions_from_separate_batches_do_not_share_sessions(client):
+    first = client.post("/chat/batch", json={"questions": [{"message": "list patients in Boston"}]}).json()
+    second = client.post("/chat/batch", json={"questions": [{"message": "list providers in Salem"}]}).json()
+
+    assert first["results"][0]["session_id"] != second["results"][0]["session_id"]
@@ -0,0 +1,15 @@
+import pytest
+
+from src.database.prepared import to_positional
+
+
+@pytest.mark.parametrize("sql, expected, names", [
+    ("SELECT * FROM t WHERE a = :a AND b = :b OR c = :a", "SELECT * FROM t WHERE a = $1 AND b = $2 OR c = $1", ["a", "b"]),
+    ("SELECT x::text FROM t WHERE y = :y", "SELECT x::text FROM t WHERE y = $1", ["y"]),
+    ("SELECT ':x', \":x\" -- :x\nFROM t WHERE y = :y", "SELECT ':x', \":x\" -- :x\nFROM t WHERE y = $1", ["y"]),
+    ("SELECT $$ :x $$ WHERE y = :y", "SELECT $$ :x $$ WHERE y = $1", ["y"]),
+    ("SELECT E'it\\'s :x' WHERE y = :y", "SELECT E'it\\'s :x' WHERE y = $1", ["y"]),
+    ("SELECT 'a\\' WHERE y = :y", "SELECT 'a\\' WHERE y = $1", ["y"]),
+])
+def test_to_positional(sql, expected, names):
+    assert to_positional(sql) == (expected, names)
@@ -0,0 +1,90 @@
+import asyncio
+import types
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.agents import react_agent
+from src.database.result_set import ResultSet
+from src.models.response_models import TableData
+
+
+# question -> (SQL, rows, query delay, delay before the final answer); the delays make the
+# second request record its rows after the first one's query but before the first one answers
+QUERIES = {
+    "list patients in Boston": ('SELECT "FIRST" FROM patients WHERE "CITY" = \'Boston\'', [("Ann",), ("Bob",)], 0.01, 0.06),
+    "list providers in Salem": ('SELECT "NAME" FROM providers WHERE "CITY" = \'Salem\'', [("Dr Cole",)], 0.03, 0.0),
+}
+
+
+class FakeDatabaseConnection:
+    """Answers each question's SQL after its own delay, so the two requests interleave"""
+
+    def __init__(self):
+        self.schema_cache = {}
+        self.schema_fingerprint = None
+        self.readiness = types.SimpleNamespace(ensure_ready=self._ready)
+
+    async def _ready(self):
+        return None
+
+    async def execute_query(self, sql_query, *args, **kwargs):
+        for sql, rows, query_delay, _ in QUERIES.values():
+            if sql == sql_query:
+                await asyncio.sleep(query_delay)
+                return True, ResultSet(["value"], list(rows)), None, 200
+        return False, None, "unknown query", 400
+
+
+class FakeGraph:
+    """Stands in for the ReAct graph: runs the real SQL tool once, then answers quoting its SQL loosely"""
+
+    def __init__(self, tools):
+        self.query_tool = next(tool for tool in tools if tool.name == "sql_db_query")
+
+    async def ainvoke(self, state, config=None):
+        prompt = state["messages"][-1][1]
+        question = next(question for question in QUERIES if question in prompt)
+        sql, _, _, answer_delay = QUERIES[question]
+        await self.query_tool._arun(sql)
+        await asyncio.sleep(answer_delay)
+        return {"messages": [AIMessage(content="", tool_calls=[{
+            "name": react_agent.FINAL_ANSWER_TOOL, "args": {"message": f"Answer for {question}", "sql": sql.lower()}, "id": "call-1"
+        }])]}
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    for name in ("AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_KEY", "AZURE_OPENAI_API_VERSION",
+                 "AZURE_OPENAI_DEPLOYMENT_NAME", "AZURE_OPENAI_MODEL_NAME"):
+        monkeypatch.setenv(name, "test")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "false")
+    monkeypatch.setenv("SPECULATIVE_PREFETCH", "false")
+    monkeypatch.setattr(react_agent, "AzureChatOpenAI", lambda **kwargs: object())
+    monkeypatch.setattr(react_agent, "get_llm_cache", lambda call_site: None)
+    monkeypatch.setattr(react_agent, "DatabaseConnection", FakeDatabaseConnection)
+    monkeypatch.setattr(react_agent, "create_react_agent", lambda llm, tools, prompt=None: FakeGraph(tools))
+    monkeypatch.setattr(react_agent.LangGraphReActDatabaseAgent, "_register_cleanup", lambda self: None)
+    return react_agent.LangGraphReActDatabaseAgent()
+
+
+def _values(table_data):
+    assert isinstance(table_data, TableData)
+    return [row["value"] for row in table_data.data]
+
+
+def test_concurrent_requests_keep_their_own_results(agent):
+    async def run():
+        return await asyncio.gather(*(agent.process_query(question) for question in QUERIES))
+
+    responses = asyncio.run(run())
+
+    for question, response in zip(QUERIES, responses):
+        sql, rows, _, _ = QUERIES[question]
+        assert response.success, response.message
+        assert response.message == f"Answer for {question}"
+        assert response.sql_query == sql
+        assert _values(response.table_data) == [row[0] for row in rows]
+        assert response.result_count == len(rows)
+    assert agent.last_query_data is None
+    assert agent.last_table_data is None
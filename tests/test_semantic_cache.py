@@ -0,0 +1,37 @@
+import pytest
+
+from src.cache.semantic_cache import SemanticSQLCache, key_terms
+
+
+@pytest.fixture
+def cache():
+    return SemanticSQLCache(threshold=0.35, enabled=True)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("patients with diabetes", "diabetic patients"),
+    ("list patients taking medications", "show patients taking medication"),
+    ("How many patients have diabetes?", "count patients with diabetes"),
+])
+def test_paraphrases_share_key_terms(first, second):
+    assert key_terms(first) == key_terms(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("list patients in NY", "list patients in MA"),
+    ("list patients in IN", "list patients in OR"),
+    ("patients on medicaid", "patients on medication"),
+    ("patients with medication", "patients with medicare"),
+    ("patients with medical records", "patients with medicare"),
+    ("patients living in Bostonia", "patients living in Boston"),
+    ("top 5 providers", "top 10 providers"),
+    ("patients named 'Smith'", "patients named 'Smyth'"),
+])
+def test_different_literals_never_share_key_terms(first, second):
+    assert key_terms(first) != key_terms(second)
+
+
+def test_lookup_does_not_rebind_literals(cache):
+    cache.store("list patients in MA", "SELECT * FROM patients WHERE \"STATE\" = 'MA'", "v1")
+    assert cache.lookup("list patients in NY", "v1") is None
+    assert cache.lookup("show patients in MA", "v1")["sql"].endswith("'MA'")
@@ -0,0 +1,68 @@
+import asyncio
+import types
+
+import pytest
+
+from src.agents import db_agent
+
+
+class FakeCoreAgent:
+    """Records the context each question was answered with; the delay makes sessions interleave"""
+
+    def __init__(self):
+        self.contexts = {}
+
+    async def process_query(self, user_question, conversation_context=None):
+        self.contexts[user_question] = conversation_context
+        await asyncio.sleep(0.03 if "Salem" in user_question else 0.01)
+        return types.SimpleNamespace(success=True, message=f"Answered {user_question}", result_count=1)
+
+
+@pytest.fixture
+def agent(monkeypatch, tmp_path):
+    def fake_core(self):
+        self.agent = FakeCoreAgent()
+
+    monkeypatch.setattr(db_agent.AzureReActDatabaseAgent, "_initialize_react_agent", fake_core)
+    return db_agent.AzureReActDatabaseAgent(memory_dir=str(tmp_path / "memory"),
+                                            responses_dir=str(tmp_path / "responses"))
+
+
+def _context_for(agent, marker):
+    return next(context for question, context in agent.agent.contexts.items() if marker in question)
+
+
+def test_concurrent_sessions_get_their_own_context(agent):
+    async def conversation(session_id, first, follow_up):
+        await agent.process_query(first, session_id=session_id)
+        return await agent.process_query(follow_up, session_id=session_id)
+
+    async def run():
+        return await asyncio.gather(
+            conversation("session-a", "list patients in Boston", "now show their medications"),
+            conversation("session-b", "list providers in Salem", "now show their specialties"),
+        )
+
+    first, second = asyncio.run(run())
+
+    assert first["session_id"] == "session-a"
+    assert second["session_id"] == "session-b"
+
+    context_a = _context_for(agent, "Previous conversation context (Session: session-a)")
+    context_b = _context_for(agent, "Previous conversation context (Session: session-b)")
+    assert "list patients in Boston" in context_a
+    assert "Salem" not in context_a
+    assert "list providers in Salem" in context_b
+    assert "Boston" not in context_b
+
+    summary_a = agent.memory_manager.get_session_summary("session-a")
+    summary_b = agent.memory_manager.get_session_summary("session-b")
+    assert summary_a["total_interactions"] == 2
+    assert summary_b["total_interactions"] == 2
+
+
+def test_caller_context_is_passed_through(agent):
+    asyncio.run(agent.process_query("list patients in Boston", conversation_context="user: hello",
+                                    session_id="session-c"))
+
+    assert agent.agent.contexts["list patients in Boston"] == "user: hello"
@@ -0,0 +1,134 @@
+import time
+
+import pytest
+
+from src.memory import session_store
+from src.memory.session_store import SessionStore
+
+
+class FakeClock:
+    """Drives both the monotonic idle clock and the wall clock used for spill files"""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(session_store, "time", clock)
+    return clock
+
+
+def _store(tmp_path, **limits):
+    options = {"max_sessions": 100, "idle_ttl_seconds": 3600, "max_memory_bytes": 1024 * 1024,
+               "max_messages": 50, "spill_ttl_seconds": 3600}
+    options.update(limits)
+    return SessionStore(spill_dir=str(tmp_path / "spilled"), **options)
+
+
+def _message(text):
+    return {"role": "user", "content": text}
+
+
+def test_count_limit_evicts_least_recently_used(tmp_path, clock):
+    store = _store(tmp_path, max_sessions=2)
+    store.append_message("a", _message("first"))
+    store.append_message("b", _message("second"))
+    store.get("a")
+    store.append_message("c", _message("third"))
+
+    assert store.keys() == ["a", "c"]
+    assert store.evictions["count"] == 1
+    assert "b" in store
+
+
+def test_evicted_session_is_reloaded_from_disk(tmp_path, clock):
+    store = _store(tmp_path, max_sessions=1)
+    store.append_message("a", _message("remember me"))
+    store.append_message("b", _message("newer"))
+
+    session = store.get("a")
+
+    assert session["messages"] == [_message("remember me")]
+    assert store.disk_reloads == 1
+    assert store.keys() == ["a"]
+    assert not (tmp_path / "spilled" / "a.json").exists()
+    assert store.get_stats()["spilled_sessions_on_disk"] == 1
+
+
+def test_idle_sessions_are_evicted_after_the_ttl(tmp_path, clock):
+    store = _store(tmp_path, idle_ttl_seconds=10)
+    store.append_message("idle", _message("hello"))
+    clock.advance(5)
+    store.append_message("busy", _message("hi"))
+    clock.advance(6)
+    store.append_message("busy", _message("still here"))
+
+    assert store.keys() == ["busy"]
+    assert store.evictions["idle"] == 1
+    assert store.get("idle")["messages"] == [_message("hello")]
+
+
+def test_spilled_sessions_expire_after_the_spill_ttl(tmp_path, clock):
+    store = _store(tmp_path, max_sessions=1, spill_ttl_seconds=30)
+    store.append_message("old", _message("hello"))
+    store.append_message("new", _message("hi"))
+    clock.advance(31)
+
+    assert store.get("old") is None
+    assert store.spill_expired == 1
+    assert not (tmp_path / "spilled" / "old.json").exists()
+
+
+def test_spill_file_cap_drops_the_oldest_files(tmp_path, clock):
+    store = _store(tmp_path, max_sessions=1, max_spill_files=2)
+    for session_id in ("a", "b", "c", "d"):
+        store.append_message(session_id, _message(session_id))
+        clock.advance(1)
+
+    stats = store.get_stats()
+    assert stats["spilled_sessions_on_disk"] == 2
+    assert stats["spill_dropped"] == 1
+    assert sorted(path.name for path in (tmp_path / "spilled").glob("*.json")) == ["b.json", "c.json"]
+    assert store.get("a") is None
+
+
+def test_memory_cap_evicts_until_under_the_limit(tmp_path, clock):
+    store = _store(tmp_path, max_memory_bytes=600)
+    for session_id in ("a", "b", "c"):
+        store.append_message(session_id, _message("x" * 200))
+
+    stats = store.get_stats()
+    assert stats["memory_bytes"] <= 600
+    assert store.evictions["memory"] >= 1
+    assert store.keys()[-1] == "c"
+
+
+def test_messages_are_truncated_to_the_limit(tmp_path, clock):
+    store = _store(tmp_path, max_messages=3)
+    for index in range(5):
+        store.append_message("a", _message(f"message {index}"))
+
+    assert [message["content"] for message in store.get("a")["messages"]] == ["message 2", "message 3", "message 4"]
+    assert store.truncated_messages == 2
+
+
+def test_restart_indexes_files_left_by_an_earlier_store(tmp_path, clock):
+    store = _store(tmp_path, max_sessions=1)
+    store.append_message("a", _message("hello"))
+    store.append_message("b", _message("hi"))
+
+    restarted = _store(tmp_path)
+
+    assert restarted.get_stats()["spilled_sessions_on_disk"] == 1
+    assert restarted.get("a")["messages"] == [_message("hello")]
@@ -0,0 +1,33 @@
+import pytest
+
+from src.query.sql_rewriter import SQLColumnRewriter
+
+
+@pytest.fixture
+def rewriter():
+    rewriter = SQLColumnRewriter(aliases={"first_name": '"FIRST"'})
+    rewriter.load_schema({"tables": {"patients": {"columns": [
+        {"name": "PATIENT_ID"}, {"name": "FIRST"}, {"name": "LAST"}
+    ]}}})
+    return rewriter
+
+
+def test_rewrites_column_spellings(rewriter):
+    assert rewriter.rewrite("SELECT first_name, patient_id FROM patients") == \
+        'SELECT "FIRST", "PATIENT_ID" FROM patients'
+
+
+def test_leaves_literals_and_escaped_identifiers_alone(rewriter):
+    sql = """SELECT "a""b", 'it''s first' FROM patients WHERE x = $$first$$"""
+    assert rewriter.rewrite(sql) == sql
+
+
+@pytest.mark.parametrize("clause", [
+    "FETCH FIRST 10 ROWS ONLY",
+    "FETCH NEXT 5 ROWS ONLY",
+    "FETCH FIRST ROW ONLY",
+    "OFFSET 5 ROWS FETCH NEXT ROWS ONLY",
+])
+def test_fetch_clause_keywords_are_not_columns(rewriter, clause):
+    sql = f"SELECT last FROM patients ORDER BY last {clause}"
+    assert rewriter.rewrite(sql) == f'SELECT "LAST" FROM patients ORDER BY "LAST" {clause}'
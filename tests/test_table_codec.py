@@ -0,0 +1,63 @@
+from src.database.result_set import ResultSet
+from src.utils.table_codec import (
+    COLUMNAR_FORMAT, DICTIONARY_MIN_ROWS, encode_table, from_columnar_table, to_columnar_table, to_legacy_table
+)
+
+CITIES = ["Boston", "Salem", "Boston", "Worcester", "Salem", "Boston", None, "Boston", "Salem", "Boston"]
+
+
+def _patients():
+    return ResultSet(["id", "city", "age"], [(index, city, 30 + index) for index, city in enumerate(CITIES)])
+
+
+def test_columnar_round_trip_matches_legacy():
+    table = {"headers": ["id", "city", "age"], "data": _patients()}
+
+    payload = to_columnar_table(table)
+
+    assert payload["dictionaries"] == [None, ["Boston", "Salem", "Worcester"], None]
+    assert payload["rows"][6] == [6, None, 36]
+    assert from_columnar_table(payload) == to_legacy_table(table)
+
+
+def test_round_trip_from_row_dicts():
+    table = {"headers": ["id", "city", "age"], "data": _patients().to_dicts(), "truncated": True}
+
+    payload = to_columnar_table(table)
+
+    assert payload["truncated"] is True
+    assert from_columnar_table(payload) == to_legacy_table(table)
+
+
+def test_short_or_distinct_columns_are_not_dictionary_encoded():
+    short = ResultSet(["city"], [(city,) for city in CITIES[:DICTIONARY_MIN_ROWS - 1]])
+    distinct = ResultSet(["name"], [(f"patient {index}",) for index in range(20)])
+
+    assert "dictionaries" not in to_columnar_table({"data": short})
+    assert "dictionaries" not in to_columnar_table({"data": distinct})
+    assert to_columnar_table({"data": short})["rows"] is short.rows
+
+
+def test_duplicate_headers_keep_their_own_dictionaries():
+    # A join returning two "name" columns: repeated strings first, numbers second
+    rows = [(city, index) for index, city in enumerate(CITIES)]
+    table = {"headers": ["name", "name"], "data": ResultSet(["name", "name"], rows)}
+
+    payload, stats = encode_table(table, COLUMNAR_FORMAT)
+
+    assert payload["dictionaries"][0] == ["Boston", "Salem", "Worcester"]
+    assert payload["dictionaries"][1] is None
+    assert [row[1] for row in payload["rows"]] == list(range(len(CITIES)))
+    assert stats["dictionary_columns"] == ["name"]
+    assert from_columnar_table(payload) == to_legacy_table(table)
+
+
+def test_duplicate_headers_both_dictionary_encoded():
+    other = ["north", "south"] * 5
+    rows = [(city, side) for city, side in zip(CITIES, other)]
+    payload = to_columnar_table({"headers": ["name", "name"], "data": ResultSet(["name", "name"], rows)})
+
+    decoded = [[dictionary[value] if dictionary and value is not None else value
+                for dictionary, value in zip(payload["dictionaries"], row)] for row in payload["rows"]]
+
+    assert decoded == [list(row) for row in rows]
@@ -0,0 +1,44 @@
+import pytest
+
+from src.query.templates import QueryTemplateEngine
+
+
+@pytest.fixture
+def engine():
+    return QueryTemplateEngine()
+
+
+@pytest.mark.parametrize("question, concept, term", [
+    ("how many patients have diabetes", "condition", "diabetes"),
+    ("How many patients diagnosed with hypertension?", "condition", "hypertension"),
+    ("how many diabetic patients", "condition", "diabetes"),
+    ("how many patients are taking metformin", "medication", "metformin"),
+    ("how many patients underwent appendectomy", "procedure", "appendectomy"),
+    ("how many patients have allergic rhinitis", "condition", "allergic rhinitis"),
+])
+def test_count_by_concept_matches(engine, question, concept, term):
+    template = engine.match(question)
+    assert template is not None
+    assert template.name == f"count_by_{concept}"
+    assert template.slots == {"concept": concept, "term": term}
+
+
+@pytest.mark.parametrize("question", [
+    "how many patients have no allergies",
+    "how many patients have never had diabetes",
+    "how many patients do not have diabetes",
+    "how many patients have allergies",
+    "how many patients have encounters",
+    "how many patients have immunizations",
+    "how many patients have observations",
+    "how many patients have insurance",
+    "how many patients have been seen",
+    "how many patients had surgery",
+    "how many patients have visits",
+    "how many patients are on medicaid",
+    "how many patients are on metformin",
+    "how many patients are receiving immunizations",
+    "how many patients have any medication",
+])
+def test_count_by_concept_falls_through(engine, question):
+    assert engine.match(question) is None
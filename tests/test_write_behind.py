@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+from src.storage.write_behind import WriteBehindQueue
+
+
+class RecordingWriter:
+    """apply_batch stand-in that records batches and fails any batch containing a bad operation"""
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        if any(operation == "bad" for operation in batch):
+            raise ValueError("constraint failed")
+        with self.lock:
+            self.batches.append(list(batch))
+
+    @property
+    def written(self):
+        return [operation for batch in self.batches for operation in batch]
+
+
+def test_queued_writes_are_grouped_into_batches():
+    writer = RecordingWriter()
+    writes = WriteBehindQueue(writer, batch_size=3, flush_interval=60)
+    for index in range(7):
+        writes.submit(index)
+
+    writes.start()
+    assert writes.flush_sync(timeout=5)
+    writes.close()
+
+    assert writer.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert writes.get_stats()["written"] == 7
+    assert writes.get_stats()["avg_batch_size"] == round(7 / 3, 2)
+
+
+def test_partial_batch_is_written_after_the_flush_interval():
+    writer = RecordingWriter()
+    writes = WriteBehindQueue(writer, batch_size=100, flush_interval=0.05)
+    writes.start()
+    writes.submit("a")
+    writes.submit("b")
+
+    deadline = time.monotonic() + 2
+    while writes.written < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writes.close()
+
+    assert writer.batches == [["a", "b"]]
+
+
+def test_failed_batch_is_retried_one_operation_at_a_time():
+    writer = RecordingWriter()
+    writes = WriteBehindQueue(writer, batch_size=10, flush_interval=60)
+    for operation in ("a", "bad", "b"):
+        writes.submit(operation)
+
+    writes.close()
+
+    assert writer.written == ["a", "b"]
+    stats = writes.get_stats()
+    assert stats["written"] == 2
+    assert stats["failed_batches"] == 1
+    assert stats["failed_writes"] == 1
+    assert stats["dropped"] == 1
+
+
+def test_full_queue_drops_instead_of_blocking():
+    writes = WriteBehindQueue(RecordingWriter(), max_queue_size=2)
+
+    assert writes.submit(1)
+    assert writes.submit(2)
+    assert not writes.submit(3)
+    assert writes.dropped == 1
+
+
+def test_close_drains_pending_writes_and_stops_the_thread():
+    writer = RecordingWriter()
+    writes = WriteBehindQueue(writer, batch_size=4, flush_interval=60)
+    writes.start()
+    for index in range(10):
+        writes.submit(index)
+
+    writes.close()
+
+    assert not writes.is_running
+    assert writer.written == list(range(10))
+    assert not writes.submit(10)
+    assert writes.dropped == 1
+
+
+def test_close_without_a_writer_thread_writes_synchronously():
+    writer = RecordingWriter()
+    writes = WriteBehindQueue(writer, batch_size=2)
+    for index in range(3):
+        writes.submit(index)
+
+    writes.close()
+
+    assert writer.batches == [[0, 1], [2]]
+
+
+def test_async_flush_waits_for_pending_writes():
+    writer = RecordingWriter()
+    writes = WriteBehindQueue(writer, batch_size=100, flush_interval=60)
+    writes.start()
+
+    async def run():
+        writes.submit("a")
+        return await writes.flush(timeout=5)
+
+    assert asyncio.run(run())
+    assert writer.written == ["a"]
+    writes.close()